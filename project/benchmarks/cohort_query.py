@@ -0,0 +1,65 @@
+"""
+Time join_query.sql against join_query_optimized.sql and check they return the same rows.
+
+Usage (from project/):
+    python -m benchmarks.cohort_query --scale 10527   # ~1M users
+"""
+
+import argparse
+import logging
+import random
+import sqlite3
+import tempfile
+import time
+from pathlib import Path
+
+from data_generation.generate_data import DEFAULT_USER_COUNT, write_datasets
+from db import ingest
+from db.storage import install_dollar_views
+from queries.run_query import OPTIMIZED_QUERY_PATH, QUERY_PATH
+
+
+QUERIES = {"original": QUERY_PATH, "optimized": OPTIMIZED_QUERY_PATH}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the cohort CLV query variants.")
+    parser.add_argument("--scale", type=float, default=100.0, help="Multiplier on 95 users.")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed.")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per query; best is kept.")
+    parser.add_argument(
+        "--schema", choices=sorted(ingest.SCHEMA_PATHS), default="standard", help="Schema layout."
+    )
+    args = parser.parse_args()
+
+    logger = logging.getLogger("benchmarks.cohort_query")
+    logger.addHandler(logging.NullHandler())
+    logger.propagate = False
+
+    with tempfile.TemporaryDirectory() as tmp:
+        data_dir = Path(tmp)
+        users = max(1, round(DEFAULT_USER_COUNT * args.scale))
+        started = time.perf_counter()
+        write_datasets(random.Random(args.seed), data_dir, users)
+        ingest.DATA_DIR = data_dir
+        ingest.DB_PATH = data_dir / "ecommerce.db"
+        ingest.run_ingestion(logger, fast_load=True, schema=args.schema)
+        print(f"Generated and loaded {users} users in {time.perf_counter() - started:.1f}s")
+
+        results = {}
+        with sqlite3.connect(ingest.DB_PATH) as conn:
+            install_dollar_views(conn)
+            for label, path in QUERIES.items():
+                sql = path.read_text(encoding="utf-8")
+                best = float("inf")
+                for _ in range(args.repeat):
+                    started = time.perf_counter()
+                    results[label] = conn.execute(sql).fetchall()
+                    best = min(best, time.perf_counter() - started)
+                print(f"{label:>10}: {best:.3f}s ({len(results[label])} rows)")
+        identical = results["optimized"] == results["original"]
+        print(f"Identical output: {'yes' if identical else 'NO'}")
+
+
+if __name__ == "__main__":
+    main()
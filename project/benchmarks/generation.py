@@ -0,0 +1,50 @@
+"""
+Compare rows/sec of the pure-Python and NumPy generation backends.
+
+Usage (from project/):
+    python -m benchmarks.generation --scale 1000
+"""
+
+import argparse
+import random
+import tempfile
+import time
+from pathlib import Path
+
+from data_generation.generate_data import DEFAULT_USER_COUNT, write_datasets
+from data_generation.vectorized import numpy_available
+
+
+def run_backend(backend: str, users: int, seed: int) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        output_dir = Path(tmp)
+        started = time.perf_counter()
+        stats = write_datasets(random.Random(seed), output_dir, users, backend=backend)
+        elapsed = time.perf_counter() - started
+    rows = sum(entry["rows"] for entry in stats.values())
+    return {"backend": backend, "rows": rows, "seconds": elapsed, "rows_per_sec": rows / elapsed}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark generation backends.")
+    parser.add_argument("--scale", type=float, default=100.0, help="Multiplier on 95 users.")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed.")
+    args = parser.parse_args()
+
+    users = max(1, round(DEFAULT_USER_COUNT * args.scale))
+    backends = ["python"] + (["numpy"] if numpy_available() else [])
+    results = [run_backend(backend, users, args.seed) for backend in backends]
+    print(f"users={users}")
+    for result in results:
+        print(
+            f"{result['backend']:>7}: {result['rows']:>10} rows in {result['seconds']:.2f}s "
+            f"({result['rows_per_sec']:,.0f} rows/sec)"
+        )
+    if len(results) == 2:
+        print(f"speedup: {results[1]['rows_per_sec'] / results[0]['rows_per_sec']:.1f}x")
+    else:
+        print("NumPy not installed; only the python backend was measured.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""
+Compare ingestion throughput of the default, --stream, --fast-load and --parse-workers paths.
+
+Usage (from project/):
+    python -m benchmarks.ingest --scale 500
+"""
+
+import argparse
+import logging
+import random
+import tempfile
+import time
+from pathlib import Path
+
+from data_generation.generate_data import DEFAULT_USER_COUNT, write_datasets
+from db import ingest
+
+
+VARIANTS = {
+    "default": {},
+    "stream": {"stream": True},
+    "fast-load": {"fast_load": True},
+    "stream+fast-load": {"stream": True, "fast_load": True},
+    "parse-workers=2": {"parse_workers": 2},
+    "parse-workers=2+fast-load": {"parse_workers": 2, "fast_load": True},
+}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark ingestion modes.")
+    parser.add_argument("--scale", type=float, default=100.0, help="Multiplier on 95 users.")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed.")
+    args = parser.parse_args()
+
+    logger = logging.getLogger("benchmarks.ingest")
+    logger.addHandler(logging.NullHandler())
+    logger.propagate = False
+
+    with tempfile.TemporaryDirectory() as tmp:
+        data_dir = Path(tmp)
+        users = max(1, round(DEFAULT_USER_COUNT * args.scale))
+        stats = write_datasets(random.Random(args.seed), data_dir, users)
+        rows = sum(entry["rows"] for entry in stats.values())
+        ingest.DATA_DIR = data_dir
+        ingest.DB_PATH = data_dir / "bench.db"
+        print(f"users={users} rows={rows}")
+        baseline = None
+        for name, options in VARIANTS.items():
+            started = time.perf_counter()
+            ingest.run_ingestion(logger, **options)
+            elapsed = time.perf_counter() - started
+            baseline = baseline or elapsed
+            print(
+                f"{name:>26}: {elapsed:.2f}s ({rows / elapsed:,.0f} rows/sec, "
+                f"{baseline / elapsed:.2f}x vs default)"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,283 @@
+"""
+End-to-end pipeline benchmark: generate -> ingest -> report -> query at several scales.
+
+Each stage runs in a fresh process so its peak RSS is its own, and records wall
+time, rows/sec, peak RSS and the database file size afterwards. ``rows`` is the
+rows written by generate and the dataset rows (all five tables) for the other
+stages, so rows/sec stays comparable across scales. Results are written as JSON;
+with ``--baseline`` every stage is compared against a stored run and the script
+exits non-zero when one is slower, or uses more memory, by more than ``--threshold``.
+A baseline recorded with other settings (seed, repeat, --fast-load, report engine)
+is refused before anything runs.
+
+Usage (from project/):
+    python -m benchmarks.pipeline --scales 1,100,10000 --output pipeline.json
+    python -m benchmarks.pipeline --scales 1,100 --baseline pipeline.json --threshold 0.25
+"""
+
+import argparse
+import json
+import logging
+import multiprocessing
+import platform
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from data_generation.generate_data import DEFAULT_USER_COUNT, write_datasets
+from db import ingest
+from db.report_engine import REPORT_ENGINES
+from db.storage import install_dollar_views
+from queries import run_query
+from utils.helpers import BASE_DIR, now_utc_iso, peak_rss_bytes, write_json
+
+
+STAGES = ["generate", "ingest", "report", "query"]
+DEFAULT_SCALES = "1,100"
+DEFAULT_OUTPUT = BASE_DIR / "pipeline_benchmark.json"
+DEFAULT_THRESHOLD = 0.25
+# Stages faster than this in the baseline are too noisy to compare on time.
+MIN_COMPARED_SECONDS = 0.05
+
+
+def _quiet_logger() -> logging.Logger:
+    logger = logging.getLogger("benchmarks.pipeline")
+    if not logger.handlers:
+        logger.addHandler(logging.NullHandler())
+        logger.propagate = False
+    return logger
+
+
+def _point_ingest_at(work_dir: Path) -> None:
+    ingest.DATA_DIR = work_dir
+    ingest.DB_PATH = work_dir / "bench.db"
+    ingest.REPORT_JSON = work_dir / "report.json"
+    ingest.REPORT_MD = work_dir / "report.md"
+
+
+def stage_generate(work_dir: Path, users: int, seed: int, **_: Any) -> int:
+    stats = write_datasets(random.Random(seed), work_dir, users)
+    return sum(entry["rows"] for entry in stats.values())
+
+
+def stage_ingest(work_dir: Path, fast_load: bool, engine: str, **_: Any) -> None:
+    _point_ingest_at(work_dir)
+    # The rollups engine reads tables that only an opted-in ingest builds.
+    ingest.run_ingestion(_quiet_logger(), fast_load=fast_load, rollups=engine == "rollups")
+
+
+def stage_report(work_dir: Path, engine: str, **_: Any) -> None:
+    _point_ingest_at(work_dir)
+    logger = _quiet_logger()
+    report_data = ingest.fetch_report(engine, ingest.DEFAULT_REPORT_WORKERS, False, logger)
+    ingest.write_report(report_data, logger)
+
+
+def stage_query(work_dir: Path, **_: Any) -> None:
+    run_query.CSV_OUTPUT = work_dir / "query_result.csv"
+    run_query.JSON_OUTPUT = work_dir / "query_result.json"
+    with sqlite3.connect(work_dir / "bench.db") as conn:
+        install_dollar_views(conn)
+        sql = run_query.QUERY_PATH.read_text(encoding="utf-8")
+        run_query.write_results(conn.execute(sql), run_query.DEFAULT_FORMATS)
+
+
+STAGE_FUNCTIONS: Dict[str, Callable[..., Optional[int]]] = {
+    "generate": stage_generate,
+    "ingest": stage_ingest,
+    "report": stage_report,
+    "query": stage_query,
+}
+
+
+def run_stage(stage: str, options: Dict[str, Any]) -> Dict[str, Any]:
+    """Runs inside the child process."""
+    started = time.perf_counter()
+    rows = STAGE_FUNCTIONS[stage](**options)
+    return {
+        "seconds": time.perf_counter() - started,
+        "rows": rows,
+        "peak_rss_bytes": peak_rss_bytes(),
+    }
+
+
+def measure(stage: str, options: Dict[str, Any], repeat: int) -> Dict[str, Any]:
+    """Best time of ``repeat`` runs, each in a fresh spawned process; worst peak RSS."""
+    context = multiprocessing.get_context("spawn")
+    runs = []
+    for _ in range(repeat):
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+            runs.append(pool.submit(run_stage, stage, options).result())
+    rss = [run["peak_rss_bytes"] for run in runs if run["peak_rss_bytes"] is not None]
+    return {
+        "seconds": min(run["seconds"] for run in runs),
+        "rows": runs[0]["rows"],
+        "peak_rss_bytes": max(rss) if rss else None,
+    }
+
+
+def run_scale(scale: float, args: argparse.Namespace) -> List[Dict[str, Any]]:
+    users = max(1, round(DEFAULT_USER_COUNT * scale))
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        work_dir = Path(tmp)
+        options = {
+            "work_dir": work_dir,
+            "users": users,
+            "seed": args.seed,
+            "fast_load": args.fast_load,
+            "engine": args.report_engine,
+        }
+        dataset_rows = 0
+        for stage in STAGES:
+            # Regenerating is only repeatable because the seed is fixed.
+            measured = measure(stage, options, args.repeat)
+            if stage == "generate":
+                dataset_rows = measured["rows"]
+            db_path = work_dir / "bench.db"
+            result = {
+                "scale": scale,
+                "users": users,
+                "stage": stage,
+                "seconds": round(measured["seconds"], 4),
+                "rows": dataset_rows,
+                "rows_per_sec": (
+                    round(dataset_rows / measured["seconds"]) if measured["seconds"] else None
+                ),
+                "peak_rss_bytes": measured["peak_rss_bytes"],
+                "db_bytes": db_path.stat().st_size if db_path.exists() else None,
+            }
+            results.append(result)
+            rss = result["peak_rss_bytes"]
+            print(
+                f"scale={scale:g} {stage:>8}: {result['seconds']:8.2f}s "
+                f"{result['rows_per_sec'] or 0:>12,} rows/sec "
+                f"rss={(rss or 0) / 2**20:7.1f} MiB "
+                f"db={(result['db_bytes'] or 0) / 2**20:7.1f} MiB"
+            )
+    return results
+
+
+def find_regressions(
+    results: List[Dict[str, Any]],
+    baseline: List[Dict[str, Any]],
+    threshold: float,
+    min_seconds: float = MIN_COMPARED_SECONDS,
+) -> List[str]:
+    """Stages slower, or with a higher peak RSS, than the baseline by more than ``threshold``."""
+    previous = {(entry["scale"], entry["stage"]): entry for entry in baseline}
+    regressions = []
+    for entry in results:
+        before = previous.get((entry["scale"], entry["stage"]))
+        if before is None:
+            continue
+        label = f"scale={entry['scale']:g} {entry['stage']}"
+        slower = entry["seconds"] > before["seconds"] * (1 + threshold)
+        if before["seconds"] >= min_seconds and slower:
+            regressions.append(
+                f"{label}: {entry['seconds']:.2f}s vs baseline {before['seconds']:.2f}s"
+            )
+        if (
+            entry["peak_rss_bytes"]
+            and before.get("peak_rss_bytes")
+            and entry["peak_rss_bytes"] > before["peak_rss_bytes"] * (1 + threshold)
+        ):
+            regressions.append(
+                f"{label}: peak RSS {entry['peak_rss_bytes'] / 2**20:.1f} MiB vs baseline "
+                f"{before['peak_rss_bytes'] / 2**20:.1f} MiB"
+            )
+    return regressions
+
+
+def settings_mismatches(settings: Dict[str, Any], baseline_settings: Dict[str, Any]) -> List[str]:
+    """Settings that differ from the baseline run's; their timings are not comparable."""
+    return [
+        f"{name}={settings.get(name)!r} (baseline {baseline_settings.get(name)!r})"
+        for name in sorted(set(settings) | set(baseline_settings))
+        if settings.get(name) != baseline_settings.get(name)
+    ]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the full pipeline at several scales.")
+    parser.add_argument(
+        "--scales",
+        default=DEFAULT_SCALES,
+        help="Comma-separated multipliers on 95 users (e.g. 1,100,10000).",
+    )
+    parser.add_argument("--seed", type=int, default=42, help="Random seed.")
+    parser.add_argument("--repeat", type=int, default=1, help="Runs per stage; best is kept.")
+    parser.add_argument("--fast-load", action="store_true", help="Ingest with --fast-load.")
+    parser.add_argument("--report-engine", choices=REPORT_ENGINES, default="classic")
+    parser.add_argument("--output", type=Path, default=DEFAULT_OUTPUT, help="Results JSON.")
+    parser.add_argument("--baseline", type=Path, help="Earlier results JSON to compare against.")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=DEFAULT_THRESHOLD,
+        help="Allowed slowdown or RSS growth over the baseline, as a fraction.",
+    )
+    args = parser.parse_args()
+    if args.repeat < 1:
+        raise SystemExit("--repeat must be at least 1.")
+    try:
+        scales = [float(value) for value in args.scales.split(",")]
+    except ValueError:
+        raise SystemExit("--scales must be comma-separated numbers.")
+    settings = {
+        "seed": args.seed,
+        "repeat": args.repeat,
+        "fast_load": args.fast_load,
+        "report_engine": args.report_engine,
+    }
+    baseline = None
+    if args.baseline:
+        # Checked before the run, which can take a long time at large scales.
+        baseline = json.loads(args.baseline.read_text(encoding="utf-8"))
+        if "settings" not in baseline:
+            print(f"WARNING {args.baseline} does not record its settings.", file=sys.stderr)
+        else:
+            mismatches = settings_mismatches(settings, baseline["settings"])
+            if mismatches:
+                raise SystemExit(
+                    f"{args.baseline} was recorded with other settings: {', '.join(mismatches)}."
+                )
+        for name, current in (
+            ("python", platform.python_version()),
+            ("sqlite", sqlite3.sqlite_version),
+        ):
+            if baseline.get(name, current) != current:
+                print(
+                    f"WARNING baseline {name} {baseline[name]} differs from {current}.",
+                    file=sys.stderr,
+                )
+
+    results = [entry for scale in scales for entry in run_scale(scale, args)]
+    write_json(
+        args.output,
+        {
+            "generated_timestamp": now_utc_iso(),
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "settings": settings,
+            "results": results,
+        },
+    )
+    print(f"Results saved to {args.output}")
+
+    if baseline is not None:
+        regressions = find_regressions(results, baseline["results"], args.threshold)
+        for line in regressions:
+            print(f"REGRESSION {line}", file=sys.stderr)
+        if regressions:
+            raise SystemExit(f"{len(regressions)} stage(s) regressed beyond {args.threshold:.0%}.")
+        print(f"No stage regressed beyond {args.threshold:.0%} of {args.baseline}.")
+
+
+if __name__ == "__main__":
+    main()
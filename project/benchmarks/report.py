@@ -0,0 +1,72 @@
+"""
+Compare the report engines on a generated dataset.
+
+Usage (from project/):
+    python -m benchmarks.report --scale 4300   # ~1M orders
+"""
+
+import argparse
+import logging
+import random
+import sqlite3
+import tempfile
+import time
+from pathlib import Path
+
+from data_generation.generate_data import DEFAULT_USER_COUNT, write_datasets
+from db import ingest
+
+
+def fetch_concurrent(conn: sqlite3.Connection) -> dict:
+    report = ingest.fetch_report_data_concurrent(ingest.DB_PATH)
+    del report["section_timings_ms"]
+    return report
+
+
+ENGINES = {
+    "classic": ingest.fetch_report_data,
+    "single-pass": ingest.fetch_report_data_single_pass,
+    "rollups": ingest.fetch_report_data_rollups,
+    "concurrent": fetch_concurrent,
+}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark report engines.")
+    parser.add_argument("--scale", type=float, default=100.0, help="Multiplier on 95 users.")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed.")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per engine; best is kept.")
+    parser.add_argument("--schema", choices=sorted(ingest.SCHEMA_PATHS), default="standard")
+    args = parser.parse_args()
+
+    logger = logging.getLogger("benchmarks.report")
+    logger.addHandler(logging.NullHandler())
+    logger.propagate = False
+
+    with tempfile.TemporaryDirectory() as tmp:
+        data_dir = Path(tmp)
+        users = max(1, round(DEFAULT_USER_COUNT * args.scale))
+        stats = write_datasets(random.Random(args.seed), data_dir, users)
+        ingest.DATA_DIR = data_dir
+        ingest.DB_PATH = data_dir / "bench.db"
+        ingest.run_ingestion(logger, fast_load=True, schema=args.schema, rollups=True)
+        print(f"users={users} orders={stats['orders.csv']['rows']} schema={args.schema}")
+        reports = {}
+        timings = {}
+        with sqlite3.connect(ingest.DB_PATH) as conn:
+            for name, fetch in ENGINES.items():
+                best = float("inf")
+                for _ in range(args.repeat):
+                    started = time.perf_counter()
+                    reports[name] = fetch(conn)
+                    best = min(best, time.perf_counter() - started)
+                timings[name] = best
+                print(f"{name:>12}: {best:.2f}s")
+        for name in ENGINES:
+            if name != "classic":
+                print(f"{name} speedup: {timings['classic'] / timings[name]:.2f}x")
+                print(f"{name} identical: {reports['classic'] == reports[name]}")
+
+
+if __name__ == "__main__":
+    main()
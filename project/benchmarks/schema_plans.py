@@ -0,0 +1,83 @@
+"""
+Show EXPLAIN QUERY PLAN output and timings for the cohort query and the report
+queries under each schema layout.
+
+Usage (from project/):
+    python -m benchmarks.schema_plans --scale 1000
+"""
+
+import argparse
+import logging
+import random
+import sqlite3
+import tempfile
+import time
+from pathlib import Path
+from typing import List
+
+from data_generation.generate_data import DEFAULT_USER_COUNT, write_datasets
+from db import ingest
+from queries.run_query import QUERY_PATH
+
+
+def capture_report_statements(conn: sqlite3.Connection) -> List[str]:
+    statements: List[str] = []
+    conn.set_trace_callback(statements.append)
+    try:
+        ingest.fetch_report_data(conn)
+    finally:
+        conn.set_trace_callback(None)
+    return [sql for sql in statements if sql.lstrip().upper().startswith(("SELECT", "WITH"))]
+
+
+def explain(conn: sqlite3.Connection, sql: str) -> List[str]:
+    return [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}")]
+
+
+def time_query(conn: sqlite3.Connection, sql: str, repeat: int = 3) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        conn.execute(sql).fetchall()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare query plans across schema layouts.")
+    parser.add_argument("--scale", type=float, default=100.0, help="Multiplier on 95 users.")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed.")
+    args = parser.parse_args()
+
+    logger = logging.getLogger("benchmarks.schema_plans")
+    logger.addHandler(logging.NullHandler())
+    logger.propagate = False
+
+    with tempfile.TemporaryDirectory() as tmp:
+        data_dir = Path(tmp)
+        users = max(1, round(DEFAULT_USER_COUNT * args.scale))
+        write_datasets(random.Random(args.seed), data_dir, users)
+        ingest.DATA_DIR = data_dir
+        for schema in sorted(ingest.SCHEMA_PATHS, reverse=True):
+            ingest.DB_PATH = data_dir / f"{schema}.db"
+            ingest.run_ingestion(logger, fast_load=True, schema=schema)
+            with sqlite3.connect(ingest.DB_PATH) as conn:
+                conn.execute("ANALYZE")
+                statements = [("cohort query", QUERY_PATH.read_text(encoding="utf-8"))]
+                statements += [
+                    (f"report #{index}", sql)
+                    for index, sql in enumerate(capture_report_statements(conn), start=1)
+                ]
+                print(f"\n=== schema={schema} users={users} ===")
+                total = 0.0
+                for label, sql in statements:
+                    elapsed = time_query(conn, sql)
+                    total += elapsed
+                    print(f"\n-- {label}: {elapsed * 1000:.1f} ms")
+                    for line in explain(conn, sql):
+                        print(f"   {line}")
+                print(f"\nTotal: {total * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,19 @@
 import argparse
 import csv
+import hashlib
 import random
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import ExitStack
 from datetime import datetime, timedelta
 from pathlib import Path
-from typing import Dict, Iterable, List, Tuple
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Sequence, Tuple
 
-from utils.helpers import BASE_DIR, configure_logger, write_csv
+from data_generation.vectorized import numpy_available, write_vectorized_order_tables
+from utils.columnar import COLUMNAR_SUFFIX, ColumnarWriter, columnar_name, iter_columnar_chunks
+from utils.helpers import BASE_DIR, TrackedFile, configure_logger, write_csv, write_manifest
+from utils.metrics import METRICS, stage_timer, write_metrics
+from utils.profilers import add_profile_args, profiled
 
 
 UserRow = Dict[str, str]
@@ -13,6 +21,79 @@ ProductRow = Dict[str, str]
 OrderRow = Dict[str, str]
 OrderItemRow = Dict[str, str]
 PaymentRow = Dict[str, str]
+OrderBundle = Tuple[OrderRow, List[OrderItemRow], PaymentRow]
+FileStats = Dict[str, Any]
+
+DEFAULT_USER_COUNT = 95
+DEFAULT_PRODUCT_COUNT = 32
+SHARD_DIR_NAME = ".shards"
+
+USER_FIELDS = [
+    "user_id",
+    "first_name",
+    "last_name",
+    "email",
+    "country",
+    "signup_date",
+    "segment",
+    "is_active",
+    "loyalty_score",
+]
+PRODUCT_FIELDS = [
+    "product_id",
+    "name",
+    "category",
+    "price",
+    "currency",
+    "inventory_count",
+    "is_active",
+]
+ORDER_FIELDS = [
+    "order_id",
+    "user_id",
+    "order_date",
+    "status",
+    "shipping_method",
+    "discount_amount",
+    "total_amount",
+    "currency",
+]
+ORDER_ITEM_FIELDS = [
+    "order_item_id",
+    "order_id",
+    "product_id",
+    "quantity",
+    "unit_price",
+    "line_total",
+]
+PAYMENT_FIELDS = [
+    "payment_id",
+    "order_id",
+    "payment_date",
+    "amount",
+    "status",
+    "payment_method",
+    "transaction_reference",
+]
+ORDER_TABLE_FIELDS = {
+    "orders.csv": ORDER_FIELDS,
+    "order_items.csv": ORDER_ITEM_FIELDS,
+    "payments.csv": PAYMENT_FIELDS,
+}
+DATASET_FIELDS = {"users.csv": USER_FIELDS, "products.csv": PRODUCT_FIELDS, **ORDER_TABLE_FIELDS}
+# Value types of the non-text columns in the columnar copies, as declared in db/schema.sql.
+COLUMN_TYPES: Dict[str, Callable[[str], Any]] = {
+    "loyalty_score": int,
+    "price": float,
+    "inventory_count": int,
+    "discount_amount": float,
+    "total_amount": float,
+    "quantity": int,
+    "unit_price": float,
+    "line_total": float,
+    "amount": float,
+}
+BACKENDS = ["python", "numpy"]
 
 
 def parse_args() -> argparse.Namespace:
@@ -27,14 +108,92 @@ def parse_args() -> argparse.Namespace:
         default=str(BASE_DIR),
         help="Directory where CSV files will be written.",
     )
+    parser.add_argument(
+        "--users",
+        type=int,
+        default=None,
+        help=f"Number of users to generate (default: {DEFAULT_USER_COUNT} x --scale).",
+    )
+    parser.add_argument(
+        "--products",
+        type=int,
+        default=None,
+        help=f"Number of products to generate (default: {DEFAULT_PRODUCT_COUNT}).",
+    )
+    parser.add_argument(
+        "--scale",
+        type=float,
+        default=1.0,
+        help="Multiplier applied to the default user count; orders scale with users.",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Split users into this many seeded shards generated in parallel (1 = serial).",
+    )
+    parser.add_argument(
+        "--backend",
+        choices=BACKENDS,
+        default="python",
+        help="Order synthesis engine; 'numpy' draws rows in vectorized chunks.",
+    )
+    parser.add_argument(
+        "--no-manifest",
+        action="store_true",
+        help="Skip writing manifest.json (row counts, sizes and SHA-1 per CSV).",
+    )
+    parser.add_argument(
+        "--columnar",
+        action="store_true",
+        help=(
+            "Also write a typed, dictionary-encoded .col copy of each CSV for fast ingestion, "
+            "from the same generated rows."
+        ),
+    )
+    add_profile_args(parser)
     return parser.parse_args()
 
 
-def create_id(prefix: str, idx: int) -> str:
-    return f"{prefix}-{idx:05d}"
+def resolve_counts(args: argparse.Namespace) -> Tuple[int, int]:
+    if args.scale <= 0:
+        raise SystemExit("--scale must be positive.")
+    users = args.users if args.users is not None else max(1, round(DEFAULT_USER_COUNT * args.scale))
+    products = args.products if args.products is not None else DEFAULT_PRODUCT_COUNT
+    if users < 1 or products < 1:
+        raise SystemExit("--users and --products must be at least 1.")
+    return users, products
+
+
+def create_id(prefix: str, idx: int, shard: int | None = None) -> str:
+    if shard is None:
+        return f"{prefix}-{idx:05d}"
+    return f"{prefix}-S{shard:03d}-{idx:05d}"
+
+
+def derive_shard_seed(seed: int, shard: int) -> int:
+    digest = hashlib.sha256(f"{seed}:{shard}".encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big")
 
 
-def generate_users(rng: random.Random, count: int = 95) -> List[UserRow]:
+def shard_user_ranges(user_count: int, shards: int) -> List[Tuple[int, int]]:
+    """Split users 1..user_count into contiguous (start, count) ranges."""
+    shards = max(1, min(shards, user_count))
+    base, extra = divmod(user_count, shards)
+    ranges: List[Tuple[int, int]] = []
+    start = 1
+    for shard in range(shards):
+        count = base + (1 if shard < extra else 0)
+        ranges.append((start, count))
+        start += count
+    return ranges
+
+
+def generate_users(
+    rng: random.Random,
+    count: int = DEFAULT_USER_COUNT,
+    start: int = 1,
+) -> Iterator[UserRow]:
     first_names = [
         "Ava",
         "Ethan",
@@ -62,30 +221,26 @@ def generate_users(rng: random.Random, count: int = 95) -> List[UserRow]:
     countries = ["US", "CA", "DE", "IN", "GB", "AU", "BR", "NL", "FR"]
     segments = ["consumer", "business", "vip"]
     base_date = datetime(2023, 1, 1)
-    users: List[UserRow] = []
-    for idx in range(1, count + 1):
+    for idx in range(start, start + count):
         first = rng.choice(first_names)
         last = rng.choice(last_names)
         signup_date = base_date + timedelta(days=rng.randint(0, 640))
-        users.append(
-            {
-                "user_id": create_id("USR", idx),
-                "first_name": first,
-                "last_name": last,
-                "email": f"{first.lower()}.{last.lower()}{idx}@example.com",
-                "country": rng.choice(countries),
-                "signup_date": signup_date.strftime("%Y-%m-%d"),
-                "segment": rng.choices(
-                    segments, weights=[0.7, 0.2, 0.1], k=1
-                )[0],
-                "is_active": "true" if rng.random() > 0.1 else "false",
-                "loyalty_score": str(rng.randint(100, 980)),
-            }
-        )
-    return users
+        yield {
+            "user_id": create_id("USR", idx),
+            "first_name": first,
+            "last_name": last,
+            "email": f"{first.lower()}.{last.lower()}{idx}@example.com",
+            "country": rng.choice(countries),
+            "signup_date": signup_date.strftime("%Y-%m-%d"),
+            "segment": rng.choices(
+                segments, weights=[0.7, 0.2, 0.1], k=1
+            )[0],
+            "is_active": "true" if rng.random() > 0.1 else "false",
+            "loyalty_score": str(rng.randint(100, 980)),
+        }
 
 
-def generate_products(rng: random.Random, count: int = 32) -> List[ProductRow]:
+def generate_products(rng: random.Random, count: int = DEFAULT_PRODUCT_COUNT) -> List[ProductRow]:
     categories = {
         "Electronics": ["Smart Speaker", "Noise-canceling Headphones", "Drone Mini"],
         "Home": ["Air Purifier", "Smart Thermostat", "Espresso Maker"],
@@ -131,13 +286,10 @@ def generate_products(rng: random.Random, count: int = 32) -> List[ProductRow]:
 
 def generate_orders(
     rng: random.Random,
-    users: List[UserRow],
+    users: Iterable[UserRow],
     products: List[ProductRow],
-) -> Tuple[List[OrderRow], List[OrderItemRow], List[PaymentRow]]:
-    orders: List[OrderRow] = []
-    order_items: List[OrderItemRow] = []
-    payments: List[PaymentRow] = []
-
+    shard: int | None = None,
+) -> Iterator[OrderBundle]:
     order_statuses = ["processing", "completed", "cancelled"]
     shipping_methods = ["standard", "express", "priority"]
     payment_methods = ["card", "ach", "paypal", "wallet"]
@@ -151,21 +303,20 @@ def generate_orders(
         order_count = rng.randint(0, 5 if user["segment"] != "vip" else 7)
         for _ in range(order_count):
             order_date = base_order_date + timedelta(days=rng.randint(0, 450))
-            order_id = create_id("ORD", order_idx)
+            order_id = create_id("ORD", order_idx, shard)
             status = rng.choices(order_statuses, weights=[0.2, 0.7, 0.1], k=1)[0]
             discount = round(rng.uniform(0, 45), 2)
-            orders.append(
-                {
-                    "order_id": order_id,
-                    "user_id": user["user_id"],
-                    "order_date": order_date.strftime("%Y-%m-%d"),
-                    "status": status,
-                    "shipping_method": rng.choice(shipping_methods),
-                    "discount_amount": f"{discount:.2f}",
-                    "currency": "USD",
-                    "total_amount": "0.00",  # placeholder updated after items
-                }
-            )
+            order: OrderRow = {
+                "order_id": order_id,
+                "user_id": user["user_id"],
+                "order_date": order_date.strftime("%Y-%m-%d"),
+                "status": status,
+                "shipping_method": rng.choice(shipping_methods),
+                "discount_amount": f"{discount:.2f}",
+                "currency": "USD",
+                "total_amount": "0.00",  # placeholder updated after items
+            }
+            items: List[OrderItemRow] = []
             item_count = rng.randint(1, 4)
             order_total = 0.0
             for _ in range(item_count):
@@ -173,9 +324,9 @@ def generate_orders(
                 quantity = rng.randint(1, 3)
                 unit_price = float(product["price"])
                 line_total = unit_price * quantity
-                order_items.append(
+                items.append(
                     {
-                        "order_item_id": create_id("ITM", order_item_idx),
+                        "order_item_id": create_id("ITM", order_item_idx, shard),
                         "order_id": order_id,
                         "product_id": product["product_id"],
                         "quantity": str(quantity),
@@ -186,7 +337,7 @@ def generate_orders(
                 order_total += line_total
                 order_item_idx += 1
             order_total = max(0.0, order_total - discount)
-            orders[-1]["total_amount"] = f"{order_total:.2f}"
+            order["total_amount"] = f"{order_total:.2f}"
 
             payment_status = (
                 "succeeded"
@@ -195,92 +346,268 @@ def generate_orders(
             )
             payment_amount = order_total if payment_status == "succeeded" else order_total * rng.uniform(0.1, 0.9)
             payment_date = order_date + timedelta(days=rng.randint(0, 5))
-            payments.append(
-                {
-                    "payment_id": create_id("PAY", payment_idx),
-                    "order_id": order_id,
-                    "payment_date": payment_date.strftime("%Y-%m-%d"),
-                    "amount": f"{payment_amount:.2f}",
-                    "status": payment_status,
-                    "payment_method": rng.choice(payment_methods),
-                    "transaction_reference": f"TXN{rng.randint(100000, 999999)}",
-                }
-            )
+            payment: PaymentRow = {
+                "payment_id": create_id("PAY", payment_idx, shard),
+                "order_id": order_id,
+                "payment_date": payment_date.strftime("%Y-%m-%d"),
+                "amount": f"{payment_amount:.2f}",
+                "status": payment_status,
+                "payment_method": rng.choice(payment_methods),
+                "transaction_reference": f"TXN{rng.randint(100000, 999999)}",
+            }
+            yield order, items, payment
             payment_idx += 1
             order_idx += 1
-    return orders, order_items, payments
-
-
-def build_datasets(rng: random.Random) -> Dict[str, Tuple[List[str], Iterable[Dict[str, str]]]]:
-    users = generate_users(rng)
-    products = generate_products(rng)
-    orders, order_items, payments = generate_orders(rng, users, products)
-
-    datasets: Dict[str, Tuple[List[str], Iterable[Dict[str, str]]]] = {
-        "users.csv": (
-            [
-                "user_id",
-                "first_name",
-                "last_name",
-                "email",
-                "country",
-                "signup_date",
-                "segment",
-                "is_active",
-                "loyalty_score",
-            ],
-            users,
-        ),
-        "products.csv": (
-            [
-                "product_id",
-                "name",
-                "category",
-                "price",
-                "currency",
-                "inventory_count",
-                "is_active",
-            ],
-            products,
-        ),
-        "orders.csv": (
-            [
-                "order_id",
-                "user_id",
-                "order_date",
-                "status",
-                "shipping_method",
-                "discount_amount",
-                "total_amount",
-                "currency",
-            ],
-            orders,
-        ),
-        "order_items.csv": (
-            [
-                "order_item_id",
-                "order_id",
-                "product_id",
-                "quantity",
-                "unit_price",
-                "line_total",
-            ],
-            order_items,
-        ),
-        "payments.csv": (
-            [
-                "payment_id",
-                "order_id",
-                "payment_date",
-                "amount",
-                "status",
-                "payment_method",
-                "transaction_reference",
-            ],
-            payments,
-        ),
+
+
+def replay_users(rng_state: tuple, count: int, start: int = 1) -> Iterator[UserRow]:
+    # Users are regenerated from a saved RNG state instead of being held in memory,
+    # so order generation can walk them again without an O(users) list.
+    replay_rng = random.Random()
+    replay_rng.setstate(rng_state)
+    return generate_users(replay_rng, count, start)
+
+
+def track_vip_flags(users: Iterable[UserRow], flags: bytearray) -> Iterator[UserRow]:
+    # One byte per user is all the numpy backend needs to draw order counts.
+    for user in users:
+        flags.append(1 if user["segment"] == "vip" else 0)
+        yield user
+
+
+def columnar_row(fields: Sequence[str]) -> Callable[[Dict[str, str]], List[Any]]:
+    """Converter from a generated row dict to a ``.col`` row, typed per ``COLUMN_TYPES``."""
+    typed = [
+        (index, COLUMN_TYPES[field]) for index, field in enumerate(fields) if field in COLUMN_TYPES
+    ]
+
+    def convert(row: Dict[str, str]) -> List[Any]:
+        values = [row[field] for field in fields]
+        for index, to_type in typed:
+            values[index] = to_type(values[index])
+        return values
+
+    return convert
+
+
+def tee_columnar(
+    rows: Iterable[Dict[str, str]], writer: ColumnarWriter
+) -> Iterator[Dict[str, str]]:
+    """Pass rows through unchanged, adding each one to ``writer`` on the way."""
+    convert = columnar_row(writer.columns)
+    for row in rows:
+        writer.write_rows((convert(row),))
+        yield row
+
+
+def write_table(
+    output_dir: Path,
+    filename: str,
+    fields: List[str],
+    rows: Iterable[Dict[str, str]],
+    columnar: bool = False,
+) -> Dict[str, FileStats]:
+    """Write one dataset CSV and, with ``columnar``, its ``.col`` copy from the same rows."""
+    if not columnar:
+        return {filename: write_csv(output_dir / filename, fields, rows)}
+    with ColumnarWriter(output_dir / columnar_name(filename), fields) as copy:
+        stats = {filename: write_csv(output_dir / filename, fields, tee_columnar(rows, copy))}
+    stats[copy.path.name] = copy.stats()
+    return stats
+
+
+def write_order_tables(
+    output_dir: Path, bundles: Iterable[OrderBundle], columnar: bool = False
+) -> Dict[str, FileStats]:
+    with ExitStack() as stack:
+        sinks = []
+        writers = []
+        copies = []
+        for filename, header in ORDER_TABLE_FIELDS.items():
+            sink = stack.enter_context(TrackedFile(output_dir / filename))
+            writer = csv.DictWriter(sink, fieldnames=header)
+            writer.writeheader()
+            sinks.append(sink)
+            writers.append(writer)
+            if columnar:
+                copies.append(
+                    stack.enter_context(
+                        ColumnarWriter(output_dir / columnar_name(filename), header)
+                    )
+                )
+        order_writer, item_writer, payment_writer = writers
+        if copies:
+            order_copy, item_copy, payment_copy = copies
+            to_order, to_item, to_payment = (columnar_row(copy.columns) for copy in copies)
+        order_count = item_count = 0
+        for order, items, payment in bundles:
+            order_writer.writerow(order)
+            item_writer.writerows(items)
+            payment_writer.writerow(payment)
+            if copies:
+                order_copy.write_rows((to_order(order),))
+                item_copy.write_rows(map(to_item, items))
+                payment_copy.write_rows((to_payment(payment),))
+            order_count += 1
+            item_count += len(items)
+        order_sink, item_sink, payment_sink = sinks
+        order_sink.rows = payment_sink.rows = order_count
+        item_sink.rows = item_count
+    stats = {sink.path.name: sink.stats() for sink in sinks}
+    stats.update((copy.path.name, copy.stats()) for copy in copies)
+    return stats
+
+
+def write_datasets(
+    rng: random.Random,
+    output_dir: Path,
+    user_count: int = DEFAULT_USER_COUNT,
+    product_count: int = DEFAULT_PRODUCT_COUNT,
+    backend: str = "python",
+    columnar: bool = False,
+) -> Dict[str, FileStats]:
+    """Write the five dataset CSVs; ``columnar`` tees each table's rows into a ``.col`` copy."""
+    # Draw order matches the original list-based builder (users, products, orders),
+    # so a given seed still yields byte-identical CSVs.
+    column_types = COLUMN_TYPES if columnar else None
+    users_state = rng.getstate()
+    vip_flags = bytearray()
+    users = generate_users(rng, user_count)
+    if backend == "numpy":
+        users = track_vip_flags(users, vip_flags)
+    with stage_timer("write_users"):
+        stats = write_table(output_dir, "users.csv", USER_FIELDS, users, columnar)
+
+    with stage_timer("write_products"):
+        products = generate_products(rng, product_count)
+        stats.update(write_table(output_dir, "products.csv", PRODUCT_FIELDS, products, columnar))
+
+    with stage_timer("write_order_tables", backend):
+        if backend == "numpy":
+            stats.update(
+                write_vectorized_order_tables(
+                    output_dir,
+                    ORDER_TABLE_FIELDS,
+                    1,
+                    vip_flags,
+                    products,
+                    rng.getrandbits(64),
+                    column_types=column_types,
+                )
+            )
+        else:
+            stats.update(
+                write_order_tables(
+                    output_dir,
+                    generate_orders(rng, replay_users(users_state, user_count), products),
+                    columnar,
+                )
+            )
+    return stats
+
+
+SHARDED_FILES = ["users.csv", "orders.csv", "order_items.csv", "payments.csv"]
+
+
+def generate_shard(
+    task: Tuple[int, int, int, int, List[ProductRow], str, str, bool]
+) -> Dict[str, FileStats]:
+    shard, seed, start, count, products, shard_dir, backend, columnar = task
+    rng = random.Random(derive_shard_seed(seed, shard))
+    output_dir = Path(shard_dir) / f"shard-{shard:04d}"
+    users_state = rng.getstate()
+    vip_flags = bytearray()
+    users = generate_users(rng, count, start)
+    if backend == "numpy":
+        users = track_vip_flags(users, vip_flags)
+    stats = write_table(output_dir, "users.csv", USER_FIELDS, users, columnar)
+    if backend == "numpy":
+        stats.update(
+            write_vectorized_order_tables(
+                output_dir,
+                ORDER_TABLE_FIELDS,
+                start,
+                vip_flags,
+                products,
+                rng.getrandbits(64),
+                shard,
+                column_types=COLUMN_TYPES if columnar else None,
+            )
+        )
+    else:
+        stats.update(
+            write_order_tables(
+                output_dir,
+                generate_orders(rng, replay_users(users_state, count, start), products, shard),
+                columnar,
+            )
+        )
+    return stats
+
+
+def merge_shards(
+    output_dir: Path, shard_dir: Path, shard_stats: List[Dict[str, FileStats]]
+) -> Dict[str, FileStats]:
+    headers = {"users.csv": USER_FIELDS, **ORDER_TABLE_FIELDS}
+    merged: Dict[str, FileStats] = {}
+    for filename in SHARDED_FILES:
+        with TrackedFile(output_dir / filename) as out:
+            csv.writer(out).writerow(headers[filename])
+            for shard, stats in enumerate(shard_stats):
+                part = shard_dir / f"shard-{shard:04d}" / filename
+                with part.open("r", newline="", encoding="utf-8") as fh:
+                    fh.readline()
+                    shutil.copyfileobj(fh, out, 1024 * 1024)
+                out.rows += stats[filename]["rows"]
+        merged[filename] = out.stats()
+        name = columnar_name(filename)
+        if name in shard_stats[0]:
+            # Shard chunks are decoded and re-chunked, never parsed from text.
+            with ColumnarWriter(output_dir / name, headers[filename]) as copy:
+                for shard in range(len(shard_stats)):
+                    for chunk in iter_columnar_chunks(shard_dir / f"shard-{shard:04d}" / name):
+                        copy.write_rows(chunk)
+            merged[name] = copy.stats()
+    return merged
+
+
+def write_sharded_datasets(
+    seed: int,
+    output_dir: Path,
+    user_count: int,
+    product_count: int,
+    workers: int,
+    backend: str = "python",
+    columnar: bool = False,
+) -> Dict[str, FileStats]:
+    # Each shard owns a contiguous user range and its own derived seed; order, item and
+    # payment IDs carry the shard number so they stay unique without coordination.
+    products = generate_products(random.Random(seed), product_count)
+    products_stats = write_table(output_dir, "products.csv", PRODUCT_FIELDS, products, columnar)
+
+    ranges = shard_user_ranges(user_count, workers)
+    shard_dir = output_dir / SHARD_DIR_NAME
+    if shard_dir.exists():
+        shutil.rmtree(shard_dir)
+    tasks = [
+        (shard, seed, start, count, products, str(shard_dir), backend, columnar)
+        for shard, (start, count) in enumerate(ranges)
+    ]
+    try:
+        with stage_timer("generate_shards"), ProcessPoolExecutor(max_workers=workers) as pool:
+            shard_stats = list(pool.map(generate_shard, tasks))
+        with stage_timer("merge_shards"):
+            merged = merge_shards(output_dir, shard_dir, shard_stats)
+    finally:
+        shutil.rmtree(shard_dir, ignore_errors=True)
+    stats = {**merged, **products_stats}
+    # Same order as write_datasets(): each CSV, then its .col copy.
+    return {
+        name: stats[name]
+        for filename in DATASET_FIELDS
+        for name in (filename, columnar_name(filename))
+        if name in stats
     }
-    return datasets
 
 
 def main() -> None:
@@ -291,23 +618,72 @@ def main() -> None:
         logger.error("Use --generate to produce datasets.")
         raise SystemExit(1)
 
-    rng = random.Random(args.seed)
+    user_count, product_count = resolve_counts(args)
+    if args.workers < 1:
+        raise SystemExit("--workers must be at least 1.")
+    if args.backend == "numpy" and not numpy_available():
+        raise SystemExit("--backend numpy requires NumPy (pip install numpy).")
     output_dir = Path(args.output_dir)
     output_dir.mkdir(parents=True, exist_ok=True)
-    logger.info("Generating datasets in %s", output_dir)
+    logger.info(
+        "Generating datasets in %s (%s users, %s products)",
+        output_dir,
+        user_count,
+        product_count,
+    )
 
-    datasets = build_datasets(rng)
-    total_rows = 0
-    for filename, (header, rows) in datasets.items():
-        path = output_dir / filename
-        write_csv(path, header, rows)
-        row_count = sum(1 for _ in csv.DictReader(path.open("r", encoding="utf-8")))
-        total_rows += row_count
-        logger.info("Wrote %s (%s rows)", filename, row_count)
+    try:
+        with profiled("generate_data", args, logger):
+            # Order tables are written interleaved, so per-file rows and bytes share a timing.
+            with stage_timer("write_datasets"):
+                if args.workers > 1:
+                    logger.info("Using %s worker shards", args.workers)
+                    file_stats = write_sharded_datasets(
+                        args.seed,
+                        output_dir,
+                        user_count,
+                        product_count,
+                        args.workers,
+                        args.backend,
+                        args.columnar,
+                    )
+                else:
+                    file_stats = write_datasets(
+                        random.Random(args.seed),
+                        output_dir,
+                        user_count,
+                        product_count,
+                        args.backend,
+                        args.columnar,
+                    )
+            total_rows = 0
+            for filename, stats in file_stats.items():
+                if filename.endswith(COLUMNAR_SUFFIX):
+                    # The .col copies repeat the CSV rows; their time is part of write_datasets.
+                    stage = "write_columnar"
+                else:
+                    stage = "write_datasets"
+                    total_rows += stats["rows"]
+                METRICS.count(stage, filename, rows=stats["rows"], nbytes=stats["bytes"])
+                logger.info("Wrote %s (%s rows, %s bytes)", filename, stats["rows"], stats["bytes"])
+
+            if not args.no_manifest:
+                with stage_timer("write_manifest"):
+                    manifest_path = write_manifest(
+                        output_dir,
+                        file_stats,
+                        seed=args.seed,
+                        users=user_count,
+                        products=product_count,
+                        workers=args.workers,
+                        backend=args.backend,
+                    )
+                logger.info("Wrote %s", manifest_path.name)
+    finally:
+        write_metrics("generate_data")
 
     logger.info("Generation complete. Total rows: %s", total_rows)
 
 
 if __name__ == "__main__":
     main()
-
@@ -0,0 +1,187 @@
+"""
+NumPy backend for order/item/payment synthesis.
+
+Draws whole chunks of users at once and formats CSV columns in bulk. The
+distributions mirror ``generate_orders`` (segment-dependent order counts,
+status/payment weights, discount and quantity ranges) but the random stream
+differs, so output is reproducible per seed, not identical to the Python path.
+"""
+
+import csv
+from contextlib import ExitStack
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Mapping, Optional, Sequence
+
+from utils.columnar import ColumnarWriter, columnar_name
+from utils.helpers import TrackedFile
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - optional dependency
+    np = None
+
+
+ORDER_STATUSES = ["processing", "completed", "cancelled"]
+ORDER_STATUS_WEIGHTS = [0.2, 0.7, 0.1]
+SHIPPING_METHODS = ["standard", "express", "priority"]
+PAYMENT_METHODS = ["card", "ach", "paypal", "wallet"]
+PAYMENT_STATUSES = ["succeeded", "failed", "refunded"]
+CANCELLED = ORDER_STATUSES.index("cancelled")
+SUCCEEDED = PAYMENT_STATUSES.index("succeeded")
+DEFAULT_CHUNK_USERS = 50_000
+
+
+def numpy_available() -> bool:
+    return np is not None
+
+
+def _format_ids(prefix: str, indexes: "np.ndarray") -> "np.ndarray":
+    return np.char.add(prefix, np.char.zfill(indexes.astype(str), 5))
+
+
+def _id_prefix(prefix: str, shard: int | None) -> str:
+    # Matches create_id() in generate_data.py.
+    return f"{prefix}-" if shard is None else f"{prefix}-S{shard:03d}-"
+
+
+def _money(values: "np.ndarray") -> "np.ndarray":
+    return np.char.mod("%.2f", values)
+
+
+def _dates(values: "np.ndarray") -> "np.ndarray":
+    return values.astype("datetime64[D]").astype(str)
+
+
+def synthesize_chunk(
+    rng: "np.random.Generator",
+    user_indexes: "np.ndarray",
+    vip: "np.ndarray",
+    product_ids: "np.ndarray",
+    prices: "np.ndarray",
+    counters: Dict[str, int],
+    shard: int | None = None,
+) -> Dict[str, List[List[str]]]:
+    order_counts = rng.integers(0, np.where(vip, 7, 5), endpoint=True)
+    n_orders = int(order_counts.sum())
+    order_user = np.repeat(user_indexes, order_counts)
+
+    order_dates = np.datetime64("2023-06-01") + rng.integers(0, 450, n_orders, endpoint=True)
+    status = rng.choice(len(ORDER_STATUSES), size=n_orders, p=ORDER_STATUS_WEIGHTS)
+    shipping = rng.integers(0, len(SHIPPING_METHODS), n_orders)
+    discount = np.round(rng.uniform(0, 45, n_orders), 2)
+
+    item_counts = rng.integers(1, 4, n_orders, endpoint=True)
+    n_items = int(item_counts.sum())
+    item_order = np.repeat(np.arange(n_orders), item_counts)
+    product_pick = rng.integers(0, len(product_ids), n_items)
+    quantity = rng.integers(1, 3, n_items, endpoint=True)
+    unit_price = prices[product_pick]
+    line_total = unit_price * quantity
+
+    order_total = np.maximum(0.0, np.bincount(item_order, weights=line_total, minlength=n_orders) - discount)
+
+    fallback_status = rng.integers(0, len(PAYMENT_STATUSES), n_orders)
+    succeeded = (status != CANCELLED) & (rng.random(n_orders) > 0.08)
+    payment_status = np.where(succeeded, SUCCEEDED, fallback_status)
+    partial = order_total * rng.uniform(0.1, 0.9, n_orders)
+    payment_amount = np.where(payment_status == SUCCEEDED, order_total, partial)
+    payment_dates = order_dates + rng.integers(0, 5, n_orders, endpoint=True)
+    payment_method = rng.integers(0, len(PAYMENT_METHODS), n_orders)
+    txn = rng.integers(100000, 999999, n_orders, endpoint=True)
+
+    order_ids = _format_ids(
+        _id_prefix("ORD", shard), np.arange(counters["order"], counters["order"] + n_orders)
+    )
+    item_ids = _format_ids(
+        _id_prefix("ITM", shard), np.arange(counters["item"], counters["item"] + n_items)
+    )
+    payment_ids = _format_ids(
+        _id_prefix("PAY", shard), np.arange(counters["order"], counters["order"] + n_orders)
+    )
+    counters["order"] += n_orders
+    counters["item"] += n_items
+
+    order_currency = ["USD"] * n_orders
+    return {
+        "orders.csv": [
+            order_ids.tolist(),
+            _format_ids("USR-", order_user).tolist(),
+            _dates(order_dates).tolist(),
+            np.array(ORDER_STATUSES)[status].tolist(),
+            np.array(SHIPPING_METHODS)[shipping].tolist(),
+            _money(discount).tolist(),
+            _money(order_total).tolist(),
+            order_currency,
+        ],
+        "order_items.csv": [
+            item_ids.tolist(),
+            order_ids[item_order].tolist(),
+            product_ids[product_pick].tolist(),
+            quantity.astype(str).tolist(),
+            _money(unit_price).tolist(),
+            _money(line_total).tolist(),
+        ],
+        "payments.csv": [
+            payment_ids.tolist(),
+            order_ids.tolist(),
+            _dates(payment_dates).tolist(),
+            _money(payment_amount).tolist(),
+            np.array(PAYMENT_STATUSES)[payment_status].tolist(),
+            np.array(PAYMENT_METHODS)[payment_method].tolist(),
+            np.char.add("TXN", txn.astype(str)).tolist(),
+        ],
+    }
+
+
+def write_vectorized_order_tables(
+    output_dir: Path,
+    headers: Dict[str, Sequence[str]],
+    user_start: int,
+    vip_flags: bytearray,
+    products: List[Dict[str, str]],
+    seed: int,
+    shard: int | None = None,
+    chunk_users: int = DEFAULT_CHUNK_USERS,
+    column_types: Optional[Mapping[str, Callable[[str], Any]]] = None,
+) -> Dict[str, Dict[str, Any]]:
+    """Write the order tables; ``column_types`` also writes each one's ``.col`` copy."""
+    if np is None:
+        raise RuntimeError("The numpy backend requires NumPy (pip install numpy).")
+    rng = np.random.default_rng(seed)
+    vip_all = np.frombuffer(bytes(vip_flags), dtype=np.uint8).astype(bool)
+    product_ids = np.array([product["product_id"] for product in products])
+    # Round-trip through the formatted price so unit_price matches products.csv.
+    prices = np.array([float(product["price"]) for product in products])
+    counters = {"order": 1, "item": 1}
+
+    with ExitStack() as stack:
+        sinks = {}
+        writers = {}
+        copies = {}
+        for filename, header in headers.items():
+            sinks[filename] = stack.enter_context(TrackedFile(output_dir / filename))
+            writers[filename] = csv.writer(sinks[filename])
+            writers[filename].writerow(header)
+            if column_types is not None:
+                copies[filename] = stack.enter_context(
+                    ColumnarWriter(output_dir / columnar_name(filename), header)
+                )
+        for offset in range(0, len(vip_all), chunk_users):
+            vip = vip_all[offset : offset + chunk_users]
+            user_indexes = np.arange(user_start + offset, user_start + offset + len(vip))
+            columns = synthesize_chunk(rng, user_indexes, vip, product_ids, prices, counters, shard)
+            for filename, writer in writers.items():
+                writer.writerows(zip(*columns[filename]))
+                sinks[filename].rows += len(columns[filename][0])
+                if filename in copies:
+                    # Typed from the formatted strings, so the copy matches the CSV exactly.
+                    typed = [
+                        list(map(column_types[field], column))
+                        if field in column_types
+                        else column
+                        for field, column in zip(headers[filename], columns[filename])
+                    ]
+                    copies[filename].write_rows(zip(*typed))
+    stats = {filename: sink.stats() for filename, sink in sinks.items()}
+    stats.update((copy.path.name, copy.stats()) for copy in copies.values())
+    return stats
@@ -1,268 +1,551 @@
 import argparse
 import json
 import logging
+import re
 import sqlite3
+import time
 from pathlib import Path
-from typing import Any, Dict, List
-
+from typing import Any, Dict, Iterable, List, Tuple
+
+from db.parallel_ingest import iter_parsed_chunks, plan_tasks
+from db.report_engine import (
+    DEFAULT_REPORT_WORKERS,
+    REPORT_ENGINES,
+    fetch_report_data_classic,
+    fetch_report_data_concurrent,
+    fetch_report_data_single_pass,
+)
+from db.profiling import ProfilingConnection, build_profile, log_profile
+from db.rollups import (
+    RollupsUnavailable,
+    build_rollups,
+    fetch_report_data_rollups,
+    refresh_rollups,
+    rollups_present,
+)
+from db.storage import (
+    MONEY_COLUMNS,
+    MONEY_STORAGES,
+    apply_money_storage,
+    money_value_sql,
+    read_money_storage,
+    record_money_storage,
+)
+from utils.columnar import columnar_name, iter_columnar_chunks
 from utils.helpers import (
     BASE_DIR,
     DATA_FILES,
     configure_logger,
+    file_fingerprint,
     hash_file_sha1,
+    iter_batches,
+    iter_csv,
+    iter_csv_tuples,
     now_utc_iso,
+    peak_rss_bytes,
     read_csv,
+    read_manifest_entries,
+    read_manifest_row_counts,
     write_json,
 )
+from utils.metrics import METRICS, stage_timer, timed, write_metrics
+from utils.profilers import add_profile_args, profiled
 
 
+DATA_DIR = BASE_DIR
 DB_PATH = BASE_DIR / "db" / "ecommerce.db"
 SCHEMA_PATH = BASE_DIR / "db" / "schema.sql"
+SCHEMA_PATHS = {
+    "standard": SCHEMA_PATH,
+    "analytics": BASE_DIR / "db" / "schema_analytics.sql",
+}
 REPORT_MD = BASE_DIR / "report.md"
 REPORT_JSON = BASE_DIR / "report.json"
+REPORT_PROFILE = BASE_DIR / "report_profile.json"
+DEFAULT_BATCH_SIZE = 5000
+INPUT_FORMATS = ["csv", "columnar"]
+# Bulk-load settings for --fast-load. journal_mode=MEMORY keeps ROLLBACK working while
+# skipping the on-disk journal; the database is rebuilt from CSVs if a load is interrupted.
+FAST_LOAD_PRAGMAS = [
+    "PRAGMA journal_mode = MEMORY",
+    "PRAGMA synchronous = OFF",
+    "PRAGMA cache_size = -262144",
+    "PRAGMA temp_store = MEMORY",
+]
+# Journal mode a loaded database is left in; set here, on the write side, and never by readers.
+JOURNAL_MODE = "WAL"
+INDEX_STATEMENT = re.compile(r"CREATE\s+(?:UNIQUE\s+)?INDEX\b[^;]*;", re.IGNORECASE)
+
+# Insert order respects foreign keys: parents before children.
+TABLE_COLUMNS: Dict[str, Tuple[str, List[str]]] = {
+    "users.csv": (
+        "users",
+        [
+            "user_id",
+            "first_name",
+            "last_name",
+            "email",
+            "country",
+            "signup_date",
+            "segment",
+            "is_active",
+            "loyalty_score",
+        ],
+    ),
+    "products.csv": (
+        "products",
+        ["product_id", "name", "category", "price", "currency", "inventory_count", "is_active"],
+    ),
+    "orders.csv": (
+        "orders",
+        [
+            "order_id",
+            "user_id",
+            "order_date",
+            "status",
+            "shipping_method",
+            "discount_amount",
+            "total_amount",
+            "currency",
+        ],
+    ),
+    "order_items.csv": (
+        "order_items",
+        ["order_item_id", "order_id", "product_id", "quantity", "unit_price", "line_total"],
+    ),
+    "payments.csv": (
+        "payments",
+        [
+            "payment_id",
+            "order_id",
+            "payment_date",
+            "amount",
+            "status",
+            "payment_method",
+            "transaction_reference",
+        ],
+    ),
+}
 
 
 def parse_args() -> argparse.Namespace:
     parser = argparse.ArgumentParser(description="Ingest CSV files into SQLite.")
     parser.add_argument("--ingest", action="store_true", help="Run ingestion pipeline.")
     parser.add_argument("--report", action="store_true", help="Generate report output.")
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Stream each CSV into SQLite in bounded batches instead of loading it fully.",
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=DEFAULT_BATCH_SIZE,
+        help="Rows per executemany batch in --stream mode.",
+    )
+    parser.add_argument(
+        "--fast-load",
+        action="store_true",
+        help=(
+            "Bulk-load positional rows with tuned pragmas, deferred indexes and one "
+            "foreign key check at the end."
+        ),
+    )
+    parser.add_argument(
+        "--input-format",
+        choices=INPUT_FORMATS,
+        default="csv",
+        help=(
+            "'columnar' loads the typed .col files written by generate_data.py --columnar, "
+            "chunk by chunk, without parsing any text."
+        ),
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Upsert new/changed rows into the existing database, skipping unchanged CSVs.",
+    )
+    parser.add_argument(
+        "--rollups",
+        action="store_true",
+        help=(
+            "Build the rollup tables read by --report-engine rollups and "
+            "run_query.py --rollups; --incremental keeps existing rollups current."
+        ),
+    )
+    parser.add_argument(
+        "--schema",
+        choices=sorted(SCHEMA_PATHS),
+        default="standard",
+        help="Table layout; 'analytics' adds covering indexes on the join and cohort columns.",
+    )
+    parser.add_argument(
+        "--parse-workers",
+        type=int,
+        default=0,
+        help="Parse and type-convert CSV chunks in this many worker processes (0 = inline).",
+    )
+    parser.add_argument(
+        "--money-storage",
+        choices=MONEY_STORAGES,
+        default="real",
+        help="Store currency columns as REAL dollars or exact INTEGER cents.",
+    )
+    parser.add_argument(
+        "--report-engine",
+        choices=REPORT_ENGINES,
+        default="classic",
+        help=(
+            "'single-pass' answers every report section from aggregates built once per run; "
+            "'rollups' reads the summary tables built by --ingest --rollups; 'concurrent' runs "
+            "the classic sections in parallel on read-only connections."
+        ),
+    )
+    parser.add_argument(
+        "--report-workers",
+        type=int,
+        default=DEFAULT_REPORT_WORKERS,
+        help="Threads and read-only connections for --report-engine concurrent.",
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help=(
+            "Record EXPLAIN QUERY PLAN, wall time and rows per report statement "
+            "in report_profile.json."
+        ),
+    )
+    add_profile_args(parser)
     return parser.parse_args()
 
 
-def load_csv_data() -> Dict[str, List[Dict[str, str]]]:
-    data: Dict[str, List[Dict[str, str]]] = {}
+def resolve_csv_paths(input_format: str = "csv") -> Dict[str, Path]:
+    """Data file per CSV name; the ``.col`` copy of each CSV for the columnar format."""
+    paths: Dict[str, Path] = {}
     for filename in DATA_FILES:
-        path = BASE_DIR / filename
+        path = DATA_DIR / (columnar_name(filename) if input_format == "columnar" else filename)
         if not path.exists():
-            raise FileNotFoundError(f"Expected CSV {filename} not found in {BASE_DIR}")
-        data[filename] = read_csv(path)
+            raise FileNotFoundError(f"Expected data file {path.name} not found in {DATA_DIR}")
+        paths[filename] = path
+    return paths
+
+
+def load_csv_data() -> Dict[str, List[Dict[str, str]]]:
+    data: Dict[str, List[Dict[str, str]]] = {}
+    for filename, path in resolve_csv_paths().items():
+        with stage_timer("load_csv_data", filename):
+            data[filename] = read_csv(path)
+        METRICS.count(
+            "load_csv_data", filename, rows=len(data[filename]), nbytes=path.stat().st_size
+        )
     return data
 
 
-def reset_database(logger: logging.Logger) -> sqlite3.Connection:
+def split_schema(schema_sql: str) -> Tuple[str, List[str]]:
+    """Separate CREATE INDEX statements so they can be built after a bulk load."""
+    index_statements = INDEX_STATEMENT.findall(schema_sql)
+    return INDEX_STATEMENT.sub("", schema_sql), index_statements
+
+
+def reset_database(
+    logger: logging.Logger,
+    fast_load: bool = False,
+    schema: str = "standard",
+    money_storage: str = "real",
+) -> Tuple[sqlite3.Connection, List[str]]:
     if DB_PATH.exists():
         logger.info("Removing existing database at %s", DB_PATH)
         DB_PATH.unlink()
+    # WAL sidecars left by readers of the previous database.
+    for suffix in ("-wal", "-shm"):
+        DB_PATH.with_name(DB_PATH.name + suffix).unlink(missing_ok=True)
     conn = sqlite3.connect(DB_PATH)
     conn.execute("PRAGMA foreign_keys = ON;")
-    schema_sql = SCHEMA_PATH.read_text(encoding="utf-8")
+    schema_sql = apply_money_storage(
+        SCHEMA_PATHS[schema].read_text(encoding="utf-8"), money_storage
+    )
+    deferred_indexes: List[str] = []
+    if fast_load:
+        for pragma in FAST_LOAD_PRAGMAS:
+            conn.execute(pragma)
+        schema_sql, deferred_indexes = split_schema(schema_sql)
     conn.executescript(schema_sql)
-    logger.info("Database schema applied.")
-    return conn
+    if fast_load:
+        # schema.sql turns enforcement on; checked once in finish_fast_load() instead.
+        conn.execute("PRAGMA foreign_keys = OFF;")
+    record_money_storage(conn, money_storage)
+    logger.info("Database schema applied (%s, money as %s).", schema, money_storage)
+    return conn, deferred_indexes
+
+
+def finish_fast_load(
+    conn: sqlite3.Connection, deferred_indexes: List[str], logger: logging.Logger
+) -> None:
+    for statement in deferred_indexes:
+        conn.execute(statement)
+    if deferred_indexes:
+        logger.info("Built %s deferred indexes.", len(deferred_indexes))
+    violations = conn.execute("PRAGMA foreign_key_check").fetchall()
+    if violations:
+        table, rowid, parent, _ = violations[0]
+        raise sqlite3.IntegrityError(
+            f"{len(violations)} foreign key violations (first: {table} rowid {rowid} -> {parent})"
+        )
 
 
-def insert_data(conn: sqlite3.Connection, data: Dict[str, List[Dict[str, str]]]) -> None:
-    conn.executemany(
-        """
-        INSERT INTO users (
-            user_id, first_name, last_name, email, country, signup_date,
-            segment, is_active, loyalty_score
-        ) VALUES (
-            :user_id, :first_name, :last_name, :email, :country, :signup_date,
-            :segment, :is_active, :loyalty_score
-        )
-        """,
-        data["users.csv"],
-    )
+def install_change_counter(conn: sqlite3.Connection) -> None:
+    """Count every row written to the base tables in ``db_settings`` (key ``data_changes``).
 
-    conn.executemany(
-        """
-        INSERT INTO products (
-            product_id, name, category, price, currency,
-            inventory_count, is_active
-        ) VALUES (
-            :product_id, :name, :category, :price, :currency,
-            :inventory_count, :is_active
-        )
-        """,
-        data["products.csv"],
+    Installed after the bulk load, so only later writes pay for the triggers; the result
+    cache reads the counter to notice writes made outside ingest.
+    """
+    conn.execute(
+        "INSERT INTO db_settings (key, value) VALUES ('data_changes', 0) "
+        "ON CONFLICT(key) DO NOTHING"
     )
+    for table, _ in TABLE_COLUMNS.values():
+        for event in ("INSERT", "UPDATE", "DELETE"):
+            conn.execute(
+                f"CREATE TRIGGER IF NOT EXISTS data_changes_{table}_{event.lower()} "
+                f"AFTER {event} ON {table} BEGIN "
+                "UPDATE db_settings SET value = value + 1 WHERE key = 'data_changes'; END"
+            )
 
-    conn.executemany(
-        """
-        INSERT INTO orders (
-            order_id, user_id, order_date, status, shipping_method,
-            discount_amount, total_amount, currency
-        ) VALUES (
-            :order_id, :user_id, :order_date, :status, :shipping_method,
-            :discount_amount, :total_amount, :currency
-        )
-        """,
-        data["orders.csv"],
-    )
 
-    conn.executemany(
-        """
-        INSERT INTO order_items (
-            order_item_id, order_id, product_id, quantity, unit_price, line_total
-        ) VALUES (
-            :order_item_id, :order_id, :product_id, :quantity, :unit_price, :line_total
-        )
-        """,
-        data["order_items.csv"],
+def build_insert_sql(table: str, columns: List[str], money_storage: str = "real") -> str:
+    values = ", ".join(
+        money_value_sql(table, column, ":" + column, money_storage) for column in columns
+    )
+    return f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({values})"
+
+
+def build_positional_insert_sql(
+    table: str, columns: List[str], money_storage: str = "real"
+) -> str:
+    values = ", ".join(money_value_sql(table, column, "?", money_storage) for column in columns)
+    return f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({values})"
+
+
+def insert_data(
+    conn: sqlite3.Connection,
+    data: Dict[str, List[Dict[str, str]]],
+    money_storage: str = "real",
+) -> None:
+    for filename, (table, columns) in TABLE_COLUMNS.items():
+        with stage_timer("insert_data", table):
+            conn.executemany(build_insert_sql(table, columns, money_storage), data[filename])
+        METRICS.count("insert_data", table, rows=len(data[filename]))
+
+
+def build_upsert_sql(table: str, columns: List[str], money_storage: str = "real") -> str:
+    # The first column is the primary key; rows whose values are unchanged are left alone.
+    key, *values = columns
+    assignments = ", ".join(f"{column} = excluded.{column}" for column in values)
+    changed = " OR ".join(f"{table}.{column} IS NOT excluded.{column}" for column in values)
+    return (
+        f"{build_insert_sql(table, columns, money_storage)} "
+        f"ON CONFLICT({key}) DO UPDATE SET {assignments} WHERE {changed}"
     )
 
-    conn.executemany(
-        """
-        INSERT INTO payments (
-            payment_id, order_id, payment_date, amount, status,
-            payment_method, transaction_reference
-        ) VALUES (
-            :payment_id, :order_id, :payment_date, :amount, :status,
-            :payment_method, :transaction_reference
+
+def insert_rows_streaming(
+    conn: sqlite3.Connection,
+    filename: str,
+    rows: Iterable[Any],
+    batch_size: int,
+    positional: bool = False,
+    money_storage: str = "real",
+) -> int:
+    table, columns = TABLE_COLUMNS[filename]
+    if positional:
+        sql = build_positional_insert_sql(table, columns, money_storage)
+    else:
+        sql = build_insert_sql(table, columns, money_storage)
+    inserted = 0
+    for batch in iter_batches(rows, batch_size):
+        conn.executemany(sql, batch)
+        inserted += len(batch)
+    return inserted
+
+
+def upsert_rows_streaming(
+    conn: sqlite3.Connection,
+    filename: str,
+    rows: Iterable[Any],
+    batch_size: int,
+    money_storage: str = "real",
+) -> Tuple[int, int]:
+    """Upsert rows in batches; returns rows read and rows inserted or updated.
+
+    Changes are counted per statement, so writes made by rollup triggers are excluded.
+    """
+    table, columns = TABLE_COLUMNS[filename]
+    sql = build_upsert_sql(table, columns, money_storage)
+    read = changed = 0
+    for batch in iter_batches(rows, batch_size):
+        changed += conn.executemany(sql, batch).rowcount
+        read += len(batch)
+    return read, changed
+
+
+def insert_data_streaming(
+    conn: sqlite3.Connection,
+    paths: Dict[str, Path],
+    batch_size: int,
+    positional: bool = False,
+    money_storage: str = "real",
+) -> Dict[str, int]:
+    row_counts: Dict[str, int] = {}
+    for filename, (table, columns) in TABLE_COLUMNS.items():
+        if positional:
+            rows = iter_csv_tuples(paths[filename], columns)
+        else:
+            rows = iter_csv(paths[filename])
+        with stage_timer("insert_data", table):
+            row_counts[filename] = insert_rows_streaming(
+                conn, filename, rows, batch_size, positional, money_storage=money_storage
+            )
+        METRICS.count(
+            "insert_data",
+            table,
+            rows=row_counts[filename],
+            nbytes=paths[filename].stat().st_size,
         )
-        """,
-        data["payments.csv"],
-    )
+    return row_counts
+
+
+def insert_data_columnar(
+    conn: sqlite3.Connection, paths: Dict[str, Path], money_storage: str = "real"
+) -> Dict[str, int]:
+    """Bind the typed tuples of each ``.col`` chunk directly; chunks bound the memory used."""
+    row_counts: Dict[str, int] = {}
+    for filename, (table, columns) in TABLE_COLUMNS.items():
+        sql = build_positional_insert_sql(table, columns, money_storage)
+        row_counts[filename] = 0
+        with stage_timer("insert_data", table):
+            for rows in iter_columnar_chunks(paths[filename], columns):
+                conn.executemany(sql, rows)
+                row_counts[filename] += len(rows)
+        METRICS.count(
+            "insert_data",
+            table,
+            rows=row_counts[filename],
+            nbytes=paths[filename].stat().st_size,
+        )
+    return row_counts
 
 
-def insert_submission_meta(conn: sqlite3.Connection, total_rows: Dict[str, int]) -> None:
+def insert_submission_meta(
+    conn: sqlite3.Connection, total_rows: Dict[str, int], load_mode: str = "full"
+) -> None:
     meta = {
         "student_unique_id": "diligent_candidate_v1",
         "generated_timestamp": now_utc_iso(),
         "total_rows_json": json.dumps(total_rows, sort_keys=True),
         "source_code_sha1": hash_file_sha1(BASE_DIR / "data_generation" / "generate_data.py"),
         "tool_used": "Cursor",
+        "load_mode": load_mode,
     }
     conn.execute(
         """
         INSERT INTO submission_meta (
             student_unique_id, generated_timestamp,
-            total_rows_json, source_code_sha1, tool_used
+            total_rows_json, source_code_sha1, tool_used, load_mode
         ) VALUES (
             :student_unique_id, :generated_timestamp,
-            :total_rows_json, :source_code_sha1, :tool_used
+            :total_rows_json, :source_code_sha1, :tool_used, :load_mode
         )
         """,
         meta,
     )
 
 
-def fetch_report_data(conn: sqlite3.Connection) -> Dict[str, Any]:
-    tables = ["users", "products", "orders", "order_items", "payments", "submission_meta"]
-    table_counts = {
-        table: conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
-        for table in tables
+def insert_data_parallel(
+    conn: sqlite3.Connection, paths: Dict[str, Path], workers: int, money_storage: str = "real"
+) -> Dict[str, int]:
+    statements = {
+        filename: build_positional_insert_sql(table, columns, money_storage)
+        for filename, (table, columns) in TABLE_COLUMNS.items()
     }
-
-    validations = []
-    orders_without_items = conn.execute(
-        """
-        SELECT COUNT(*) FROM orders o
-        LEFT JOIN order_items oi ON oi.order_id = o.order_id
-        WHERE oi.order_id IS NULL
-        """
-    ).fetchone()[0]
-    validations.append(
-        {
-            "check": "Every order should have at least one order_item",
-            "status": "pass" if orders_without_items == 0 else "fail",
-            "details": orders_without_items,
-        }
+    row_counts = {filename: 0 for filename in TABLE_COLUMNS}
+    # Cents columns are declared INTEGER but arrive as dollars; the INSERT converts them.
+    overrides = (
+        {table: {column: "float" for column in columns} for table, columns in MONEY_COLUMNS.items()}
+        if money_storage == "cents"
+        else {}
     )
+    tasks = plan_tasks(conn, paths, TABLE_COLUMNS, converter_overrides=overrides)
+    # Chunks of all tables arrive interleaved, so the tables share one timing.
+    with stage_timer("insert_data_parallel"):
+        for filename, rows in iter_parsed_chunks(tasks, workers):
+            conn.executemany(statements[filename], rows)
+            row_counts[filename] += len(rows)
+    for filename, (table, _) in TABLE_COLUMNS.items():
+        METRICS.count(
+            "insert_data_parallel",
+            table,
+            rows=row_counts[filename],
+            nbytes=paths[filename].stat().st_size,
+        )
+    return row_counts
 
-    payment_mismatch = conn.execute(
+
+def ensure_load_state_schema(conn: sqlite3.Connection) -> None:
+    # Databases built before load tracking existed get the table/column added in place.
+    conn.execute(
         """
-        SELECT COUNT(*) FROM orders o
-        LEFT JOIN payments p ON p.order_id = o.order_id
-        GROUP BY o.order_id
-        HAVING ABS(COALESCE(SUM(p.amount), 0) - o.total_amount) > 0.01
+        CREATE TABLE IF NOT EXISTS load_state (
+            filename TEXT PRIMARY KEY,
+            sha1 TEXT NOT NULL,
+            bytes INTEGER NOT NULL,
+            row_count INTEGER NOT NULL,
+            loaded_timestamp TEXT NOT NULL
+        )
         """
-    ).fetchall()
-    validations.append(
-        {
-            "check": "Payments roughly match order totals",
-            "status": "pass" if not payment_mismatch else "warn",
-            "details": len(payment_mismatch),
-        }
     )
+    meta_columns = {row[1] for row in conn.execute("PRAGMA table_info(submission_meta)")}
+    if "load_mode" not in meta_columns:
+        conn.execute(
+            "ALTER TABLE submission_meta ADD COLUMN load_mode TEXT NOT NULL DEFAULT 'full'"
+        )
 
-    top_products = conn.execute(
-        """
-        SELECT p.product_id, p.name, ROUND(SUM(oi.line_total), 2) AS revenue
-        FROM order_items oi
-        JOIN products p ON p.product_id = oi.product_id
-        GROUP BY p.product_id, p.name
-        ORDER BY revenue DESC
-        LIMIT 5
-        """
-    ).fetchall()
 
-    high_value_customers = conn.execute(
-        """
-        SELECT
-            u.user_id,
-            u.first_name || ' ' || u.last_name AS customer_name,
-            u.segment,
-            ROUND(COALESCE(SUM(o.total_amount), 0), 2) AS revenue
-        FROM users u
-        LEFT JOIN orders o ON o.user_id = u.user_id
-        GROUP BY u.user_id
-        ORDER BY revenue DESC
-        LIMIT 5
-        """
-    ).fetchall()
+def read_load_state(conn: sqlite3.Connection) -> Dict[str, Dict[str, Any]]:
+    rows = conn.execute("SELECT filename, sha1, bytes, row_count FROM load_state").fetchall()
+    return {row[0]: {"sha1": row[1], "bytes": row[2], "row_count": row[3]} for row in rows}
 
-    anomaly_rows = conn.execute(
-        """
-        SELECT o.order_id, o.user_id, o.status, p.status, p.amount
-        FROM orders o
-        JOIN payments p ON p.order_id = o.order_id
-        WHERE p.status != 'succeeded'
-        ORDER BY p.amount DESC
-        LIMIT 5
-        """
-    ).fetchall()
 
-    cohort_rows = conn.execute(
-        """
-        SELECT
-            strftime('%Y-%m', u.signup_date) AS cohort_month,
-            COUNT(DISTINCT u.user_id) AS customers,
-            ROUND(SUM(COALESCE(o.total_amount, 0)), 2) AS cohort_revenue
-        FROM users u
-        LEFT JOIN orders o ON o.user_id = u.user_id
-        GROUP BY cohort_month
-        ORDER BY cohort_month
+def record_load_state(
+    conn: sqlite3.Connection, filename: str, fingerprint: Dict[str, Any], row_count: int
+) -> None:
+    conn.execute(
         """
-    ).fetchall()
+        INSERT INTO load_state (filename, sha1, bytes, row_count, loaded_timestamp)
+        VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT(filename) DO UPDATE SET
+            sha1 = excluded.sha1,
+            bytes = excluded.bytes,
+            row_count = excluded.row_count,
+            loaded_timestamp = excluded.loaded_timestamp
+        """,
+        (filename, fingerprint["sha1"], fingerprint["bytes"], row_count, now_utc_iso()),
+    )
 
-    return {
-        "table_row_counts": table_counts,
-        "validations": validations,
-        "top_products": [
-            {"product_id": row[0], "name": row[1], "revenue": row[2]} for row in top_products
-        ],
-        "high_value_customers": [
-            {
-                "user_id": row[0],
-                "name": row[1],
-                "segment": row[2],
-                "revenue": row[3],
-            }
-            for row in high_value_customers
-        ],
-        "anomalies": [
-            {
-                "order_id": row[0],
-                "user_id": row[1],
-                "order_status": row[2],
-                "payment_status": row[3],
-                "amount": row[4],
-            }
-            for row in anomaly_rows
-        ],
-        "cohort_insights": [
-            {
-                "cohort_month": row[0],
-                "customers": row[1],
-                "cohort_revenue": row[2],
-            }
-            for row in cohort_rows
-        ],
-    }
 
+def appended_offset(path: Path, previous: Dict[str, Any], fingerprint: Dict[str, Any]) -> int:
+    """Byte offset of newly appended rows if the file only grew since the last load, else 0."""
+    if fingerprint["bytes"] <= previous["bytes"]:
+        return 0
+    if hash_file_sha1(path, limit=previous["bytes"]) != previous["sha1"]:
+        return 0
+    return previous["bytes"]
 
+
+def fetch_report_data(conn: sqlite3.Connection) -> Dict[str, Any]:
+    return fetch_report_data_classic(conn)
+
+
+@timed("write_report")
 def write_report(report_data: Dict[str, Any], logger: logging.Logger) -> None:
     logger.info("Writing report outputs.")
     write_json(REPORT_JSON, report_data)
@@ -306,23 +589,196 @@ def write_report(report_data: Dict[str, Any], logger: logging.Logger) -> None:
             f"- {cohort['cohort_month']}: {cohort['customers']} customers, ${cohort['cohort_revenue']} revenue"
         )
 
+    if "section_timings_ms" in report_data:
+        md_lines.append("\n## Section Timings")
+        for section, elapsed in report_data["section_timings_ms"].items():
+            md_lines.append(f"- {section}: {elapsed} ms")
+
     REPORT_MD.write_text("\n".join(md_lines), encoding="utf-8")
+    METRICS.count("write_report", nbytes=REPORT_JSON.stat().st_size + REPORT_MD.stat().st_size)
     logger.info("Report saved to %s and %s", REPORT_MD.name, REPORT_JSON.name)
 
 
-def run_ingestion(logger: logging.Logger) -> None:
-    data = load_csv_data()
-    row_counts = {name: len(rows) for name, rows in data.items()}
-    with reset_database(logger) as conn:
+def fetch_report(
+    engine: str, workers: int, profile: bool, logger: logging.Logger
+) -> Dict[str, Any]:
+    factory = ProfilingConnection if profile else sqlite3.Connection
+    statements: List[Dict[str, Any]] = []
+    started = time.perf_counter()
+    with stage_timer("fetch_report", engine):
+        if engine == "concurrent":
+            report_data = fetch_report_data_concurrent(DB_PATH, workers, factory, statements)
+        else:
+            with sqlite3.connect(DB_PATH, factory=factory) as conn:
+                conn.row_factory = sqlite3.Row
+                if engine == "single-pass":
+                    report_data = fetch_report_data_single_pass(conn)
+                elif engine == "rollups":
+                    report_data = fetch_report_data_rollups(conn)
+                else:
+                    report_data = fetch_report_data(conn)
+                statements = getattr(conn, "statements", [])
+    if profile:
+        report_profile = build_profile(
+            "report", statements, time.perf_counter() - started, engine=engine
+        )
+        write_json(REPORT_PROFILE, report_profile)
+        log_profile(report_profile, logger)
+        logger.info("Profile saved to %s", REPORT_PROFILE.name)
+    return report_data
+
+
+def log_peak_rss(logger: logging.Logger) -> None:
+    peak = peak_rss_bytes()
+    if peak is not None:
+        logger.info("Peak RSS: %.1f MiB", peak / (1024 * 1024))
+
+
+@timed("run_ingestion")
+def run_ingestion(
+    logger: logging.Logger,
+    stream: bool = False,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    fast_load: bool = False,
+    parse_workers: int = 0,
+    schema: str = "standard",
+    money_storage: str = "real",
+    input_format: str = "csv",
+    rollups: bool = False,
+) -> None:
+    if input_format == "columnar" and parse_workers > 0:
+        raise ValueError("Columnar input needs no parse workers; use parse_workers=0.")
+    # The fast, parallel and columnar paths always stream positional tuples.
+    stream = stream or fast_load or parse_workers > 0 or input_format == "columnar"
+    paths = resolve_csv_paths(input_format)
+    if not stream:
+        data = load_csv_data()
+        row_counts = read_manifest_row_counts(DATA_DIR) or {
+            name: len(rows) for name, rows in data.items()
+        }
+    conn, deferred_indexes = reset_database(logger, fast_load, schema, money_storage)
+    with conn:
         try:
-            insert_data(conn, data)
+            if input_format == "columnar":
+                row_counts = insert_data_columnar(conn, paths, money_storage)
+            elif parse_workers > 0:
+                row_counts = insert_data_parallel(conn, paths, parse_workers, money_storage)
+            elif stream:
+                row_counts = insert_data_streaming(
+                    conn, paths, batch_size, positional=fast_load, money_storage=money_storage
+                )
+            else:
+                insert_data(conn, data, money_storage)
+            if fast_load:
+                with stage_timer("finish_fast_load"):
+                    finish_fast_load(conn, deferred_indexes, logger)
+            if rollups:
+                with stage_timer("build_rollups"):
+                    build_rollups(conn, money_storage)
+            install_change_counter(conn)
+            manifest = read_manifest_entries(DATA_DIR)
+            for filename in TABLE_COLUMNS:
+                # Keyed by the file actually read, so --incremental re-reads each CSV in full
+                # after a columnar load.
+                fingerprint = file_fingerprint(paths[filename], manifest)
+                record_load_state(conn, paths[filename].name, fingerprint, row_counts[filename])
             insert_submission_meta(conn, row_counts)
             conn.commit()
         except Exception:
             conn.rollback()
             logger.exception("Ingestion failed; rolled back transaction.")
             raise
+    # Persistent, so concurrent report readers never block a later incremental load.
+    conn.execute(f"PRAGMA journal_mode = {JOURNAL_MODE}")
     logger.info("Ingestion completed successfully.")
+    log_peak_rss(logger)
+
+
+@timed("run_incremental_ingestion")
+def run_incremental_ingestion(
+    logger: logging.Logger,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    schema: str = "standard",
+    money_storage: str = "real",
+    rollups: bool = False,
+) -> None:
+    """Upsert changed CSVs; rollups already in the database are refreshed, never dropped.
+
+    ``rollups`` builds them for a database loaded without them.
+    """
+    if not DB_PATH.exists():
+        logger.info("No database at %s; running a full load instead.", DB_PATH)
+        run_ingestion(
+            logger,
+            stream=True,
+            batch_size=batch_size,
+            schema=schema,
+            money_storage=money_storage,
+            rollups=rollups,
+        )
+        return
+    paths = resolve_csv_paths()
+    manifest = read_manifest_entries(DATA_DIR)
+    conn = sqlite3.connect(DB_PATH)
+    conn.execute("PRAGMA foreign_keys = ON;")
+    with conn:
+        try:
+            ensure_load_state_schema(conn)
+            # Rows are upserted in whatever money layout the database was built with.
+            money_storage = read_money_storage(conn)
+            install_change_counter(conn)
+            had_rollups = rollups_present(conn)
+            state = read_load_state(conn)
+            applied: Dict[str, int] = {}
+            for filename in TABLE_COLUMNS:
+                fingerprint = file_fingerprint(paths[filename], manifest)
+                previous = state.get(filename)
+                if previous and previous["sha1"] == fingerprint["sha1"]:
+                    logger.info("%s unchanged; skipped.", filename)
+                    continue
+                offset = appended_offset(paths[filename], previous, fingerprint) if previous else 0
+                table = TABLE_COLUMNS[filename][0]
+                with stage_timer("upsert_data", table):
+                    rows_read, applied[filename] = upsert_rows_streaming(
+                        conn,
+                        filename,
+                        iter_csv(paths[filename], offset),
+                        batch_size,
+                        money_storage=money_storage,
+                    )
+                METRICS.count(
+                    "upsert_data", table, rows=rows_read, nbytes=fingerprint["bytes"] - offset
+                )
+                row_count = previous["row_count"] + rows_read if offset else rows_read
+                record_load_state(conn, filename, fingerprint, row_count)
+                logger.info(
+                    "%s: read %s rows (%s), %s inserted or updated.",
+                    filename,
+                    rows_read,
+                    "appended tail" if offset else "full file",
+                    applied[filename],
+                )
+            if had_rollups and applied:
+                with stage_timer("refresh_rollups"):
+                    refreshed = refresh_rollups(conn, money_storage)
+                logger.info(
+                    "Rollups refreshed for %s users and %s products.",
+                    refreshed["users"],
+                    refreshed["products"],
+                )
+            elif rollups and not had_rollups:
+                with stage_timer("build_rollups"):
+                    build_rollups(conn, money_storage)
+                logger.info("Rollups built.")
+            if applied:
+                insert_submission_meta(conn, applied, load_mode="incremental")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            logger.exception("Incremental ingestion failed; rolled back transaction.")
+            raise
+    logger.info("Incremental ingestion completed; %s files applied.", len(applied))
+    log_peak_rss(logger)
 
 
 def main() -> None:
@@ -330,18 +786,54 @@ def main() -> None:
     if not args.ingest and not args.report:
         raise SystemExit("Specify --ingest and/or --report.")
 
-    logger = configure_logger("ingest")
-
-    if args.ingest:
-        run_ingestion(logger)
+    if args.batch_size < 1:
+        raise SystemExit("--batch-size must be at least 1.")
+    if args.parse_workers < 0:
+        raise SystemExit("--parse-workers cannot be negative.")
+    if args.report_workers < 1:
+        raise SystemExit("--report-workers must be at least 1.")
+    if args.input_format == "columnar" and (args.incremental or args.parse_workers):
+        raise SystemExit(
+            "--input-format columnar cannot be combined with --incremental or --parse-workers."
+        )
 
-    if args.report:
-        if not DB_PATH.exists():
-            raise FileNotFoundError("Database not found. Run with --ingest first.")
-        with sqlite3.connect(DB_PATH) as conn:
-            conn.row_factory = sqlite3.Row
-            report_data = fetch_report_data(conn)
-        write_report(report_data, logger)
+    logger = configure_logger("ingest")
+    try:
+        with profiled("ingest", args, logger):
+            if args.ingest and args.incremental:
+                run_incremental_ingestion(
+                    logger,
+                    batch_size=args.batch_size,
+                    schema=args.schema,
+                    money_storage=args.money_storage,
+                    rollups=args.rollups,
+                )
+            elif args.ingest:
+                run_ingestion(
+                    logger,
+                    stream=args.stream,
+                    batch_size=args.batch_size,
+                    fast_load=args.fast_load,
+                    parse_workers=args.parse_workers,
+                    schema=args.schema,
+                    money_storage=args.money_storage,
+                    input_format=args.input_format,
+                    rollups=args.rollups,
+                )
+
+            if args.report:
+                if not DB_PATH.exists():
+                    raise FileNotFoundError("Database not found. Run with --ingest first.")
+                try:
+                    report_data = fetch_report(
+                        args.report_engine, args.report_workers, args.profile, logger
+                    )
+                except RollupsUnavailable as exc:
+                    raise SystemExit(str(exc))
+                write_report(report_data, logger)
+    finally:
+        # Failed runs are recorded too, up to the stage that failed.
+        write_metrics("ingest")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,159 @@
+"""
+Parallel CSV parsing for ingestion.
+
+Worker processes parse line-aligned byte ranges of each CSV and coerce values to
+the column types declared in the schema. A collector thread hands finished chunks,
+in file order, to the single SQLite writer through a bounded queue, so parsing of
+later tables overlaps with inserts into earlier ones.
+
+Splitting on raw line boundaries assumes no quoted field contains a newline,
+which holds for every CSV produced by data_generation/generate_data.py.
+"""
+
+import csv
+import io
+import queue
+import sqlite3
+import threading
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional, Tuple
+
+
+DEFAULT_CHUNK_BYTES = 4 * 1024 * 1024
+CONVERTERS: Dict[str, Callable[[str], Any]] = {"int": int, "float": float, "str": str}
+
+ChunkTask = Tuple[str, int, int, List[int], List[str]]
+_DONE = object()
+
+
+def column_converters(conn: sqlite3.Connection, table: str, columns: List[str]) -> List[str]:
+    """Map each column to a converter name from its declared type (SQLite affinity rules)."""
+    declared = {row[1]: (row[2] or "").upper() for row in conn.execute(f"PRAGMA table_info({table})")}
+    converters = []
+    for column in columns:
+        column_type = declared.get(column, "")
+        if "INT" in column_type:
+            converters.append("int")
+        elif any(token in column_type for token in ("REAL", "FLOA", "DOUB")):
+            converters.append("float")
+        else:
+            converters.append("str")
+    return converters
+
+
+def split_csv(path: Path, chunk_bytes: int = DEFAULT_CHUNK_BYTES) -> Tuple[List[str], List[Tuple[int, int]]]:
+    """Return the header and (start, end) byte ranges that begin and end on line boundaries."""
+    size = path.stat().st_size
+    ranges: List[Tuple[int, int]] = []
+    with path.open("rb") as fh:
+        header = next(csv.reader([fh.readline().decode("utf-8")]))
+        start = fh.tell()
+        while start < size:
+            fh.seek(min(start + chunk_bytes, size))
+            fh.readline()
+            end = min(fh.tell(), size)
+            ranges.append((start, end))
+            start = end
+    return header, ranges
+
+
+def parse_chunk(task: ChunkTask) -> List[tuple]:
+    path, start, end, order, converter_names = task
+    with open(path, "rb") as fh:
+        fh.seek(start)
+        text = fh.read(end - start).decode("utf-8")
+    converters = [CONVERTERS[name] for name in converter_names]
+    typed = list(zip(order, converters))
+    return [
+        tuple(convert(row[index]) for index, convert in typed)
+        for row in csv.reader(io.StringIO(text, newline=""))
+        if row
+    ]
+
+
+def _collect(
+    pool: ProcessPoolExecutor,
+    tasks: List[Tuple[str, ChunkTask]],
+    out: "queue.Queue[Any]",
+    window: int,
+    stop: threading.Event,
+) -> None:
+    def put(item: Any) -> bool:
+        while not stop.is_set():
+            try:
+                out.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    pending: Deque[Tuple[str, "Future[List[tuple]]"]] = deque()
+    remaining = iter(tasks)
+    try:
+        for filename, task in remaining:
+            pending.append((filename, pool.submit(parse_chunk, task)))
+            if len(pending) >= window:
+                break
+        while pending:
+            filename, future = pending.popleft()
+            rows = future.result()
+            next_task = next(remaining, None)
+            if next_task is not None:
+                pending.append((next_task[0], pool.submit(parse_chunk, next_task[1])))
+            if not put((filename, rows)):
+                return
+    except BaseException as exc:  # surfaced to the writer
+        put(exc)
+        return
+    put(_DONE)
+
+
+def iter_parsed_chunks(
+    tasks: List[Tuple[str, ChunkTask]], workers: int
+) -> Iterator[Tuple[str, List[tuple]]]:
+    """Yield (filename, rows) in task order while workers parse ahead within a bounded window."""
+    window = max(2, workers * 2)
+    out: "queue.Queue[Any]" = queue.Queue(maxsize=window)
+    stop = threading.Event()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        collector = threading.Thread(
+            target=_collect, args=(pool, tasks, out, window, stop), daemon=True
+        )
+        collector.start()
+        try:
+            while True:
+                item = out.get()
+                if item is _DONE:
+                    break
+                if isinstance(item, BaseException):
+                    raise item
+                yield item
+        finally:
+            stop.set()
+            collector.join()
+
+
+def plan_tasks(
+    conn: sqlite3.Connection,
+    paths: Dict[str, Path],
+    table_columns: Dict[str, Tuple[str, List[str]]],
+    chunk_bytes: int = DEFAULT_CHUNK_BYTES,
+    converter_overrides: Optional[Dict[str, Dict[str, str]]] = None,
+) -> List[Tuple[str, ChunkTask]]:
+    """Plan chunk tasks; converter_overrides maps table -> column -> converter name."""
+    overrides = converter_overrides or {}
+    tasks: List[Tuple[str, ChunkTask]] = []
+    for filename, (table, columns) in table_columns.items():
+        header, ranges = split_csv(paths[filename], chunk_bytes)
+        missing = [column for column in columns if column not in header]
+        if missing:
+            raise ValueError(f"{filename} is missing columns: {', '.join(missing)}")
+        order = [header.index(column) for column in columns]
+        names = column_converters(conn, table, columns)
+        table_overrides = overrides.get(table, {})
+        names = [table_overrides.get(column, name) for column, name in zip(columns, names)]
+        for start, end in ranges:
+            tasks.append((filename, (str(paths[filename]), start, end, order, names)))
+    return tasks
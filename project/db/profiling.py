@@ -0,0 +1,248 @@
+"""
+Query profiling for ``run_query.py --profile`` and ``ingest.py --report --profile``.
+
+``ProfilingConnection`` is passed to ``sqlite3.connect(factory=...)``. Every
+statement run through ``execute()`` gets its EXPLAIN QUERY PLAN captured just
+before it runs, and its cursor records wall time and rows fetched. Plans are
+checked for full table scans and temporary B-tree sorts. ``profile_ctes()``
+times each CTE of a WITH query on its own. Each timing includes the CTEs that
+CTE depends on.
+"""
+
+import re
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from utils.helpers import now_utc_iso
+
+
+_PROFILED_PREFIXES = ("SELECT", "WITH", "INSERT", "UPDATE", "DELETE", "CREATE")
+_COMMENT = re.compile(r"--[^\n]*")
+_FROM_ALIAS = re.compile(
+    r"\b(?:FROM|JOIN)\s+(?:main\.)?(\w+)(?:\s+(?:AS\s+)?(\w+))?", re.IGNORECASE
+)
+_CTE_START = re.compile(r"(\w+)\s+AS\s*\(", re.IGNORECASE)
+# Words that can follow a table name in FROM/JOIN without being its alias.
+_SQL_KEYWORDS = set(
+    "WHERE LEFT RIGHT INNER OUTER CROSS JOIN ON USING GROUP ORDER LIMIT HAVING "
+    "WINDOW UNION EXCEPT INTERSECT NATURAL INDEXED NOT".split()
+)
+
+
+def _table_aliases(conn: sqlite3.Connection, sql: str) -> Dict[str, str]:
+    """Map every name a plan can show for a real table (its name or alias) to the table."""
+    tables = {
+        row[0]
+        for row in sqlite3.Connection.execute(
+            conn, "SELECT name FROM sqlite_master WHERE type = 'table' "
+            "UNION SELECT name FROM sqlite_temp_master WHERE type IN ('table', 'view')"
+        )
+    }
+    aliases = {table: table for table in tables}
+    for name, alias in _FROM_ALIAS.findall(_COMMENT.sub("", sql)):
+        if name in tables and alias and alias.upper() not in _SQL_KEYWORDS:
+            aliases[alias] = name
+    return aliases
+
+
+def explain(conn: sqlite3.Connection, sql: str, params: Any = ()) -> List[str]:
+    rows = sqlite3.Connection.execute(conn, f"EXPLAIN QUERY PLAN {sql}", params).fetchall()
+    return [row[3] for row in rows]
+
+
+def plan_flags(plan: Sequence[str], aliases: Dict[str, str]) -> Dict[str, List[str]]:
+    """Full scans of real tables (not CTEs or subqueries) and temp B-tree sorts in a plan.
+
+    SCAN is a full traversal even when it walks an index; keyed lookups show as SEARCH.
+    """
+    full_scans = []
+    for detail in plan:
+        match = re.match(r"SCAN (\w+)", detail)
+        if match and match.group(1) in aliases:
+            full_scans.append(f"{aliases[match.group(1)]}: {detail}")
+    temp_btrees = [detail for detail in plan if "TEMP B-TREE" in detail]
+    return {"full_scans": full_scans, "temp_btrees": temp_btrees}
+
+
+class ProfilingCursor(sqlite3.Cursor):
+    """Cursor that adds its execution and fetch time and row count to a profile record."""
+
+    record: Optional[Dict[str, Any]] = None
+
+    def _timed(self, fetch, *args: Any) -> Any:
+        started = time.perf_counter()
+        try:
+            return fetch(*args)
+        finally:
+            if self.record is not None:
+                self.record["wall_ms"] += (time.perf_counter() - started) * 1000
+
+    def _count(self, rows: List[Any]) -> List[Any]:
+        if self.record is not None:
+            self.record["rows"] += len(rows)
+        return rows
+
+    def fetchall(self) -> List[Any]:
+        return self._count(self._timed(super().fetchall))
+
+    def fetchmany(self, size: int = -1) -> List[Any]:
+        if size < 0:
+            size = self.arraysize
+        return self._count(self._timed(super().fetchmany, size))
+
+    def fetchone(self) -> Any:
+        row = self._timed(super().fetchone)
+        if row is not None:
+            self._count([row])
+        return row
+
+    def __next__(self) -> Any:
+        row = self._timed(super().__next__)
+        self._count([row])
+        return row
+
+
+class ProfilingConnection(sqlite3.Connection):
+    """Connection that records plan, wall time and rows for every ``execute()`` call."""
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        self.statements: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+
+    def _new_record(self, sql: str) -> Dict[str, Any]:
+        record = {
+            "sql": " ".join(_COMMENT.sub("", sql).split()),
+            "wall_ms": 0.0,
+            "rows": 0,
+            "plan": [],
+        }
+        with self._lock:
+            self.statements.append(record)
+        return record
+
+    def execute(self, sql: str, parameters: Any = ()) -> sqlite3.Cursor:
+        record = self._new_record(sql)
+        if record["sql"].upper().startswith(_PROFILED_PREFIXES):
+            try:
+                record["plan"] = explain(self, sql, parameters)
+            except sqlite3.Error:
+                pass
+        aliases = _table_aliases(self, sql) if record["plan"] else {}
+        record.update(plan_flags(record["plan"], aliases))
+        cursor = self.cursor(ProfilingCursor)
+        cursor.record = record
+        return cursor._timed(cursor.execute, sql, parameters)
+
+    def executescript(self, sql_script: str) -> sqlite3.Cursor:
+        record = self._new_record(sql_script)
+        started = time.perf_counter()
+        try:
+            return super().executescript(sql_script)
+        finally:
+            record["wall_ms"] += (time.perf_counter() - started) * 1000
+
+
+def _skip_space(text: str, index: int) -> int:
+    while index < len(text) and text[index].isspace():
+        index += 1
+    return index
+
+
+def _closing_paren(text: str, index: int) -> int:
+    """Index of the parenthesis closing the one just before ``index``; skips quoted text."""
+    depth, quote = 1, None
+    while depth:
+        char = text[index]
+        if quote:
+            quote = None if char == quote else quote
+        elif char in "'\"":
+            quote = char
+        elif char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+        index += 1
+    return index - 1
+
+
+def split_ctes(sql: str) -> Tuple[List[Tuple[str, str]], str]:
+    """Split ``WITH a AS (...), b AS (...) SELECT ...`` into [(name, body)] and the final SELECT."""
+    text = _COMMENT.sub("", sql).strip().rstrip(";")
+    if not re.match(r"WITH\b", text, re.IGNORECASE):
+        return [], text
+    ctes: List[Tuple[str, str]] = []
+    index = 4
+    while True:
+        match = _CTE_START.match(text, _skip_space(text, index))
+        if not match:
+            break
+        end = _closing_paren(text, match.end())
+        ctes.append((match.group(1), text[match.end():end].strip()))
+        index = _skip_space(text, end + 1)
+        if not text.startswith(",", index):
+            break
+        index += 1
+    return ctes, text[index:].strip()
+
+
+def profile_ctes(conn: sqlite3.Connection, sql: str, params: Any = ()) -> List[Dict[str, Any]]:
+    """Materialize each CTE on its own (with the CTEs before it) and time it."""
+    ctes, _ = split_ctes(sql)
+    results = []
+    for position, (name, _) in enumerate(ctes):
+        prefix = ",\n".join(f"{cte} AS ({body})" for cte, body in ctes[: position + 1])
+        statement = f"WITH {prefix}\nSELECT * FROM {name}"
+        plan = explain(conn, statement, params)
+        started = time.perf_counter()
+        rows = len(sqlite3.Connection.execute(conn, statement, params).fetchall())
+        results.append(
+            {
+                "name": name,
+                "wall_ms": round((time.perf_counter() - started) * 1000, 3),
+                "rows": rows,
+                "plan": plan,
+                **plan_flags(plan, _table_aliases(conn, statement)),
+            }
+        )
+    return results
+
+
+def build_profile(
+    source: str,
+    statements: Sequence[Dict[str, Any]],
+    total_seconds: float,
+    **details: Any,
+) -> Dict[str, Any]:
+    statements = [
+        {**statement, "wall_ms": round(statement["wall_ms"], 3)} for statement in statements
+    ]
+    return {
+        "source": source,
+        "generated_timestamp": now_utc_iso(),
+        **details,
+        "total_ms": round(total_seconds * 1000, 3),
+        "summary": {
+            "statements": len(statements),
+            "full_scans": sum(len(s.get("full_scans", [])) for s in statements),
+            "temp_btrees": sum(len(s.get("temp_btrees", [])) for s in statements),
+        },
+        "statements": statements,
+    }
+
+
+def log_profile(profile: Dict[str, Any], logger: Any) -> None:
+    summary = profile["summary"]
+    logger.info(
+        "Profile: %s statements in %.1f ms, %s full table scans, %s temp B-tree sorts.",
+        summary["statements"],
+        profile["total_ms"],
+        summary["full_scans"],
+        summary["temp_btrees"],
+    )
+    entries = profile["statements"] + profile.get("ctes", [])
+    for entry in sorted(entries, key=lambda item: item["wall_ms"], reverse=True)[:3]:
+        label = entry.get("name") or entry["sql"][:60]
+        logger.info("  %.1f ms, %s rows: %s", entry["wall_ms"], entry["rows"], label)
@@ -0,0 +1,437 @@
+"""
+Report engines.
+
+``classic`` runs one query per report section, one section at a time.
+``concurrent`` runs the same sections on a thread pool, each on a connection
+from a small pool of read-only connections, and records per-section timings.
+``single-pass`` builds a few TEMP aggregate tables once per run and answers every
+section, including the table row counts and integrity checks, from them. Each of
+``orders``, ``payments`` and ``users`` is scanned once for the aggregates and
+``order_items`` twice (per order and per product), instead of once per section.
+``rollups`` reads the persistent summary tables maintained by db/rollups.py.
+"""
+
+import queue
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from db.storage import money_sql, read_money_storage
+from utils.metrics import METRICS, stage_timer
+
+
+REPORT_ENGINES = ["classic", "single-pass", "rollups", "concurrent"]
+DEFAULT_REPORT_WORKERS = 4
+# Rows in each ranked list section (top products, customers, anomalies) of report.json.
+REPORT_LIST_SIZE = 5
+REPORT_TABLES = ["users", "products", "orders", "order_items", "payments", "submission_meta"]
+TEMP_TABLES = ["report_users", "report_user_orders", "report_payments", "report_order_items"]
+
+
+def payment_mismatch_condition(paid: str, total: str, money_storage: str) -> str:
+    # Integer cents reconcile exactly; REAL dollars need a rounding tolerance.
+    if money_storage == "cents":
+        return f"{paid} != {total}"
+    return f"ABS({paid} - {total}) > 0.01"
+
+
+def assemble_report(
+    table_counts: Dict[str, int],
+    orders_without_items: int,
+    payment_mismatches: int,
+    top_products: Sequence[Sequence[Any]],
+    high_value_customers: Sequence[Sequence[Any]],
+    anomaly_rows: Sequence[Sequence[Any]],
+    cohort_rows: Sequence[Sequence[Any]],
+) -> Dict[str, Any]:
+    return {
+        "table_row_counts": table_counts,
+        "validations": [
+            {
+                "check": "Every order should have at least one order_item",
+                "status": "pass" if orders_without_items == 0 else "fail",
+                "details": orders_without_items,
+            },
+            {
+                "check": "Payments roughly match order totals",
+                "status": "pass" if not payment_mismatches else "warn",
+                "details": payment_mismatches,
+            },
+        ],
+        "top_products": [
+            {"product_id": row[0], "name": row[1], "revenue": row[2]} for row in top_products
+        ],
+        "high_value_customers": [
+            {
+                "user_id": row[0],
+                "name": row[1],
+                "segment": row[2],
+                "revenue": row[3],
+            }
+            for row in high_value_customers
+        ],
+        "anomalies": [
+            {
+                "order_id": row[0],
+                "user_id": row[1],
+                "order_status": row[2],
+                "payment_status": row[3],
+                "amount": row[4],
+            }
+            for row in anomaly_rows
+        ],
+        "cohort_insights": [
+            {
+                "cohort_month": row[0],
+                "customers": row[1],
+                "cohort_revenue": row[2],
+            }
+            for row in cohort_rows
+        ],
+    }
+
+
+def fetch_anomaly_rows(
+    conn: sqlite3.Connection,
+    money_storage: str,
+    limit: int = REPORT_LIST_SIZE,
+    offset: int = 0,
+    payment_status: Optional[str] = None,
+) -> List[sqlite3.Row]:
+    status_filter = "AND p.status = ?" if payment_status is not None else ""
+    params = ([payment_status] if payment_status is not None else []) + [limit, offset]
+    return conn.execute(
+        f"""
+        SELECT o.order_id, o.user_id, o.status, p.status, {money_sql("p.amount", money_storage)}
+        FROM orders o
+        JOIN payments p ON p.order_id = o.order_id
+        WHERE p.status != 'succeeded' {status_filter}
+        ORDER BY p.amount DESC
+        LIMIT ? OFFSET ?
+        """,
+        params,
+    ).fetchall()
+
+
+def section_table_counts(conn: sqlite3.Connection, money_storage: str) -> Dict[str, int]:
+    return {
+        table: conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+        for table in REPORT_TABLES
+    }
+
+
+def section_orders_without_items(conn: sqlite3.Connection, money_storage: str) -> int:
+    return conn.execute(
+        """
+        SELECT COUNT(*) FROM orders o
+        LEFT JOIN order_items oi ON oi.order_id = o.order_id
+        WHERE oi.order_id IS NULL
+        """
+    ).fetchone()[0]
+
+
+def section_payment_mismatches(conn: sqlite3.Connection, money_storage: str) -> int:
+    return len(
+        conn.execute(
+            f"""
+            SELECT COUNT(*) FROM orders o
+            LEFT JOIN payments p ON p.order_id = o.order_id
+            GROUP BY o.order_id
+            HAVING {payment_mismatch_condition("COALESCE(SUM(p.amount), 0)", "o.total_amount", money_storage)}
+            """
+        ).fetchall()
+    )
+
+
+def section_top_products(
+    conn: sqlite3.Connection,
+    money_storage: str,
+    limit: int = REPORT_LIST_SIZE,
+    offset: int = 0,
+) -> List[sqlite3.Row]:
+    return conn.execute(
+        f"""
+        SELECT p.product_id, p.name, ROUND({money_sql("SUM(oi.line_total)", money_storage)}, 2) AS revenue
+        FROM order_items oi
+        JOIN products p ON p.product_id = oi.product_id
+        GROUP BY p.product_id, p.name
+        ORDER BY revenue DESC
+        LIMIT ? OFFSET ?
+        """,
+        (limit, offset),
+    ).fetchall()
+
+
+def section_high_value_customers(
+    conn: sqlite3.Connection,
+    money_storage: str,
+    limit: int = REPORT_LIST_SIZE,
+    offset: int = 0,
+    segment: Optional[str] = None,
+) -> List[sqlite3.Row]:
+    segment_filter = "WHERE u.segment = ?" if segment is not None else ""
+    params = ([segment] if segment is not None else []) + [limit, offset]
+    return conn.execute(
+        f"""
+        SELECT
+            u.user_id,
+            u.first_name || ' ' || u.last_name AS customer_name,
+            u.segment,
+            ROUND({money_sql("COALESCE(SUM(o.total_amount), 0)", money_storage)}, 2) AS revenue
+        FROM users u
+        LEFT JOIN orders o ON o.user_id = u.user_id
+        {segment_filter}
+        GROUP BY u.user_id
+        ORDER BY revenue DESC
+        LIMIT ? OFFSET ?
+        """,
+        params,
+    ).fetchall()
+
+
+def section_cohorts(conn: sqlite3.Connection, money_storage: str) -> List[sqlite3.Row]:
+    return conn.execute(
+        f"""
+        SELECT
+            strftime('%Y-%m', u.signup_date) AS cohort_month,
+            COUNT(DISTINCT u.user_id) AS customers,
+            ROUND({money_sql("SUM(COALESCE(o.total_amount, 0))", money_storage)}, 2) AS cohort_revenue
+        FROM users u
+        LEFT JOIN orders o ON o.user_id = u.user_id
+        GROUP BY cohort_month
+        ORDER BY cohort_month
+        """
+    ).fetchall()
+
+
+# Ordered like the arguments of assemble_report().
+CLASSIC_SECTIONS: Dict[str, Callable[[sqlite3.Connection, str], Any]] = {
+    "table_row_counts": section_table_counts,
+    "orders_without_items": section_orders_without_items,
+    "payment_mismatches": section_payment_mismatches,
+    "top_products": section_top_products,
+    "high_value_customers": section_high_value_customers,
+    "anomalies": fetch_anomaly_rows,
+    "cohort_insights": section_cohorts,
+}
+
+
+def fetch_report_data_classic(conn: sqlite3.Connection) -> Dict[str, Any]:
+    money_storage = read_money_storage(conn)
+    results = []
+    for name, section in CLASSIC_SECTIONS.items():
+        with stage_timer("report_section", name):
+            results.append(section(conn, money_storage))
+    return assemble_report(*results)
+
+
+def open_read_pool(
+    db_path: Path, size: int, factory: type = sqlite3.Connection
+) -> "queue.Queue[sqlite3.Connection]":
+    """Open ``size`` read-only connections to the database, leaving its journal mode alone.
+
+    Readers never block each other; ingest leaves the database in WAL mode, so they
+    do not block a concurrent writer either.
+    """
+    pool: "queue.Queue[sqlite3.Connection]" = queue.Queue()
+    for _ in range(size):
+        # check_same_thread is off because connections move between pool threads;
+        # each one is used by a single section at a time.
+        pool.put(
+            sqlite3.connect(
+                f"{db_path.resolve().as_uri()}?mode=ro",
+                uri=True,
+                check_same_thread=False,
+                factory=factory,
+            )
+        )
+    return pool
+
+
+def _run_pooled(
+    pool: "queue.Queue[sqlite3.Connection]",
+    section: Callable[[sqlite3.Connection, str], Any],
+    money_storage: str,
+) -> Tuple[Any, float]:
+    conn = pool.get()
+    try:
+        started = time.perf_counter()
+        result = section(conn, money_storage)
+        return result, time.perf_counter() - started
+    finally:
+        pool.put(conn)
+
+
+def fetch_report_data_concurrent(
+    db_path: Path,
+    workers: int = DEFAULT_REPORT_WORKERS,
+    factory: type = sqlite3.Connection,
+    statements: Optional[List[Dict[str, Any]]] = None,
+) -> Dict[str, Any]:
+    """Classic report with sections run in parallel; adds ``section_timings_ms``.
+
+    With a profiling ``factory``, each pooled connection's records are added to ``statements``.
+    """
+    size = max(1, min(workers, len(CLASSIC_SECTIONS)))
+    pool = open_read_pool(db_path, size, factory)
+    try:
+        conn = pool.get()
+        try:
+            money_storage = read_money_storage(conn)
+        finally:
+            pool.put(conn)
+        with ThreadPoolExecutor(max_workers=size) as executor:
+            futures = {
+                name: executor.submit(_run_pooled, pool, section, money_storage)
+                for name, section in CLASSIC_SECTIONS.items()
+            }
+            outcomes = {name: future.result() for name, future in futures.items()}
+    finally:
+        while not pool.empty():
+            conn = pool.get_nowait()
+            if statements is not None:
+                statements.extend(getattr(conn, "statements", []))
+            conn.close()
+    for name, (_, elapsed) in outcomes.items():
+        METRICS.observe("report_section", elapsed, name)
+    report = assemble_report(*(result for result, _ in outcomes.values()))
+    report["section_timings_ms"] = {
+        name: round(elapsed * 1000, 1) for name, (_, elapsed) in outcomes.items()
+    }
+    return report
+
+
+def build_report_aggregates(conn: sqlite3.Connection, money_storage: str) -> None:
+    drop_report_aggregates(conn)
+    mismatch = payment_mismatch_condition(
+        "COALESCE(p.paid, 0)", "o.total_amount", money_storage
+    )
+    conn.executescript(
+        f"""
+        CREATE TEMP TABLE report_order_items (
+            order_id TEXT PRIMARY KEY,
+            item_rows INTEGER NOT NULL
+        ) WITHOUT ROWID;
+        INSERT INTO report_order_items
+        SELECT order_id, COUNT(*) FROM order_items GROUP BY order_id;
+
+        CREATE TEMP TABLE report_payments (
+            order_id TEXT PRIMARY KEY,
+            paid,
+            payment_rows INTEGER NOT NULL
+        ) WITHOUT ROWID;
+        INSERT INTO report_payments
+        SELECT order_id, SUM(amount), COUNT(*) FROM payments GROUP BY order_id;
+
+        CREATE TEMP TABLE report_user_orders (
+            user_id TEXT PRIMARY KEY,
+            revenue,
+            order_count INTEGER NOT NULL,
+            orders_without_items INTEGER NOT NULL,
+            payment_mismatches INTEGER NOT NULL
+        ) WITHOUT ROWID;
+        INSERT INTO report_user_orders
+        SELECT
+            o.user_id,
+            SUM(o.total_amount),
+            COUNT(*),
+            SUM(i.order_id IS NULL),
+            SUM({mismatch})
+        FROM orders o
+        LEFT JOIN report_order_items i ON i.order_id = o.order_id
+        LEFT JOIN report_payments p ON p.order_id = o.order_id
+        GROUP BY o.user_id;
+
+        CREATE TEMP TABLE report_users AS
+        SELECT
+            u.user_id,
+            u.first_name || ' ' || u.last_name AS customer_name,
+            u.segment,
+            strftime('%Y-%m', u.signup_date) AS cohort_month,
+            COALESCE(uo.revenue, 0) AS revenue
+        FROM users u
+        LEFT JOIN report_user_orders uo ON uo.user_id = u.user_id;
+        """
+    )
+
+
+def _scalar(conn: sqlite3.Connection, sql: str) -> Any:
+    return conn.execute(sql).fetchone()[0]
+
+
+def drop_report_aggregates(conn: sqlite3.Connection) -> None:
+    for table in TEMP_TABLES:
+        conn.execute(f"DROP TABLE IF EXISTS temp.{table}")
+
+
+def fetch_report_data_single_pass(conn: sqlite3.Connection) -> Dict[str, Any]:
+    money_storage = read_money_storage(conn)
+    with stage_timer("build_report_aggregates"):
+        build_report_aggregates(conn, money_storage)
+    try:
+        table_counts = {
+            "users": _scalar(conn, "SELECT COUNT(*) FROM report_users"),
+            "products": _scalar(conn, "SELECT COUNT(*) FROM products"),
+            "orders": _scalar(conn, "SELECT COALESCE(SUM(order_count), 0) FROM report_user_orders"),
+            "order_items": _scalar(conn, "SELECT COALESCE(SUM(item_rows), 0) FROM report_order_items"),
+            "payments": _scalar(conn, "SELECT COALESCE(SUM(payment_rows), 0) FROM report_payments"),
+            "submission_meta": _scalar(conn, "SELECT COUNT(*) FROM submission_meta"),
+        }
+        orders_without_items, payment_mismatches = conn.execute(
+            """
+            SELECT COALESCE(SUM(orders_without_items), 0), COALESCE(SUM(payment_mismatches), 0)
+            FROM report_user_orders
+            """
+        ).fetchone()
+
+        # Aggregate before joining so products is probed once per product, not per item.
+        # Ties are broken by key, matching the GROUP BY order of the classic queries.
+        top_products = conn.execute(
+            f"""
+            SELECT p.product_id, p.name, ROUND({money_sql("r.revenue", money_storage)}, 2) AS revenue
+            FROM (
+                SELECT product_id, SUM(line_total) AS revenue
+                FROM order_items
+                GROUP BY product_id
+            ) r
+            JOIN products p ON p.product_id = r.product_id
+            ORDER BY revenue DESC, p.product_id
+            LIMIT 5
+            """
+        ).fetchall()
+
+        high_value_customers = conn.execute(
+            f"""
+            SELECT user_id, customer_name, segment,
+                   ROUND({money_sql("revenue", money_storage)}, 2) AS rounded_revenue
+            FROM report_users
+            ORDER BY rounded_revenue DESC, user_id
+            LIMIT 5
+            """
+        ).fetchall()
+
+        cohort_rows = conn.execute(
+            f"""
+            SELECT cohort_month, COUNT(*),
+                   ROUND({money_sql("SUM(revenue)", money_storage)}, 2)
+            FROM report_users
+            GROUP BY cohort_month
+            ORDER BY cohort_month
+            """
+        ).fetchall()
+
+        anomaly_rows = fetch_anomaly_rows(conn, money_storage)
+    finally:
+        drop_report_aggregates(conn)
+
+    return assemble_report(
+        table_counts,
+        orders_without_items,
+        payment_mismatches,
+        top_products,
+        high_value_customers,
+        anomaly_rows,
+        cohort_rows,
+    )
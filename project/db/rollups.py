@@ -0,0 +1,390 @@
+"""
+Materialized rollups.
+
+Summary tables kept next to the base tables so the report and the cohort CLV
+query read a few rows per product, user or cohort month instead of rescanning
+``orders``, ``order_items`` and ``payments``:
+
+- ``rollup_products``: revenue and item rows per product.
+- ``rollup_users``: revenue, order/item/payment counts, active order months,
+  payment success counts and integrity flags per user.
+- ``rollup_cohorts``: per signup month sums that the CLV averages divide out.
+
+Rollups are opt-in and only ever written by ingest: ``ingest.py --ingest
+--rollups`` builds them once after the data is loaded. Triggers on the base
+tables then record the affected user and product keys in ``rollup_dirty_*``
+tables, and ``refresh_rollups()``, run by incremental ingest, recomputes only
+those keys and the cohort months they touch. Readers call ``require_rollups()``,
+which raises ``RollupsUnavailable`` when the tables are missing or stale instead
+of rebuilding them, so a report or query never takes the write lock. Money
+columns use the database's money storage unit, like the base tables.
+"""
+
+import sqlite3
+from typing import Any, Dict, List
+
+from db.report_engine import REPORT_TABLES, assemble_report, payment_mismatch_condition
+from db.storage import money_sql, read_money_storage
+
+
+ROLLUP_TABLES = ["rollup_products", "rollup_users", "rollup_cohorts"]
+DIRTY_TABLES = ["rollup_dirty_users", "rollup_dirty_products"]
+SCOPE_TABLES = ["rollup_scope_orders", "rollup_scope_items", "rollup_scope_payments"]
+
+
+class RollupsUnavailable(RuntimeError):
+    """The rollup tables are missing, or base-table changes have not been folded in yet."""
+
+# Statements run one at a time: executescript() would commit the caller's ingest transaction.
+ROLLUP_SCHEMA = [
+    """
+CREATE TABLE IF NOT EXISTS rollup_products (
+    product_id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    revenue NOT NULL,
+    item_rows INTEGER NOT NULL
+) WITHOUT ROWID
+""",
+    """
+CREATE TABLE IF NOT EXISTS rollup_users (
+    user_id TEXT PRIMARY KEY,
+    customer_name TEXT NOT NULL,
+    segment TEXT NOT NULL,
+    cohort_month TEXT NOT NULL,
+    revenue NOT NULL,
+    order_count INTEGER NOT NULL,
+    active_months INTEGER NOT NULL,
+    item_rows INTEGER NOT NULL,
+    payment_rows INTEGER NOT NULL,
+    -- Payment rows plus orders without any payment, the denominator of the success ratio.
+    payment_slots INTEGER NOT NULL,
+    payment_successes INTEGER NOT NULL,
+    orders_without_items INTEGER NOT NULL,
+    payment_mismatches INTEGER NOT NULL
+) WITHOUT ROWID
+""",
+    """
+CREATE TABLE IF NOT EXISTS rollup_cohorts (
+    cohort_month TEXT PRIMARY KEY,
+    customers INTEGER NOT NULL,
+    revenue NOT NULL,
+    aov_sum REAL NOT NULL,
+    success_ratio_sum REAL,
+    ordering_customers INTEGER NOT NULL,
+    frequency_sum REAL NOT NULL
+) WITHOUT ROWID
+""",
+    "CREATE TABLE IF NOT EXISTS rollup_dirty_users (user_id TEXT PRIMARY KEY) WITHOUT ROWID",
+    "CREATE TABLE IF NOT EXISTS rollup_dirty_products (product_id TEXT PRIMARY KEY) WITHOUT ROWID",
+    # Lets the payment anomaly section read the largest failed payments without a scan.
+    "CREATE INDEX IF NOT EXISTS idx_rollup_failed_payments "
+    "ON payments (amount) WHERE status != 'succeeded'",
+]
+
+# Plain INSERTs guarded by NOT EXISTS: an OR IGNORE clause inside a trigger is
+# overridden by the outer statement's conflict policy, such as an ingest UPSERT.
+_MARK_USER = (
+    "INSERT INTO rollup_dirty_users SELECT {user_id} WHERE NOT EXISTS "
+    "(SELECT 1 FROM rollup_dirty_users WHERE user_id = {user_id});"
+)
+_MARK_ORDER_USER = (
+    "INSERT INTO rollup_dirty_users SELECT o.user_id FROM orders o "
+    "WHERE o.order_id = {order_id} AND NOT EXISTS "
+    "(SELECT 1 FROM rollup_dirty_users d WHERE d.user_id = o.user_id);"
+)
+_MARK_PRODUCT = (
+    "INSERT INTO rollup_dirty_products SELECT {product_id} WHERE NOT EXISTS "
+    "(SELECT 1 FROM rollup_dirty_products WHERE product_id = {product_id});"
+)
+
+# Per table: statements run for each changed row, with {row} replaced by NEW or OLD.
+_TRIGGER_ACTIONS: Dict[str, List[str]] = {
+    "users": [_MARK_USER.format(user_id="{row}.user_id")],
+    "products": [_MARK_PRODUCT.format(product_id="{row}.product_id")],
+    "orders": [_MARK_USER.format(user_id="{row}.user_id")],
+    "order_items": [
+        _MARK_ORDER_USER.format(order_id="{row}.order_id"),
+        _MARK_PRODUCT.format(product_id="{row}.product_id"),
+    ],
+    "payments": [_MARK_ORDER_USER.format(order_id="{row}.order_id")],
+}
+
+
+def _trigger_sql() -> List[str]:
+    statements = []
+    for table, actions in _TRIGGER_ACTIONS.items():
+        for event, rows in (("INSERT", ["NEW"]), ("UPDATE", ["OLD", "NEW"]), ("DELETE", ["OLD"])):
+            body = " ".join(action.format(row=row) for row in rows for action in actions)
+            statements.append(
+                f"CREATE TRIGGER IF NOT EXISTS rollup_{table}_{event.lower()} "
+                f"AFTER {event} ON {table} BEGIN {body} END"
+            )
+    return statements
+
+
+def rollups_present(conn: sqlite3.Connection) -> bool:
+    found = conn.execute(
+        "SELECT COUNT(*) FROM main.sqlite_master WHERE type = 'table' AND name IN (?, ?, ?)",
+        ROLLUP_TABLES,
+    ).fetchone()[0]
+    return found == len(ROLLUP_TABLES)
+
+
+def _drop_scope(conn: sqlite3.Connection) -> None:
+    for table in SCOPE_TABLES:
+        conn.execute(f"DROP TABLE IF EXISTS temp.{table}")
+
+
+def _compute_users(conn: sqlite3.Connection, money_storage: str, scoped: bool) -> None:
+    """Insert rollup_users rows for every user, or only for rollup_dirty_users when scoped."""
+    user_scope = "WHERE {column} IN (SELECT user_id FROM rollup_dirty_users)" if scoped else ""
+    order_scope = "WHERE order_id IN (SELECT order_id FROM rollup_scope_orders)" if scoped else ""
+    mismatch = payment_mismatch_condition("COALESCE(p.paid, 0)", "o.total_amount", money_storage)
+    _drop_scope(conn)
+    statements = [
+        f"""
+        CREATE TEMP TABLE rollup_scope_orders AS
+        SELECT order_id, user_id, total_amount, strftime('%Y-%m', order_date) AS order_month
+        FROM orders {user_scope.format(column="user_id")}
+        """,
+        """
+        CREATE TEMP TABLE rollup_scope_items (
+            order_id TEXT PRIMARY KEY,
+            item_rows INTEGER NOT NULL
+        ) WITHOUT ROWID
+        """,
+        f"""
+        INSERT INTO rollup_scope_items
+        SELECT order_id, COUNT(*) FROM order_items {order_scope} GROUP BY order_id
+        """,
+        """
+        CREATE TEMP TABLE rollup_scope_payments (
+            order_id TEXT PRIMARY KEY,
+            paid,
+            payment_rows INTEGER NOT NULL,
+            successes INTEGER NOT NULL
+        ) WITHOUT ROWID
+        """,
+        f"""
+        INSERT INTO rollup_scope_payments
+        SELECT order_id, SUM(amount), COUNT(*), SUM(status = 'succeeded')
+        FROM payments {order_scope}
+        GROUP BY order_id
+        """,
+        f"""
+        INSERT INTO rollup_users
+        SELECT
+            u.user_id,
+            u.first_name || ' ' || u.last_name,
+            u.segment,
+            strftime('%Y-%m', u.signup_date),
+            COALESCE(a.revenue, 0),
+            COALESCE(a.order_count, 0),
+            COALESCE(a.active_months, 0),
+            COALESCE(a.item_rows, 0),
+            COALESCE(a.payment_rows, 0),
+            COALESCE(a.payment_slots, 0),
+            COALESCE(a.payment_successes, 0),
+            COALESCE(a.orders_without_items, 0),
+            COALESCE(a.payment_mismatches, 0)
+        FROM users u
+        LEFT JOIN (
+            SELECT
+                o.user_id,
+                SUM(o.total_amount) AS revenue,
+                COUNT(*) AS order_count,
+                COUNT(DISTINCT o.order_month) AS active_months,
+                SUM(COALESCE(i.item_rows, 0)) AS item_rows,
+                SUM(COALESCE(p.payment_rows, 0)) AS payment_rows,
+                SUM(MAX(COALESCE(p.payment_rows, 0), 1)) AS payment_slots,
+                SUM(COALESCE(p.successes, 0)) AS payment_successes,
+                SUM(i.order_id IS NULL) AS orders_without_items,
+                SUM({mismatch}) AS payment_mismatches
+            FROM rollup_scope_orders o
+            LEFT JOIN rollup_scope_items i ON i.order_id = o.order_id
+            LEFT JOIN rollup_scope_payments p ON p.order_id = o.order_id
+            GROUP BY o.user_id
+        ) a ON a.user_id = u.user_id
+        {user_scope.format(column="u.user_id")}
+        """,
+    ]
+    for statement in statements:
+        conn.execute(statement)
+    _drop_scope(conn)
+
+
+def _compute_products(conn: sqlite3.Connection, scoped: bool) -> None:
+    scope = "WHERE {column} IN (SELECT product_id FROM rollup_dirty_products)" if scoped else ""
+    conn.execute(
+        f"""
+        INSERT INTO rollup_products
+        SELECT p.product_id, p.name, COALESCE(r.revenue, 0), COALESCE(r.item_rows, 0)
+        FROM products p
+        LEFT JOIN (
+            SELECT product_id, SUM(line_total) AS revenue, COUNT(*) AS item_rows
+            FROM order_items {scope.format(column="product_id")}
+            GROUP BY product_id
+        ) r ON r.product_id = p.product_id
+        {scope.format(column="p.product_id")}
+        """
+    )
+
+
+def _compute_cohorts(conn: sqlite3.Connection, scoped: bool) -> None:
+    """Mirror the per-user CTEs of queries/join_query.sql as sums over rollup_users."""
+    scope = "WHERE cohort_month IN (SELECT cohort_month FROM rollup_scope_cohorts)" if scoped else ""
+    conn.execute(
+        f"""
+        INSERT INTO rollup_cohorts
+        SELECT
+            cohort_month,
+            COUNT(*),
+            SUM(revenue),
+            SUM(CASE WHEN order_count THEN CAST(revenue AS REAL) / order_count ELSE 0.0 END),
+            SUM(CASE WHEN order_count THEN CAST(payment_successes AS REAL) / payment_slots END),
+            SUM(order_count > 0),
+            SUM(CASE WHEN active_months THEN CAST(order_count AS REAL) / active_months ELSE 0.0 END)
+        FROM rollup_users
+        {scope}
+        GROUP BY cohort_month
+        """
+    )
+
+
+def build_rollups(conn: sqlite3.Connection, money_storage: str) -> None:
+    """Create and fully populate the rollup tables, then install the change triggers."""
+    for statement in ROLLUP_SCHEMA:
+        conn.execute(statement)
+    for table in ROLLUP_TABLES + DIRTY_TABLES:
+        conn.execute(f"DELETE FROM {table}")
+    _compute_users(conn, money_storage, scoped=False)
+    _compute_products(conn, scoped=False)
+    _compute_cohorts(conn, scoped=False)
+    for statement in _trigger_sql():
+        conn.execute(statement)
+
+
+def refresh_rollups(conn: sqlite3.Connection, money_storage: str) -> Dict[str, int]:
+    """Recompute rollup rows for keys marked dirty by the triggers; returns refreshed counts."""
+    dirty_users = conn.execute("SELECT COUNT(*) FROM rollup_dirty_users").fetchone()[0]
+    dirty_products = conn.execute("SELECT COUNT(*) FROM rollup_dirty_products").fetchone()[0]
+    if dirty_users:
+        # Old and new cohort months both change when a signup date moves.
+        conn.execute("DROP TABLE IF EXISTS temp.rollup_scope_cohorts")
+        conn.execute(
+            """
+            CREATE TEMP TABLE rollup_scope_cohorts AS
+            SELECT DISTINCT cohort_month FROM rollup_users
+            WHERE user_id IN (SELECT user_id FROM rollup_dirty_users)
+            """
+        )
+        conn.execute(
+            "DELETE FROM rollup_users WHERE user_id IN (SELECT user_id FROM rollup_dirty_users)"
+        )
+        _compute_users(conn, money_storage, scoped=True)
+        conn.execute(
+            """
+            INSERT INTO rollup_scope_cohorts
+            SELECT DISTINCT cohort_month FROM rollup_users
+            WHERE user_id IN (SELECT user_id FROM rollup_dirty_users)
+            """
+        )
+        conn.execute(
+            "DELETE FROM rollup_cohorts "
+            "WHERE cohort_month IN (SELECT cohort_month FROM rollup_scope_cohorts)"
+        )
+        _compute_cohorts(conn, scoped=True)
+        conn.execute("DROP TABLE temp.rollup_scope_cohorts")
+        conn.execute("DELETE FROM rollup_dirty_users")
+    if dirty_products:
+        conn.execute(
+            "DELETE FROM rollup_products "
+            "WHERE product_id IN (SELECT product_id FROM rollup_dirty_products)"
+        )
+        _compute_products(conn, scoped=True)
+        conn.execute("DELETE FROM rollup_dirty_products")
+    return {"users": dirty_users, "products": dirty_products}
+
+
+def require_rollups(conn: sqlite3.Connection) -> None:
+    """Raise ``RollupsUnavailable`` unless the rollups exist and match the base tables."""
+    if not rollups_present(conn):
+        raise RollupsUnavailable(
+            "The database has no rollup tables; load it with ingest.py --ingest --rollups."
+        )
+    for table in DIRTY_TABLES:
+        if conn.execute(f"SELECT EXISTS (SELECT 1 FROM {table})").fetchone()[0]:
+            raise RollupsUnavailable(
+                "The rollups are stale: the base tables changed since they were last refreshed. "
+                "Run ingest.py --ingest --incremental to refresh them."
+            )
+
+
+def _scalar(conn: sqlite3.Connection, sql: str) -> Any:
+    return conn.execute(sql).fetchone()[0]
+
+
+def fetch_report_data_rollups(conn: sqlite3.Connection) -> Dict[str, Any]:
+    require_rollups(conn)
+    money_storage = read_money_storage(conn)
+    totals = conn.execute(
+        """
+        SELECT COUNT(*), COALESCE(SUM(order_count), 0), COALESCE(SUM(item_rows), 0),
+               COALESCE(SUM(payment_rows), 0), COALESCE(SUM(orders_without_items), 0),
+               COALESCE(SUM(payment_mismatches), 0)
+        FROM rollup_users
+        """
+    ).fetchone()
+    table_counts = dict(zip(["users", "orders", "order_items", "payments"], totals[:4]))
+    table_counts["products"] = _scalar(conn, "SELECT COUNT(*) FROM products")
+    table_counts["submission_meta"] = _scalar(conn, "SELECT COUNT(*) FROM submission_meta")
+    table_counts = {table: table_counts[table] for table in REPORT_TABLES}
+
+    top_products = conn.execute(
+        f"""
+        SELECT product_id, name, ROUND({money_sql("revenue", money_storage)}, 2) AS rounded_revenue
+        FROM rollup_products
+        WHERE item_rows > 0
+        ORDER BY rounded_revenue DESC, product_id
+        LIMIT 5
+        """
+    ).fetchall()
+
+    high_value_customers = conn.execute(
+        f"""
+        SELECT user_id, customer_name, segment,
+               ROUND({money_sql("revenue", money_storage)}, 2) AS rounded_revenue
+        FROM rollup_users
+        ORDER BY rounded_revenue DESC, user_id
+        LIMIT 5
+        """
+    ).fetchall()
+
+    cohort_rows = conn.execute(
+        f"""
+        SELECT cohort_month, customers, ROUND({money_sql("revenue", money_storage)}, 2)
+        FROM rollup_cohorts
+        ORDER BY cohort_month
+        """
+    ).fetchall()
+
+    anomaly_rows = conn.execute(
+        f"""
+        SELECT o.order_id, o.user_id, o.status, p.status, {money_sql("p.amount", money_storage)}
+        FROM payments p INDEXED BY idx_rollup_failed_payments
+        JOIN orders o ON o.order_id = p.order_id
+        WHERE p.status != 'succeeded'
+        ORDER BY p.amount DESC
+        LIMIT 5
+        """
+    ).fetchall()
+
+    return assemble_report(
+        table_counts,
+        totals[4],
+        totals[5],
+        top_products,
+        high_value_customers,
+        anomaly_rows,
+        cohort_rows,
+    )
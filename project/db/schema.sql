@@ -1,5 +1,7 @@
 PRAGMA foreign_keys = ON;
 
+DROP TABLE IF EXISTS db_settings;
+DROP TABLE IF EXISTS load_state;
 DROP TABLE IF EXISTS submission_meta;
 DROP TABLE IF EXISTS payments;
 DROP TABLE IF EXISTS order_items;
@@ -68,6 +70,21 @@ CREATE TABLE submission_meta (
     generated_timestamp TEXT NOT NULL,
     total_rows_json TEXT NOT NULL,
     source_code_sha1 TEXT NOT NULL,
-    tool_used TEXT NOT NULL DEFAULT 'Cursor'
+    tool_used TEXT NOT NULL DEFAULT 'Cursor',
+    load_mode TEXT NOT NULL DEFAULT 'full'
+);
+
+CREATE TABLE load_state (
+    filename TEXT PRIMARY KEY,
+    sha1 TEXT NOT NULL,
+    bytes INTEGER NOT NULL,
+    row_count INTEGER NOT NULL,
+    loaded_timestamp TEXT NOT NULL
+);
+
+-- Database-wide settings such as money_storage ('real' dollars or integer 'cents').
+CREATE TABLE db_settings (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
 );
 
@@ -0,0 +1,91 @@
+"""
+Money storage modes.
+
+``real`` keeps currency columns as REAL dollars (the original layout). ``cents``
+stores them as INTEGER cents: values are converted once inside the INSERT
+statements, sums become exact integer arithmetic, and the report/query layers
+divide by 100 only when presenting results. The mode is recorded in the
+``db_settings`` table so readers can adapt.
+"""
+
+import re
+import sqlite3
+from typing import Dict, List
+
+
+MONEY_STORAGES = ["real", "cents"]
+MONEY_COLUMNS: Dict[str, List[str]] = {
+    "products": ["price"],
+    "orders": ["discount_amount", "total_amount"],
+    "order_items": ["unit_price", "line_total"],
+    "payments": ["amount"],
+}
+# Rollup tables (db/rollups.py) aggregate money in the same unit as the base columns.
+ROLLUP_MONEY_COLUMNS: Dict[str, List[str]] = {
+    "rollup_products": ["revenue"],
+    "rollup_users": ["revenue"],
+    "rollup_cohorts": ["revenue", "aov_sum"],
+}
+_ALL_MONEY_COLUMNS = sorted({column for columns in MONEY_COLUMNS.values() for column in columns})
+_MONEY_DDL = re.compile(rf"\b({'|'.join(_ALL_MONEY_COLUMNS)})(\s+)REAL\b")
+
+
+def apply_money_storage(schema_sql: str, storage: str) -> str:
+    if storage == "cents":
+        return _MONEY_DDL.sub(r"\1\2INTEGER", schema_sql)
+    return schema_sql
+
+
+def money_value_sql(table: str, column: str, placeholder: str, storage: str) -> str:
+    """SQL for a bound value on insert; cents mode rounds dollars to integer cents."""
+    if storage == "cents" and column in MONEY_COLUMNS.get(table, []):
+        return f"CAST(ROUND({placeholder} * 100) AS INTEGER)"
+    return placeholder
+
+
+def money_sql(expr: str, storage: str) -> str:
+    """SQL that presents a money expression (column or aggregate) in dollars."""
+    if storage == "cents":
+        return f"({expr}) / 100.0"
+    return expr
+
+
+def record_money_storage(conn: sqlite3.Connection, storage: str) -> None:
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS db_settings (key TEXT PRIMARY KEY, value TEXT NOT NULL)"
+    )
+    conn.execute(
+        "INSERT INTO db_settings (key, value) VALUES ('money_storage', ?) "
+        "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+        (storage,),
+    )
+
+
+def read_money_storage(conn: sqlite3.Connection) -> str:
+    try:
+        row = conn.execute(
+            "SELECT value FROM db_settings WHERE key = 'money_storage'"
+        ).fetchone()
+    except sqlite3.OperationalError:
+        return "real"
+    return row[0] if row else "real"
+
+
+def install_dollar_views(conn: sqlite3.Connection) -> None:
+    """Shadow cents tables with TEMP views in dollars so ad-hoc SQL reads them unchanged.
+
+    Unqualified table names resolve to the temp schema first, and SQLite flattens
+    these views, so indexes on the underlying tables stay usable.
+    """
+    if read_money_storage(conn) != "cents":
+        return
+    for table, money_columns in {**MONEY_COLUMNS, **ROLLUP_MONEY_COLUMNS}.items():
+        columns = [row[1] for row in conn.execute(f"PRAGMA main.table_info({table})")]
+        if not columns:
+            continue
+        select_list = ", ".join(
+            f"{column} / 100.0 AS {column}" if column in money_columns else column
+            for column in columns
+        )
+        conn.execute(f"DROP VIEW IF EXISTS temp.{table}")
+        conn.execute(f"CREATE TEMP VIEW {table} AS SELECT {select_list} FROM main.{table}")
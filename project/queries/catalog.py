@@ -0,0 +1,129 @@
+"""
+Named, parameterized query catalog.
+
+Each ``queries/catalog/<name>.sql`` file declares itself in its leading comments:
+
+    -- name: top_products
+    -- description: Products ranked by item revenue.
+    -- param: start_date  First order_date included (YYYY-MM-DD).
+    -- param: limit=10  Number of products returned.
+
+Parameters are bound by name (``:start_date``); unset ones bind their default,
+or NULL, which the catalog queries treat as "no filter". ``QueryRunner`` keeps
+one connection open so sqlite3's per-connection statement cache holds every
+catalog query prepared across repeated calls.
+"""
+
+import re
+import sqlite3
+from pathlib import Path
+from typing import Any, Dict, List, Mapping, Optional
+
+from db.storage import install_dollar_views
+from utils.helpers import BASE_DIR
+
+
+CATALOG_DIR = BASE_DIR / "queries" / "catalog"
+DEFAULT_CACHED_STATEMENTS = 128
+_HEADER_LINE = re.compile(r"--\s*(name|description|param):\s*(.*)")
+_PARAM_SPEC = re.compile(r"(\w+)(?:=(\S*))?\s*(.*)")
+_PLACEHOLDER = re.compile(r"(?<!:):(\w+)")
+_COMMENT = re.compile(r"--[^\n]*")
+
+
+def parse_query_file(path: Path) -> Dict[str, Any]:
+    sql = path.read_text(encoding="utf-8")
+    query: Dict[str, Any] = {
+        "name": path.stem,
+        "description": "",
+        "path": path,
+        "sql": sql,
+        "params": {},
+    }
+    for line in sql.splitlines():
+        match = _HEADER_LINE.match(line.strip())
+        if not match:
+            continue
+        key, value = match.groups()
+        if key == "param":
+            name, default, description = _PARAM_SPEC.match(value).groups()
+            query["params"][name] = {"default": default, "description": description}
+        else:
+            query[key] = value.strip()
+    used = set(_PLACEHOLDER.findall(_COMMENT.sub("", sql)))
+    undeclared = used - set(query["params"])
+    if undeclared:
+        raise ValueError(f"{path.name} uses undeclared parameters: {', '.join(sorted(undeclared))}")
+    return query
+
+
+def load_catalog(directory: Path = CATALOG_DIR) -> Dict[str, Dict[str, Any]]:
+    queries = [parse_query_file(path) for path in sorted(directory.glob("*.sql"))]
+    return {query["name"]: query for query in queries}
+
+
+def bind_params(query: Dict[str, Any], values: Optional[Mapping[str, Any]] = None) -> Dict[str, Any]:
+    """Every declared parameter, taken from ``values`` or its default; unknown names are rejected."""
+    values = dict(values or {})
+    unknown = set(values) - set(query["params"])
+    if unknown:
+        raise ValueError(
+            f"Query {query['name']} has no parameter(s): {', '.join(sorted(unknown))}"
+        )
+    return {
+        name: values.get(name, spec["default"]) for name, spec in query["params"].items()
+    }
+
+
+def parse_param_args(pairs: List[str]) -> Dict[str, str]:
+    params: Dict[str, str] = {}
+    for pair in pairs:
+        name, sep, value = pair.partition("=")
+        if not sep or not name:
+            raise ValueError(f"Expected NAME=VALUE, got {pair!r}")
+        params[name] = value
+    return params
+
+
+class QueryRunner:
+    """Runs catalog queries on one long-lived connection.
+
+    The SQL text of each query is fixed and only the bound values change, so
+    after the first call sqlite3 reuses the prepared statement from its cache.
+    """
+
+    def __init__(
+        self,
+        db_path: Path,
+        catalog: Optional[Dict[str, Dict[str, Any]]] = None,
+        cached_statements: int = DEFAULT_CACHED_STATEMENTS,
+        factory: type = sqlite3.Connection,
+    ) -> None:
+        self.catalog = catalog if catalog is not None else load_catalog()
+        self.conn = sqlite3.connect(
+            db_path, cached_statements=cached_statements, factory=factory
+        )
+        install_dollar_views(self.conn)
+
+    def query(self, name: str) -> Dict[str, Any]:
+        if name not in self.catalog:
+            raise ValueError(f"Unknown query {name!r}; choose from {', '.join(sorted(self.catalog))}")
+        return self.catalog[name]
+
+    def execute(self, name: str, params: Optional[Mapping[str, Any]] = None) -> sqlite3.Cursor:
+        query = self.query(name)
+        return self.conn.execute(query["sql"], bind_params(query, params))
+
+    def rows(self, name: str, params: Optional[Mapping[str, Any]] = None) -> List[Dict[str, Any]]:
+        cursor = self.execute(name, params)
+        columns = [column[0] for column in cursor.description]
+        return [dict(zip(columns, row)) for row in cursor]
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def __enter__(self) -> "QueryRunner":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
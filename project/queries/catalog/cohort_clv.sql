@@ -0,0 +1,65 @@
+-- name: cohort_clv
+-- description: Cohort CLV metrics from join_query.sql, optionally sliced by order date and customer attributes.
+-- param: start_date  First order_date included (YYYY-MM-DD).
+-- param: end_date  Last order_date included (YYYY-MM-DD).
+-- param: segment  Customer segment (consumer, business, vip).
+-- param: country  Customer country code.
+-- param: cohort_month  Signup month (YYYY-MM).
+-- Unset parameters bind NULL and match everything; with none set this equals join_query.sql.
+-- The date range filters orders, not customers, so customers without orders in range still count.
+WITH scoped_users AS (
+    SELECT user_id, first_name, last_name, signup_date
+    FROM users
+    WHERE (:segment IS NULL OR segment = :segment)
+      AND (:country IS NULL OR country = :country)
+      AND (:cohort_month IS NULL OR strftime('%Y-%m', signup_date) = :cohort_month)
+),
+scoped_orders AS (
+    SELECT order_id, user_id, order_date, total_amount
+    FROM orders
+    WHERE (:start_date IS NULL OR order_date >= :start_date)
+      AND (:end_date IS NULL OR order_date <= :end_date)
+),
+customer_activity AS (
+    SELECT
+        u.user_id,
+        strftime('%Y-%m', u.signup_date) AS cohort_month,
+        SUM(COALESCE(o.total_amount, 0)) AS total_revenue,
+        AVG(COALESCE(o.total_amount, 0)) AS avg_order_value
+    FROM scoped_users u
+    LEFT JOIN scoped_orders o ON o.user_id = u.user_id
+    GROUP BY u.user_id
+),
+payment_health AS (
+    SELECT
+        o.user_id,
+        AVG(CASE WHEN p.status = 'succeeded' THEN 1.0 ELSE 0.0 END) AS payment_success_ratio
+    FROM scoped_orders o
+    JOIN scoped_users u ON u.user_id = o.user_id
+    LEFT JOIN payments p ON p.order_id = o.order_id
+    GROUP BY o.user_id
+),
+order_frequency AS (
+    SELECT
+        u.user_id,
+        CASE
+            WHEN COUNT(DISTINCT strftime('%Y-%m', o.order_date)) = 0 THEN 0
+            ELSE CAST(COUNT(DISTINCT o.order_id) AS REAL) /
+                 COUNT(DISTINCT strftime('%Y-%m', o.order_date))
+        END AS monthly_frequency
+    FROM scoped_users u
+    LEFT JOIN scoped_orders o ON o.user_id = u.user_id
+    GROUP BY u.user_id
+)
+SELECT
+    ca.cohort_month,
+    COUNT(*) AS customers,
+    ROUND(SUM(ca.total_revenue), 2) AS total_revenue,
+    ROUND(AVG(ca.avg_order_value), 2) AS avg_order_value,
+    ROUND(AVG(ph.payment_success_ratio), 3) AS successful_payment_ratio,
+    ROUND(AVG(ofq.monthly_frequency), 2) AS order_frequency
+FROM customer_activity ca
+LEFT JOIN payment_health ph ON ph.user_id = ca.user_id
+LEFT JOIN order_frequency ofq ON ofq.user_id = ca.user_id
+GROUP BY ca.cohort_month
+ORDER BY ca.cohort_month;
@@ -0,0 +1,30 @@
+-- name: monthly_revenue
+-- description: Orders, revenue and payment success per order month for a customer slice.
+-- param: start_date  First order_date included (YYYY-MM-DD).
+-- param: end_date  Last order_date included (YYYY-MM-DD).
+-- param: segment  Customer segment (consumer, business, vip).
+-- param: country  Customer country code.
+-- param: cohort_month  Signup month (YYYY-MM).
+WITH order_payments AS (
+    SELECT order_id, SUM(status = 'succeeded') AS succeeded, COUNT(*) AS attempts
+    FROM payments
+    GROUP BY order_id
+)
+SELECT
+    strftime('%Y-%m', o.order_date) AS order_month,
+    COUNT(*) AS orders,
+    COUNT(DISTINCT o.user_id) AS customers,
+    ROUND(SUM(o.total_amount), 2) AS revenue,
+    ROUND(AVG(o.total_amount), 2) AS avg_order_value,
+    ROUND(CAST(SUM(COALESCE(op.succeeded, 0)) AS REAL) / MAX(SUM(COALESCE(op.attempts, 0)), 1), 3)
+        AS successful_payment_ratio
+FROM orders o
+JOIN users u ON u.user_id = o.user_id
+LEFT JOIN order_payments op ON op.order_id = o.order_id
+WHERE (:start_date IS NULL OR o.order_date >= :start_date)
+  AND (:end_date IS NULL OR o.order_date <= :end_date)
+  AND (:segment IS NULL OR u.segment = :segment)
+  AND (:country IS NULL OR u.country = :country)
+  AND (:cohort_month IS NULL OR strftime('%Y-%m', u.signup_date) = :cohort_month)
+GROUP BY order_month
+ORDER BY order_month;
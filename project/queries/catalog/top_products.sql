@@ -0,0 +1,27 @@
+-- name: top_products
+-- description: Products ranked by item revenue within an order date range and customer slice.
+-- param: start_date  First order_date included (YYYY-MM-DD).
+-- param: end_date  Last order_date included (YYYY-MM-DD).
+-- param: segment  Customer segment (consumer, business, vip).
+-- param: country  Customer country code.
+-- param: category  Product category.
+-- param: limit=10  Number of products returned.
+SELECT
+    p.product_id,
+    p.name,
+    p.category,
+    SUM(oi.quantity) AS units,
+    COUNT(DISTINCT o.order_id) AS orders,
+    ROUND(SUM(oi.line_total), 2) AS revenue
+FROM order_items oi
+JOIN orders o ON o.order_id = oi.order_id
+JOIN users u ON u.user_id = o.user_id
+JOIN products p ON p.product_id = oi.product_id
+WHERE (:start_date IS NULL OR o.order_date >= :start_date)
+  AND (:end_date IS NULL OR o.order_date <= :end_date)
+  AND (:segment IS NULL OR u.segment = :segment)
+  AND (:country IS NULL OR u.country = :country)
+  AND (:category IS NULL OR p.category = :category)
+GROUP BY p.product_id
+ORDER BY revenue DESC, p.product_id
+LIMIT CAST(:limit AS INTEGER);
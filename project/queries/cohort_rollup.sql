@@ -0,0 +1,11 @@
+-- Same columns as join_query.sql, answered from the rollup_cohorts summary table.
+-- Run with: python run_query.py --rollups
+SELECT
+    cohort_month,
+    customers,
+    ROUND(revenue, 2) AS total_revenue,
+    ROUND(aov_sum / customers, 2) AS avg_order_value,
+    ROUND(success_ratio_sum / ordering_customers, 3) AS successful_payment_ratio,
+    ROUND(frequency_sum / customers, 2) AS order_frequency
+FROM rollup_cohorts
+ORDER BY cohort_month;
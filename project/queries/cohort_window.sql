@@ -0,0 +1,50 @@
+-- join_query_optimized.sql restricted to users who signed up in [:first_month, :stop_month).
+-- Used by /api/cohorts (queries/dashboard_api.py) for bounded pages. The bounds are YYYY-MM
+-- strings compared with signup_date (YYYY-MM-DD), and they can use an index on signup_date.
+-- Both CTEs start from the users in range, so orders and payments outside the window are
+-- never aggregated. For the full history, join_query_optimized.sql is faster: it aggregates
+-- payments in one pass without joining through users.
+WITH order_payments AS (
+    SELECT
+        p.order_id,
+        COUNT(*) AS payment_rows,
+        SUM(p.status = 'succeeded') AS succeeded
+    FROM users u
+    JOIN orders o ON o.user_id = u.user_id
+    JOIN payments p ON p.order_id = o.order_id
+    WHERE (:first_month IS NULL OR u.signup_date >= :first_month)
+      AND (:stop_month IS NULL OR u.signup_date < :stop_month)
+    GROUP BY p.order_id
+),
+user_totals AS (
+    SELECT
+        u.user_id,
+        strftime('%Y-%m', u.signup_date) AS cohort_month,
+        COUNT(o.order_id) AS order_count,
+        SUM(o.total_amount) AS revenue,
+        COUNT(DISTINCT strftime('%Y-%m', o.order_date)) AS active_months,
+        SUM(CASE WHEN o.order_id IS NOT NULL THEN MAX(COALESCE(op.payment_rows, 0), 1) END)
+            AS payment_slots,
+        SUM(COALESCE(op.succeeded, 0)) AS succeeded
+    FROM users u
+    LEFT JOIN orders o ON o.user_id = u.user_id
+    LEFT JOIN order_payments op ON op.order_id = o.order_id
+    WHERE (:first_month IS NULL OR u.signup_date >= :first_month)
+      AND (:stop_month IS NULL OR u.signup_date < :stop_month)
+    GROUP BY u.user_id
+)
+SELECT
+    cohort_month,
+    COUNT(*) AS customers,
+    ROUND(SUM(COALESCE(revenue, 0)), 2) AS total_revenue,
+    ROUND(AVG(COALESCE(revenue / order_count, 0)), 2) AS avg_order_value,
+    ROUND(AVG(CAST(succeeded AS REAL) / payment_slots), 3) AS successful_payment_ratio,
+    ROUND(AVG(
+        CASE
+            WHEN active_months = 0 THEN 0
+            ELSE CAST(order_count AS REAL) / active_months
+        END
+    ), 2) AS order_frequency
+FROM user_totals
+GROUP BY cohort_month
+ORDER BY cohort_month;
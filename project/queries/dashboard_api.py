@@ -0,0 +1,243 @@
+"""
+JSON API behind serve_frontend.py.
+
+``/api/report`` returns the report sections the dashboard shows and
+``/api/cohorts`` the cohort CLV rows, both read from ecommerce.db when the
+request arrives, so the dashboard no longer depends on report.json and
+query_result.json being regenerated. Ranked lists and cohorts are paginated
+with ``limit``/``offset`` and can be filtered, so a response stays small
+however large the database grows. Bad parameters raise ValueError, and a
+missing database raises FileNotFoundError.
+"""
+
+import re
+import sqlite3
+import threading
+from contextlib import contextmanager
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Mapping, Tuple
+
+from db.report_engine import CLASSIC_SECTIONS, REPORT_LIST_SIZE, assemble_report
+from db.storage import install_dollar_views, read_money_storage
+from queries.run_query import OPTIMIZED_QUERY_PATH
+from utils.helpers import BASE_DIR
+
+
+DB_PATH = BASE_DIR / "db" / "ecommerce.db"
+COHORT_WINDOW_PATH = BASE_DIR / "queries" / "cohort_window.sql"
+DEFAULT_POOL_SIZE = 8
+DEFAULT_COHORT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+# Report keys served by /api/report and the CLASSIC_SECTIONS each one needs.
+REPORT_SECTIONS: Dict[str, List[str]] = {
+    "table_row_counts": ["table_row_counts"],
+    "validations": ["orders_without_items", "payment_mismatches"],
+    "top_products": ["top_products"],
+    "high_value_customers": ["high_value_customers"],
+    "anomalies": ["anomalies"],
+    "cohort_insights": ["cohort_insights"],
+}
+# Stand-ins for sections that were not requested; assemble_report() needs every argument.
+_SKIPPED_SECTIONS: Dict[str, Any] = {
+    "table_row_counts": {},
+    "orders_without_items": 0,
+    "payment_mismatches": 0,
+    "top_products": [],
+    "high_value_customers": [],
+    "anomalies": [],
+    "cohort_insights": [],
+}
+_MONTH = re.compile(r"\d{4}-\d{2}")
+
+
+class ReadPool:
+    """Read-only connections, each lent to one request thread at a time.
+
+    ThreadingTCPServer starts a new thread per connection, so thread-local
+    connections would be opened and dropped on every request; pooled ones keep
+    their prepared statements and TEMP views. A full ingest deletes and rebuilds
+    the database file, so connections opened on an older file are closed rather
+    than reused. ``dollar_views`` installs the cents-to-dollars views that
+    hand-written SQL such as the cohort query expects.
+    """
+
+    def __init__(
+        self, db_path: Path = DB_PATH, size: int = DEFAULT_POOL_SIZE, dollar_views: bool = False
+    ) -> None:
+        self.db_path = db_path
+        self.dollar_views = dollar_views
+        self._slots = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+        self._idle: List[Tuple[Tuple[int, int], sqlite3.Connection]] = []
+
+    def _file_identity(self) -> Tuple[int, int]:
+        try:
+            stat = self.db_path.stat()
+        except FileNotFoundError:
+            raise FileNotFoundError("Database not found. Run ingestion first.") from None
+        return stat.st_dev, stat.st_ino
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(
+            f"{self.db_path.resolve().as_uri()}?mode=ro", uri=True, check_same_thread=False
+        )
+        if self.dollar_views:
+            install_dollar_views(conn)
+        return conn
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        identity = self._file_identity()
+        with self._slots:
+            conn = None
+            with self._lock:
+                while self._idle and conn is None:
+                    idle_identity, idle = self._idle.pop()
+                    if idle_identity == identity:
+                        conn = idle
+                    else:
+                        idle.close()
+            if conn is None:
+                conn = self._connect()
+            try:
+                yield conn
+            finally:
+                with self._lock:
+                    self._idle.append((identity, conn))
+
+    def close(self) -> None:
+        with self._lock:
+            for _, conn in self._idle:
+                conn.close()
+            self._idle.clear()
+
+
+def _check_params(params: Mapping[str, str], allowed: List[str]) -> None:
+    unknown = set(params) - set(allowed)
+    if unknown:
+        raise ValueError(
+            f"Unknown parameter(s): {', '.join(sorted(unknown))}; "
+            f"expected {', '.join(allowed)}"
+        )
+
+
+def _int_param(params: Mapping[str, str], name: str, default: int) -> int:
+    try:
+        return int(params.get(name, default))
+    except ValueError:
+        raise ValueError(f"{name} must be an integer") from None
+
+
+def page_params(params: Mapping[str, str], default_limit: int) -> Tuple[int, int]:
+    limit = _int_param(params, "limit", default_limit)
+    offset = _int_param(params, "offset", 0)
+    if not 1 <= limit <= MAX_PAGE_SIZE:
+        raise ValueError(f"limit must be between 1 and {MAX_PAGE_SIZE}")
+    if offset < 0:
+        raise ValueError("offset cannot be negative")
+    return limit, offset
+
+
+def fetch_report(conn: sqlite3.Connection, params: Mapping[str, str]) -> Dict[str, Any]:
+    """Requested report sections; ``limit``/``offset`` page the ranked lists.
+
+    ``segment`` filters high-value customers and ``payment_status`` anomalies. With
+    no parameters the sections match report.json from the classic engine.
+    """
+    _check_params(params, ["sections", "limit", "offset", "segment", "payment_status"])
+    requested = params.get("sections")
+    keys = requested.split(",") if requested else list(REPORT_SECTIONS)
+    unknown = set(keys) - set(REPORT_SECTIONS)
+    if unknown:
+        raise ValueError(
+            f"Unknown section(s): {', '.join(sorted(unknown))}; "
+            f"choose from {', '.join(REPORT_SECTIONS)}"
+        )
+    limit, offset = page_params(params, REPORT_LIST_SIZE)
+    options: Dict[str, Dict[str, Any]] = {
+        "top_products": {"limit": limit, "offset": offset},
+        "high_value_customers": {
+            "limit": limit,
+            "offset": offset,
+            "segment": params.get("segment"),
+        },
+        "anomalies": {
+            "limit": limit,
+            "offset": offset,
+            "payment_status": params.get("payment_status"),
+        },
+    }
+    needed = {name for key in keys for name in REPORT_SECTIONS[key]}
+    money_storage = read_money_storage(conn)
+    results = [
+        section(conn, money_storage, **options.get(name, {}))
+        if name in needed
+        else _SKIPPED_SECTIONS[name]
+        for name, section in CLASSIC_SECTIONS.items()
+    ]
+    report = assemble_report(*results)
+    payload = {key: report[key] for key in keys}
+    payload["page"] = {"limit": limit, "offset": offset}
+    return payload
+
+
+_COHORT_MONTHS_SQL = """
+    SELECT DISTINCT strftime('%Y-%m', signup_date) AS cohort_month
+    FROM users
+    WHERE (:first_month IS NULL OR signup_date >= :first_month)
+      AND (:stop_month IS NULL OR signup_date < :stop_month)
+    ORDER BY cohort_month
+"""
+
+
+@lru_cache(maxsize=None)
+def _cohort_sql(query_path: Path) -> str:
+    return query_path.read_text(encoding="utf-8")
+
+
+def _next_month(month: str) -> str:
+    year, number = int(month[:4]), int(month[5:])
+    return f"{year + number // 12:04d}-{number % 12 + 1:02d}"
+
+
+def fetch_cohorts(conn: sqlite3.Connection, params: Mapping[str, str]) -> Dict[str, Any]:
+    """Cohort CLV rows between the ``from`` and ``to`` months (YYYY-MM), paginated.
+
+    Needs a connection with dollar views. The signup months in range are listed
+    from ``users`` alone, which gives ``total`` and the months on the requested
+    page; only those months' users are then joined to orders and payments. A page
+    open at both ends is the full history, read with the optimized cohort query.
+    """
+    _check_params(params, ["from", "to", "limit", "offset"])
+    for name in ("from", "to"):
+        value = params.get(name)
+        if value is not None and not _MONTH.fullmatch(value):
+            raise ValueError(f"{name} must be a month in YYYY-MM form")
+    limit, offset = page_params(params, DEFAULT_COHORT_PAGE_SIZE)
+    to = params.get("to")
+    bounds = {"first_month": params.get("from"), "stop_month": to and _next_month(to)}
+    months = [row[0] for row in conn.execute(_COHORT_MONTHS_SQL, bounds)]
+    page = months[offset : offset + limit]
+    rows: List[Dict[str, Any]] = []
+    if page:
+        # Narrow the bounds to the page; an end the page reaches keeps the request's bound.
+        # A NULL cohort (no signup_date) sorts first, so it only appears on an open first
+        # page, and rows outside the page that the bounds cannot exclude are dropped below.
+        first = page[0] if offset else bounds["first_month"]
+        last_page = offset + limit >= len(months)
+        stop = bounds["stop_month"] if last_page or page[-1] is None else _next_month(page[-1])
+        if first is None and stop is None:
+            cursor = conn.execute(_cohort_sql(OPTIMIZED_QUERY_PATH))
+        else:
+            cursor = conn.execute(
+                _cohort_sql(COHORT_WINDOW_PATH), {"first_month": first, "stop_month": stop}
+            )
+        columns = [column[0] for column in cursor.description]
+        wanted = set(page)
+        rows = [dict(zip(columns, row)) for row in cursor]
+        rows = [row for row in rows if row["cohort_month"] in wanted]
+    return {
+        "cohorts": rows,
+        "page": {"limit": limit, "offset": offset, "total": len(months)},
+    }
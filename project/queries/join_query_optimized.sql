@@ -0,0 +1,46 @@
+-- Same rows as join_query.sql with one pass over orders instead of three.
+-- Payments are pre-aggregated per order, and each user's orders are read once to derive
+-- order count, revenue, active months and payment success together. The one remaining
+-- COUNT(DISTINCT) only deduplicates a single user's order months at a time; grouping all
+-- orders by (user, month) instead needs a sort over every order and measured slower.
+-- Run with: python run_query.py --query queries/join_query_optimized.sql
+WITH order_payments AS (
+    SELECT
+        order_id,
+        COUNT(*) AS payment_rows,
+        SUM(status = 'succeeded') AS succeeded
+    FROM payments
+    GROUP BY order_id
+),
+user_totals AS (
+    SELECT
+        u.user_id,
+        strftime('%Y-%m', u.signup_date) AS cohort_month,
+        COUNT(o.order_id) AS order_count,
+        SUM(o.total_amount) AS revenue,
+        COUNT(DISTINCT strftime('%Y-%m', o.order_date)) AS active_months,
+        -- An order without payments still counts once (as a failure) in the success ratio;
+        -- a user without orders has no ratio at all.
+        SUM(CASE WHEN o.order_id IS NOT NULL THEN MAX(COALESCE(op.payment_rows, 0), 1) END)
+            AS payment_slots,
+        SUM(COALESCE(op.succeeded, 0)) AS succeeded
+    FROM users u
+    LEFT JOIN orders o ON o.user_id = u.user_id
+    LEFT JOIN order_payments op ON op.order_id = o.order_id
+    GROUP BY u.user_id
+)
+SELECT
+    cohort_month,
+    COUNT(*) AS customers,
+    ROUND(SUM(COALESCE(revenue, 0)), 2) AS total_revenue,
+    ROUND(AVG(COALESCE(revenue / order_count, 0)), 2) AS avg_order_value,
+    ROUND(AVG(CAST(succeeded AS REAL) / payment_slots), 3) AS successful_payment_ratio,
+    ROUND(AVG(
+        CASE
+            WHEN active_months = 0 THEN 0
+            ELSE CAST(order_count AS REAL) / active_months
+        END
+    ), 2) AS order_frequency
+FROM user_totals
+GROUP BY cohort_month
+ORDER BY cohort_month;
@@ -0,0 +1,189 @@
+"""
+On-disk result cache for run_query.py.
+
+An entry is keyed on the SHA-1 of the query file and the bound parameters, and
+records the database version it was computed against. The version hashes the
+``submission_meta`` history, the per-file ``load_state`` fingerprints, the
+money storage mode and the ``data_changes`` counter ingest keeps in
+``db_settings``, so it changes with every load that applies data and with any
+other write to the base tables. Entries from another version are deleted the next time the
+cache is consulted. Each entry keeps copies of the output files it produced;
+least recently used entries are evicted once the cache exceeds its size limit.
+"""
+
+import hashlib
+import json
+import logging
+import shutil
+import sqlite3
+import time
+from pathlib import Path
+from typing import Any, Dict, Mapping, Optional
+
+from db.storage import read_money_storage
+from utils.helpers import BASE_DIR, now_utc_iso, write_json
+
+
+CACHE_DIR = BASE_DIR / ".query_cache"
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+META_NAME = "meta.json"
+STATS_NAME = "stats.json"
+
+
+def database_version(conn: sqlite3.Connection) -> str:
+    # Not PRAGMA data_version: that only reports changes made since this connection
+    # last read, so it cannot be compared with a version stored by an earlier run.
+    # submission_meta and load_state only move when ingest runs; the data_changes
+    # triggers (db/ingest.py) also count rows written outside it, so an ad-hoc UPDATE
+    # invalidates cached results too. Databases loaded before the counter existed
+    # get it from their next ingest.
+    digest = hashlib.sha1()
+    meta = conn.execute(
+        "SELECT COUNT(*), MAX(rowid), MAX(generated_timestamp) FROM submission_meta"
+    ).fetchone()
+    digest.update(json.dumps(list(meta)).encode("utf-8"))
+    try:
+        states = conn.execute(
+            "SELECT filename, sha1, row_count FROM load_state ORDER BY filename"
+        ).fetchall()
+    except sqlite3.OperationalError:
+        states = []
+    digest.update(json.dumps(states).encode("utf-8"))
+    digest.update(read_money_storage(conn).encode("utf-8"))
+    try:
+        changes = conn.execute(
+            "SELECT value FROM db_settings WHERE key = 'data_changes'"
+        ).fetchone()
+    except sqlite3.OperationalError:
+        changes = None
+    digest.update(json.dumps(changes).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def cache_key(query_sha1: str, params: Optional[Mapping[str, Any]] = None) -> str:
+    payload = json.dumps({"query": query_sha1, "params": dict(params or {})}, sort_keys=True)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+class ResultCache:
+    """Output files of past queries, stored under ``directory/<key>/``."""
+
+    def __init__(
+        self,
+        directory: Path = CACHE_DIR,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        logger: Optional[logging.Logger] = None,
+    ) -> None:
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.logger = logger or logging.getLogger("run_query")
+
+    def _read_meta(self, entry: Path) -> Optional[Dict[str, Any]]:
+        try:
+            return json.loads((entry / META_NAME).read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+
+    def _entries(self) -> Dict[Path, Optional[Dict[str, Any]]]:
+        if not self.directory.exists():
+            return {}
+        return {entry: self._read_meta(entry) for entry in self.directory.iterdir() if entry.is_dir()}
+
+    def stats(self) -> Dict[str, int]:
+        path = self.directory / STATS_NAME
+        try:
+            return json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return {"hits": 0, "misses": 0, "invalidated": 0, "evicted": 0}
+
+    def _bump(self, **increments: int) -> Dict[str, int]:
+        stats = self.stats()
+        for name, amount in increments.items():
+            stats[name] = stats.get(name, 0) + amount
+        write_json(self.directory / STATS_NAME, stats)
+        return stats
+
+    def invalidate_stale(self, version: str) -> int:
+        stale = [
+            entry
+            for entry, meta in self._entries().items()
+            if meta is None or meta.get("version") != version
+        ]
+        for entry in stale:
+            shutil.rmtree(entry, ignore_errors=True)
+        return len(stale)
+
+    def lookup(
+        self, key: str, version: str, outputs: Mapping[str, Path]
+    ) -> Optional[int]:
+        """Copy cached outputs into place and return the row count, or None on a miss."""
+        invalidated = self.invalidate_stale(version)
+        entry = self.directory / key
+        meta = self._read_meta(entry)
+        if meta is None or not set(outputs) <= set(meta["files"]):
+            stats = self._bump(misses=1, invalidated=invalidated)
+            self.logger.info(
+                "Result cache miss (hits=%s, misses=%s, invalidated=%s).",
+                stats["hits"],
+                stats["misses"],
+                stats["invalidated"],
+            )
+            return None
+        for fmt, path in outputs.items():
+            path.parent.mkdir(parents=True, exist_ok=True)
+            shutil.copyfile(entry / meta["files"][fmt], path)
+        meta["last_used"] = time.time()
+        meta["uses"] = meta.get("uses", 0) + 1
+        write_json(entry / META_NAME, meta)
+        stats = self._bump(hits=1, invalidated=invalidated)
+        self.logger.info(
+            "Result cache hit (hits=%s, misses=%s, invalidated=%s).",
+            stats["hits"],
+            stats["misses"],
+            stats["invalidated"],
+        )
+        return meta["rows"]
+
+    def store(self, key: str, version: str, outputs: Mapping[str, Path], rows: int) -> None:
+        entry = self.directory / key
+        shutil.rmtree(entry, ignore_errors=True)
+        entry.mkdir(parents=True)
+        files = {}
+        size = 0
+        for fmt, path in outputs.items():
+            shutil.copyfile(path, entry / path.name)
+            files[fmt] = path.name
+            size += path.stat().st_size
+        meta = {
+            "version": version,
+            "rows": rows,
+            "files": files,
+            "bytes": size,
+            "created": now_utc_iso(),
+            "last_used": time.time(),
+            "uses": 0,
+        }
+        write_json(entry / META_NAME, meta)
+        self.evict(keep=entry)
+
+    def evict(self, keep: Optional[Path] = None) -> int:
+        """Drop least recently used entries until the cache fits in ``max_bytes``."""
+        entries = [(entry, meta) for entry, meta in self._entries().items() if meta is not None]
+        total = sum(meta["bytes"] for _, meta in entries)
+        evicted = 0
+        for entry, meta in sorted(entries, key=lambda item: item[1]["last_used"]):
+            if total <= self.max_bytes:
+                break
+            if entry == keep:
+                continue
+            shutil.rmtree(entry, ignore_errors=True)
+            total -= meta["bytes"]
+            evicted += 1
+        if evicted:
+            self._bump(evicted=evicted)
+            self.logger.info("Result cache evicted %s entries.", evicted)
+        return evicted
+
+    def clear(self) -> None:
+        shutil.rmtree(self.directory, ignore_errors=True)
+
@@ -1,54 +1,341 @@
 import argparse
 import csv
+import json
 import sqlite3
+import textwrap
+import time
+from contextlib import ExitStack
 from pathlib import Path
+from typing import Any, Dict, List, Mapping, Optional, Sequence
 
-from utils.helpers import BASE_DIR, configure_logger, write_json
+from db.profiling import ProfilingConnection, build_profile, log_profile, profile_ctes
+from db.rollups import RollupsUnavailable, require_rollups
+from db.storage import install_dollar_views
+from queries.catalog import QueryRunner, bind_params, load_catalog, parse_param_args
+from queries.result_cache import DEFAULT_MAX_BYTES, ResultCache, cache_key, database_version
+from utils.columnar import ColumnarWriter
+from utils.helpers import (
+    BASE_DIR,
+    configure_logger,
+    ensure_parent_dir,
+    hash_file_sha1,
+    write_json,
+)
+from utils.metrics import METRICS, stage_timer, write_metrics
+from utils.profilers import add_profile_args, profiled
 
 
 DB_PATH = BASE_DIR / "db" / "ecommerce.db"
 QUERY_PATH = BASE_DIR / "queries" / "join_query.sql"
+OPTIMIZED_QUERY_PATH = BASE_DIR / "queries" / "join_query_optimized.sql"
+ROLLUP_QUERY_PATH = BASE_DIR / "queries" / "cohort_rollup.sql"
 CSV_OUTPUT = BASE_DIR / "query_result.csv"
 JSON_OUTPUT = BASE_DIR / "query_result.json"
+NDJSON_OUTPUT = BASE_DIR / "query_result.ndjson"
+COLUMNAR_OUTPUT = BASE_DIR / "query_result.col"
+PROFILE_OUTPUT = BASE_DIR / "query_profile.json"
+OUTPUT_FORMATS = ["csv", "json", "ndjson", "columnar"]
+DEFAULT_FORMATS = ["csv", "json"]
+FETCH_SIZE = 1000
 
 
 def parse_args() -> argparse.Namespace:
     parser = argparse.ArgumentParser(description="Run cohort CLV query.")
     parser.add_argument("--query", type=str, default=str(QUERY_PATH), help="SQL file.")
+    parser.add_argument(
+        "--rollups",
+        action="store_true",
+        help="Answer the cohort query from the materialized rollup tables.",
+    )
+    parser.add_argument(
+        "--name",
+        help="Run a named query from queries/catalog/ instead of --query (see --list).",
+    )
+    parser.add_argument(
+        "--param",
+        action="append",
+        default=[],
+        metavar="NAME=VALUE",
+        help="Bind a catalog query parameter; repeat for several.",
+    )
+    parser.add_argument(
+        "--list", action="store_true", help="List catalog queries and their parameters."
+    )
+    parser.add_argument(
+        "--format",
+        dest="formats",
+        action="append",
+        choices=OUTPUT_FORMATS,
+        help="Output format; repeat for several (default: csv and json).",
+    )
+    parser.add_argument(
+        "--fetch-size",
+        type=int,
+        default=FETCH_SIZE,
+        help="Rows fetched from SQLite per fetchmany() call.",
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help=(
+            "Record EXPLAIN QUERY PLAN, wall time and rows per statement and per CTE "
+            "in query_profile.json (bypasses the result cache)."
+        ),
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Always execute the query instead of reusing a cached result.",
+    )
+    parser.add_argument(
+        "--cache-max-mb",
+        type=float,
+        default=DEFAULT_MAX_BYTES / (1024 * 1024),
+        help="Size limit of the on-disk result cache before old entries are evicted.",
+    )
+    add_profile_args(parser)
     return parser.parse_args()
 
 
-def run_query(sql_path: Path):
+def output_paths() -> Dict[str, Path]:
+    return {
+        "csv": CSV_OUTPUT,
+        "json": JSON_OUTPUT,
+        "ndjson": NDJSON_OUTPUT,
+        "columnar": COLUMNAR_OUTPUT,
+    }
+
+
+def write_results(
+    cursor: sqlite3.Cursor, formats: Sequence[str], fetch_size: int = FETCH_SIZE
+) -> int:
+    """Stream the cursor into every requested format in one pass; returns the row count.
+
+    The JSON array is written element by element in the same layout as
+    ``write_json`` (indent=2, sorted keys), so only one batch is held in memory.
+    The columnar file buffers up to one chunk of rows before writing it.
+    """
+    fieldnames: List[str] = [column[0] for column in cursor.description or []]
+    paths = output_paths()
+    count = 0
+    with ExitStack() as stack:
+        handles = {}
+        columnar = None
+        if "columnar" in formats:
+            columnar = stack.enter_context(ColumnarWriter(paths["columnar"], fieldnames))
+        for fmt in formats:
+            if fmt == "columnar":
+                continue
+            ensure_parent_dir(paths[fmt])
+            newline = "" if fmt == "csv" else None
+            handles[fmt] = stack.enter_context(
+                paths[fmt].open("w", newline=newline, encoding="utf-8")
+            )
+        csv_writer = csv.writer(handles["csv"]) if "csv" in handles else None
+        json_fh = handles.get("json")
+        ndjson_fh = handles.get("ndjson")
+        if csv_writer:
+            csv_writer.writerow(fieldnames)
+        if json_fh:
+            json_fh.write("[")
+        while True:
+            rows = cursor.fetchmany(fetch_size)
+            if not rows:
+                break
+            if csv_writer:
+                csv_writer.writerows(rows)
+            if columnar:
+                columnar.write_rows(rows)
+            if json_fh or ndjson_fh:
+                for index, row in enumerate(rows, start=count):
+                    record = dict(zip(fieldnames, row))
+                    if json_fh:
+                        item = json.dumps(record, indent=2, sort_keys=True)
+                        json_fh.write(("," if index else "") + "\n" + textwrap.indent(item, "  "))
+                    if ndjson_fh:
+                        ndjson_fh.write(json.dumps(record, sort_keys=True) + "\n")
+            count += len(rows)
+        if json_fh:
+            json_fh.write("\n]" if count else "]")
+    return count
+
+
+def execute_to_outputs(
+    conn: sqlite3.Connection,
+    sql: str,
+    query_path: Path,
+    params: Mapping[str, Any],
+    formats: Sequence[str],
+    fetch_size: int,
+    cache: Optional[ResultCache],
+) -> int:
+    """Write the query's outputs, from the result cache when it holds a current entry.
+
+    On a ProfilingConnection the query always runs and its profile is written too.
+    """
+    if isinstance(conn, ProfilingConnection):
+        return profile_to_outputs(conn, sql, query_path, params, formats, fetch_size)
+    if cache is None:
+        return write_results(conn.execute(sql, params), formats, fetch_size)
+    outputs = {fmt: output_paths()[fmt] for fmt in formats}
+    version = database_version(conn)
+    key = cache_key(hash_file_sha1(query_path), params)
+    rows = cache.lookup(key, version, outputs)
+    if rows is None:
+        rows = write_results(conn.execute(sql, params), formats, fetch_size)
+        cache.store(key, version, outputs, rows)
+    return rows
+
+
+def profile_to_outputs(
+    conn: ProfilingConnection,
+    sql: str,
+    query_path: Path,
+    params: Mapping[str, Any],
+    formats: Sequence[str],
+    fetch_size: int,
+) -> int:
+    logger = configure_logger("run_query")
+    conn.statements.clear()
+    started = time.perf_counter()
+    rows = write_results(conn.execute(sql, params), formats, fetch_size)
+    elapsed = time.perf_counter() - started
+    profile = build_profile(
+        "run_query",
+        conn.statements,
+        elapsed,
+        query=query_path.name,
+        params=dict(params),
+        ctes=profile_ctes(conn, sql, params),
+    )
+    write_json(PROFILE_OUTPUT, profile)
+    log_profile(profile, logger)
+    logger.info("Profile saved to %s", PROFILE_OUTPUT.name)
+    return rows
+
+
+def record_output_metrics(target: str, rows: int, formats: Sequence[str]) -> None:
+    paths = output_paths()
+    METRICS.count(
+        "run_query", target, rows=rows, nbytes=sum(paths[fmt].stat().st_size for fmt in formats)
+    )
+
+
+def run_query(
+    sql_path: Path,
+    rollups: bool = False,
+    formats: Sequence[str] = DEFAULT_FORMATS,
+    fetch_size: int = FETCH_SIZE,
+    cache: Optional[ResultCache] = None,
+    profile: bool = False,
+):
     logger = configure_logger("run_query")
     if not DB_PATH.exists():
         raise FileNotFoundError("Database not found. Run ingestion first.")
     sql = sql_path.read_text(encoding="utf-8")
-    with sqlite3.connect(DB_PATH) as conn:
-        conn.row_factory = sqlite3.Row
-        rows = conn.execute(sql).fetchall()
-
-    fieldnames = rows[0].keys() if rows else []
-    CSV_OUTPUT.parent.mkdir(parents=True, exist_ok=True)
-    with CSV_OUTPUT.open("w", newline="", encoding="utf-8") as fh:
-        writer = csv.DictWriter(fh, fieldnames=fieldnames)
-        writer.writeheader()
-        for row in rows:
-            writer.writerow(dict(row))
-
-    write_json(JSON_OUTPUT, [dict(row) for row in rows])
+    factory = ProfilingConnection if profile else sqlite3.Connection
+    with sqlite3.connect(DB_PATH, factory=factory) as conn:
+        if rollups:
+            require_rollups(conn)
+        install_dollar_views(conn)
+        with stage_timer("run_query", sql_path.name):
+            count = execute_to_outputs(conn, sql, sql_path, {}, formats, fetch_size, cache)
+
+    paths = output_paths()
+    record_output_metrics(sql_path.name, count, formats)
     logger.info(
-        "Query complete. Rows: %s. Outputs: %s, %s",
-        len(rows),
-        CSV_OUTPUT.name,
-        JSON_OUTPUT.name,
+        "Query complete. Rows: %s. Outputs: %s",
+        count,
+        ", ".join(paths[fmt].name for fmt in formats),
     )
 
 
+def run_catalog_query(
+    name: str,
+    params: Dict[str, str],
+    formats: Sequence[str] = DEFAULT_FORMATS,
+    fetch_size: int = FETCH_SIZE,
+    cache: Optional[ResultCache] = None,
+    profile: bool = False,
+) -> None:
+    logger = configure_logger("run_query")
+    if not DB_PATH.exists():
+        raise FileNotFoundError("Database not found. Run ingestion first.")
+    factory = ProfilingConnection if profile else sqlite3.Connection
+    with QueryRunner(DB_PATH, factory=factory) as runner:
+        query = runner.query(name)
+        with stage_timer("run_query", name):
+            count = execute_to_outputs(
+                runner.conn,
+                query["sql"],
+                query["path"],
+                bind_params(query, params),
+                formats,
+                fetch_size,
+                cache,
+            )
+    paths = output_paths()
+    record_output_metrics(name, count, formats)
+    logger.info(
+        "Query %s complete. Rows: %s. Outputs: %s",
+        name,
+        count,
+        ", ".join(paths[fmt].name for fmt in formats),
+    )
+
+
+def print_catalog() -> None:
+    for name, query in load_catalog().items():
+        print(f"{name}: {query['description']}")
+        for param, spec in query["params"].items():
+            default = f" (default {spec['default']})" if spec["default"] is not None else ""
+            print(f"    {param}{default}: {spec['description']}")
+
+
 def main() -> None:
     args = parse_args()
-    run_query(Path(args.query))
+    if args.list:
+        print_catalog()
+        return
+    if args.fetch_size < 1:
+        raise SystemExit("--fetch-size must be at least 1.")
+    if args.param and not args.name:
+        raise SystemExit("--param requires --name.")
+    if args.cache_max_mb < 0:
+        raise SystemExit("--cache-max-mb cannot be negative.")
+    # Repeated --format flags may name a format twice; keep the first mention.
+    formats = list(dict.fromkeys(args.formats or DEFAULT_FORMATS))
+    cache = None
+    if not args.no_cache and not args.profile:
+        cache = ResultCache(
+            max_bytes=int(args.cache_max_mb * 1024 * 1024), logger=configure_logger("run_query")
+        )
+    try:
+        with profiled("run_query", args, configure_logger("run_query")):
+            if args.name:
+                try:
+                    run_catalog_query(
+                        args.name,
+                        parse_param_args(args.param),
+                        formats,
+                        args.fetch_size,
+                        cache,
+                        args.profile,
+                    )
+                except ValueError as exc:
+                    raise SystemExit(str(exc))
+            elif args.rollups:
+                try:
+                    run_query(
+                        ROLLUP_QUERY_PATH, True, formats, args.fetch_size, cache, args.profile
+                    )
+                except RollupsUnavailable as exc:
+                    raise SystemExit(str(exc))
+            else:
+                run_query(Path(args.query), False, formats, args.fetch_size, cache, args.profile)
+    finally:
+        write_metrics("run_query")
 
 
 if __name__ == "__main__":
     main()
-
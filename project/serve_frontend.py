@@ -1,48 +1,615 @@
 """
 Simple helper to serve the repo root while automatically redirecting /
 to the dashboard at /frontend/.
+
+``/api/report`` and ``/api/cohorts`` answer from ecommerce.db directly
+(see queries/dashboard_api.py). Files carry a strong ETag built from their
+mtime and size, so a dashboard refresh revalidates with ``If-None-Match`` and
+gets a bodiless 304 while nothing changed. JSON, HTML and other text is
+gzipped for clients that accept it; compressed bodies are kept in memory,
+least recently used first out once they exceed ``GZIP_CACHE_MB``.
+
+``--async`` serves the same responses from one asyncio event loop instead of
+a thread per connection, and adds ``/api/events``: a server-sent event stream
+that announces ``data-updated`` whenever report.json, query_result.json or
+ecommerce.db change, so open dashboards reload their data without polling.
+
+``/metrics`` serves, in Prometheus text format, the stage timings and row and
+byte counts that the pipeline entry points last recorded in metrics.jsonl
+(see utils/metrics.py), plus the server's gzip cache and event stream gauges.
 """
 
 from __future__ import annotations
 
+import argparse
+import asyncio
+import gzip
 import http.server
+import json
+import mimetypes
 import os
+import posixpath
+import shutil
 import socketserver
+import sqlite3
+import sys
+import threading
+from collections import OrderedDict
+from email.utils import formatdate
+from http import HTTPStatus
 from pathlib import Path
+from typing import Any, Callable, Dict, List, Mapping, Optional, Sequence, Tuple, Union
+from urllib.parse import parse_qsl, unquote, urlsplit
+
+from queries.dashboard_api import DB_PATH, ReadPool, fetch_cohorts, fetch_report
+from utils.metrics import METRICS_PATH, read_metrics, render_prometheus
 
 
 PORT = int(os.environ.get("PORT", "8000"))
 ROOT = Path(__file__).resolve().parent
+GZIP_CACHE_BYTES = int(float(os.environ.get("GZIP_CACHE_MB", "32")) * 1024 * 1024)
+# Smaller bodies gain less from gzip than the header and CPU cost.
+MIN_GZIP_BYTES = 256
+COMPRESSIBLE_TYPES = {
+    "application/javascript",
+    "application/json",
+    "image/svg+xml",
+    "text/css",
+    "text/csv",
+    "text/html",
+    "text/javascript",
+    "text/markdown",
+    "text/plain",
+}
+WATCHED_FILES = ["report.json", "query_result.json"]
+WATCH_INTERVAL = 1.0
+# Comment lines sent to idle event streams so proxies and browsers keep them open.
+KEEPALIVE_INTERVAL = 15.0
+CHUNK_SIZE = 64 * 1024
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Status, headers and body. A Path body is streamed from disk; its size is in the headers.
+Response = Tuple[int, List[Tuple[str, str]], Union[bytes, Path]]
+Routes = Dict[str, Tuple[ReadPool, Callable[[sqlite3.Connection, Mapping[str, str]], Any]]]
+
+
+class GzipCache:
+    """Gzipped file bodies by path, each stored with the ETag of the file it came from."""
+
+    def __init__(self, max_bytes: int = GZIP_CACHE_BYTES) -> None:
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[str, Tuple[str, bytes]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, path: str, etag: str, read: Callable[[], bytes]) -> bytes:
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None and entry[0] == etag:
+                self._entries.move_to_end(path)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+        # mtime=0 keeps the output identical for identical input.
+        body = gzip.compress(read(), mtime=0)
+        with self._lock:
+            self._discard(path)
+            if len(body) <= self.max_bytes:
+                self._entries[path] = (etag, body)
+                self.size += len(body)
+            while self.size > self.max_bytes:
+                self._discard(next(iter(self._entries)))
+        return body
+
+    def _discard(self, path: str) -> None:
+        entry = self._entries.pop(path, None)
+        if entry is not None:
+            self.size -= len(entry[1])
+
+    def metrics(self) -> Dict[str, Tuple[str, str, float]]:
+        with self._lock:
+            return {
+                "dashboard_gzip_cache_hits_total": ("counter", "Gzip cache hits.", self.hits),
+                "dashboard_gzip_cache_misses_total": ("counter", "Gzip cache misses.", self.misses),
+                "dashboard_gzip_cache_bytes": ("gauge", "Gzipped bytes cached.", self.size),
+            }
+
+
+def file_etag(stat: os.stat_result) -> str:
+    return f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    # If-None-Match uses weak comparison, so a W/ prefix on the client's tag is ignored.
+    if not if_none_match:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in tags or any(tag.removeprefix("W/") == etag for tag in tags)
+
+
+def accepts_gzip(accept_encoding: Optional[str]) -> bool:
+    for part in (accept_encoding or "").split(","):
+        coding, _, params = part.partition(";")
+        if coding.strip().lower() not in ("gzip", "x-gzip"):
+            continue
+        name, _, value = params.strip().partition("=")
+        if name.strip().lower() == "q":
+            try:
+                return float(value) > 0
+            except ValueError:
+                return False
+        return True
+    return False
 
 
-def handler_factory() -> type[http.server.SimpleHTTPRequestHandler]:
+def file_response(
+    path: Path, content_type: str, request_headers: Mapping[str, str], gzip_cache: GzipCache
+) -> Response:
+    """A regular file with ETag revalidation, gzipped when the client accepts it."""
+    stat = path.stat()
+    compressible = content_type.split(";")[0] in COMPRESSIBLE_TYPES
+    compressed = (
+        compressible
+        and stat.st_size >= MIN_GZIP_BYTES
+        and accepts_gzip(request_headers.get("accept-encoding"))
+    )
+    etag = file_etag(stat)
+    # Each encoding is its own representation and needs its own strong ETag.
+    representation_etag = etag[:-1] + '-gzip"' if compressed else etag
+    headers = [
+        ("ETag", representation_etag),
+        ("Last-Modified", formatdate(stat.st_mtime, usegmt=True)),
+        # Always revalidate: ingest and report runs rewrite the JSON files in place.
+        ("Cache-Control", "no-cache"),
+    ]
+    if compressible:
+        headers.append(("Vary", "Accept-Encoding"))
+    if etag_matches(request_headers.get("if-none-match"), representation_etag):
+        return 304, headers, b""
+
+    headers.append(("Content-Type", content_type))
+    if compressed:
+        body = gzip_cache.get(str(path), etag, path.read_bytes)
+        headers += [("Content-Encoding", "gzip"), ("Content-Length", str(len(body)))]
+        return 200, headers, body
+    headers.append(("Content-Length", str(stat.st_size)))
+    return 200, headers, path
+
+
+def generated_response(
+    status: int, body: bytes, content_type: str, accept_encoding: Optional[str]
+) -> Response:
+    """A body built for this request: never cached, gzipped when large enough."""
+    headers = [
+        ("Content-Type", content_type),
+        ("Cache-Control", "no-store"),
+        ("Vary", "Accept-Encoding"),
+    ]
+    if len(body) >= MIN_GZIP_BYTES and accepts_gzip(accept_encoding):
+        body = gzip.compress(body, mtime=0)
+        headers.append(("Content-Encoding", "gzip"))
+    headers.append(("Content-Length", str(len(body))))
+    return status, headers, body
+
+
+def json_response(status: int, payload: Dict[str, Any], accept_encoding: Optional[str]) -> Response:
+    body = json.dumps(payload).encode("utf-8")
+    return generated_response(status, body, "application/json", accept_encoding)
+
+
+def metrics_response(
+    metrics_path: Path,
+    server_metrics: Mapping[str, Tuple[str, str, float]],
+    accept_encoding: Optional[str],
+) -> Response:
+    """Prometheus text: the pipeline's last recorded stages plus the server's own metrics."""
+    body = render_prometheus(read_metrics(metrics_path), server_metrics).encode("utf-8")
+    return generated_response(200, body, PROMETHEUS_CONTENT_TYPE, accept_encoding)
+
+
+def api_response(
+    routes: Routes, path: str, query: str, request_headers: Mapping[str, str]
+) -> Response:
+    accept_encoding = request_headers.get("accept-encoding")
+    if path not in routes:
+        return json_response(404, {"error": f"Unknown endpoint {path}"}, accept_encoding)
+    pool, fetch = routes[path]
+    try:
+        with pool.connection() as conn:
+            payload = fetch(conn, dict(parse_qsl(query)))
+    except ValueError as exc:
+        return json_response(400, {"error": str(exc)}, accept_encoding)
+    except (FileNotFoundError, sqlite3.Error) as exc:
+        return json_response(503, {"error": f"Database unavailable: {exc}"}, accept_encoding)
+    return json_response(200, payload, accept_encoding)
+
+
+def api_routes(db_path: Path) -> Routes:
+    # Shared by every request; the cohort SQL reads money through dollar views.
+    return {
+        "/api/report": (ReadPool(db_path), fetch_report),
+        "/api/cohorts": (ReadPool(db_path, dollar_views=True), fetch_cohorts),
+    }
+
+
+def handler_factory(
+    db_path: Path = DB_PATH,
+    root: Path = ROOT,
+    gzip_cache: Optional[GzipCache] = None,
+    metrics_path: Path = METRICS_PATH,
+) -> type[http.server.SimpleHTTPRequestHandler]:
+    routes = api_routes(db_path)
+    gzip_cache = gzip_cache if gzip_cache is not None else GzipCache()
+
     class RedirectingHandler(http.server.SimpleHTTPRequestHandler):
         def __init__(self, *args, **kwargs):
-            super().__init__(*args, directory=str(ROOT), **kwargs)
+            super().__init__(*args, directory=str(root), **kwargs)
 
         def log_message(self, format: str, *args) -> None:  # noqa: A003
             # Keep default logging behavior (prints to stdout)
             super().log_message(format, *args)
 
+        def send(self, response: Response, head_only: bool = False) -> None:
+            status, headers, body = response
+            self.send_response(status)
+            for name, value in headers:
+                self.send_header(name, value)
+            self.end_headers()
+            if head_only:
+                return
+            if isinstance(body, Path):
+                with body.open("rb") as fh:
+                    shutil.copyfileobj(fh, self.wfile)
+            else:
+                self.wfile.write(body)
+
+        def send_file(self, head_only: bool = False) -> bool:
+            """Serve a regular file; False leaves directory listings, trailing-slash
+            redirects and 404s to SimpleHTTPRequestHandler."""
+            path = Path(self.translate_path(self.path))
+            if path.is_dir():
+                if not urlsplit(self.path).path.endswith("/"):
+                    return False
+                path = path / "index.html"
+            if not path.is_file():
+                return False
+            self.send(
+                file_response(path, self.guess_type(str(path)), self.headers, gzip_cache),
+                head_only,
+            )
+            return True
+
         def do_GET(self) -> None:  # noqa: D401
             if self.path in {"/", ""}:
                 self.send_response(302)
                 self.send_header("Location", "/frontend/")
                 self.end_headers()
                 return
-            return super().do_GET()
+            url = urlsplit(self.path)
+            if url.path.startswith("/api/"):
+                return self.send(api_response(routes, url.path, url.query, self.headers))
+            if url.path == "/metrics":
+                return self.send(
+                    metrics_response(
+                        metrics_path, gzip_cache.metrics(), self.headers.get("accept-encoding")
+                    )
+                )
+            if not self.send_file():
+                super().do_GET()
+
+        def do_HEAD(self) -> None:
+            if not self.send_file(head_only=True):
+                super().do_HEAD()
 
     return RedirectingHandler
 
 
+class ChangeWatcher:
+    """Detects changes to the dashboard's data files and database.
+
+    Files are compared by mtime and size. The database is compared by file
+    identity, which a full ingest changes by rebuilding it, and by ``PRAGMA
+    data_version`` on a read-only connection, which moves whenever another
+    connection commits (incremental loads, rollup refreshes).
+    """
+
+    def __init__(self, files: Sequence[Path], db_path: Path) -> None:
+        self.files = list(files)
+        self.db_path = db_path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._db_identity: Optional[Tuple[int, int]] = None
+        self._last = self.snapshot()
+
+    def _database_state(self) -> Optional[Tuple[int, ...]]:
+        try:
+            stat = self.db_path.stat()
+        except FileNotFoundError:
+            self.close()
+            return None
+        identity = (stat.st_dev, stat.st_ino)
+        if identity != self._db_identity:
+            self.close()
+            # Polled from executor threads, one call at a time.
+            self._conn = sqlite3.connect(
+                f"{self.db_path.resolve().as_uri()}?mode=ro", uri=True, check_same_thread=False
+            )
+            self._db_identity = identity
+        try:
+            return identity + (self._conn.execute("PRAGMA data_version").fetchone()[0],)
+        except sqlite3.Error:
+            # Mid-rebuild or locked; report the file alone and retry next poll.
+            return identity
+
+    def snapshot(self) -> Dict[str, Any]:
+        state: Dict[str, Any] = {}
+        for path in self.files:
+            try:
+                stat = path.stat()
+                state[path.name] = (stat.st_mtime_ns, stat.st_size)
+            except FileNotFoundError:
+                state[path.name] = None
+        state[self.db_path.name] = self._database_state()
+        return state
+
+    def changes(self) -> List[str]:
+        """Names of the files that changed since the previous call."""
+        current = self.snapshot()
+        changed = [name for name, value in current.items() if self._last.get(name) != value]
+        self._last = current
+        return changed
+
+    def close(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+        self._conn = None
+        self._db_identity = None
+
+
+def resolve_path(root: Path, url_path: str) -> Path:
+    """Map a URL path under ``root`` the way SimpleHTTPRequestHandler.translate_path does."""
+    parts = posixpath.normpath(unquote(url_path)).split("/")
+    return root.joinpath(*(part for part in parts if part not in ("", ".", "..")))
+
+
+class AsyncDashboardServer:
+    """The dashboard server on one asyncio event loop, with ``/api/events``.
+
+    Each open connection is a coroutine. File reads, gzip and API queries run on
+    the loop's default executor, so a slow query never stalls other clients. One
+    watcher task polls for data changes and wakes every event stream at once.
+    """
+
+    def __init__(
+        self,
+        root: Path = ROOT,
+        db_path: Path = DB_PATH,
+        gzip_cache: Optional[GzipCache] = None,
+        watch_interval: float = WATCH_INTERVAL,
+        keepalive_interval: float = KEEPALIVE_INTERVAL,
+        metrics_path: Path = METRICS_PATH,
+    ) -> None:
+        self.root = root
+        self.metrics_path = metrics_path
+        self.routes = api_routes(db_path)
+        self.gzip_cache = gzip_cache if gzip_cache is not None else GzipCache()
+        self.watcher = ChangeWatcher([root / name for name in WATCHED_FILES], db_path)
+        self.watch_interval = watch_interval
+        self.keepalive_interval = keepalive_interval
+        self.version = 0
+        self.changed: List[str] = []
+        self.streams = 0
+        self._updated: Optional[asyncio.Event] = None
+        self._tasks: List[asyncio.Task] = []
+        self._connections: set = set()
+        self._server: Optional[asyncio.base_events.Server] = None
+
+    async def start(self, host: str = "", port: int = PORT) -> int:
+        """Start listening and watching; returns the bound port."""
+        self._updated = asyncio.Event()
+        self._server = await asyncio.start_server(self.handle_connection, host or None, port)
+        self._tasks.append(asyncio.create_task(self.watch()))
+        return self._server.sockets[0].getsockname()[1]
+
+    async def serve_forever(self) -> None:
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def close(self) -> None:
+        if self._server is not None:
+            self._server.close()
+        # Event streams never end on their own; wait_closed() would wait for them.
+        tasks = self._tasks + list(self._connections)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        if self._server is not None:
+            await self._server.wait_closed()
+        self.watcher.close()
+
+    async def watch(self) -> None:
+        while True:
+            await asyncio.sleep(self.watch_interval)
+            changed = await asyncio.to_thread(self.watcher.changes)
+            if changed:
+                self.version += 1
+                self.changed = changed
+                # Wake every waiting stream, then give later waiters a fresh event.
+                self._updated.set()
+                self._updated = asyncio.Event()
+
+    async def handle_connection(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        self._connections.add(asyncio.current_task())
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                parts = request_line.decode("latin-1").split()
+                headers = await self.read_headers(reader)
+                if len(parts) != 3:
+                    await self.write(writer, self.error(400, "Bad request line"), False, False)
+                    break
+                method, target, version = parts
+                keep_alive = (
+                    version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+                )
+                url = urlsplit(target)
+                if method == "GET" and url.path == "/api/events":
+                    self.log(method, target, 200)
+                    await self.stream_events(writer)
+                    break
+                if method not in ("GET", "HEAD"):
+                    response = self.error(405, f"{method} is not supported")
+                    # The request body is never read, so it cannot be left to be parsed
+                    # as the next request on this connection.
+                    keep_alive = False
+                else:
+                    response = await self.respond(url.path, url.query, headers)
+                self.log(method, target, response[0])
+                await self.write(writer, response, method == "HEAD", keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, ValueError):
+            pass
+        finally:
+            self._connections.discard(asyncio.current_task())
+            writer.close()
+
+    async def read_headers(self, reader: asyncio.StreamReader) -> Dict[str, str]:
+        headers: Dict[str, str] = {}
+        while True:
+            line = (await reader.readline()).decode("latin-1")
+            if not line.strip():
+                return headers
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+    async def respond(self, path: str, query: str, headers: Mapping[str, str]) -> Response:
+        if path in ("", "/"):
+            return 302, [("Location", "/frontend/"), ("Content-Length", "0")], b""
+        if path.startswith("/api/"):
+            return await asyncio.to_thread(api_response, self.routes, path, query, headers)
+        if path == "/metrics":
+            server_metrics = {
+                **self.gzip_cache.metrics(),
+                "dashboard_event_streams": ("gauge", "Open /api/events streams.", self.streams),
+            }
+            return await asyncio.to_thread(
+                metrics_response, self.metrics_path, server_metrics, headers.get("accept-encoding")
+            )
+        target = resolve_path(self.root, path)
+        if target.is_dir():
+            if not path.endswith("/"):
+                return 301, [("Location", path + "/"), ("Content-Length", "0")], b""
+            target = target / "index.html"
+        if not target.is_file():
+            return self.error(404, "File not found")
+        content_type = mimetypes.guess_type(target.name)[0] or "application/octet-stream"
+        return await asyncio.to_thread(
+            file_response, target, content_type, headers, self.gzip_cache
+        )
+
+    def error(self, status: int, message: str) -> Response:
+        body = message.encode("utf-8")
+        return (
+            status,
+            [("Content-Type", "text/plain; charset=utf-8"), ("Content-Length", str(len(body)))],
+            body,
+        )
+
+    async def write(
+        self,
+        writer: asyncio.StreamWriter,
+        response: Response,
+        head_only: bool,
+        keep_alive: bool,
+    ) -> None:
+        status, headers, body = response
+        lines = [f"HTTP/1.1 {status} {HTTPStatus(status).phrase}"]
+        lines += [f"{name}: {value}" for name, value in headers]
+        lines += [
+            f"Date: {formatdate(usegmt=True)}",
+            f"Connection: {'keep-alive' if keep_alive else 'close'}",
+        ]
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1"))
+        if not head_only and isinstance(body, Path):
+            with body.open("rb") as fh:
+                while chunk := await asyncio.to_thread(fh.read, CHUNK_SIZE):
+                    writer.write(chunk)
+                    await writer.drain()
+        elif not head_only:
+            writer.write(body)
+        await writer.drain()
+
+    async def stream_events(self, writer: asyncio.StreamWriter) -> None:
+        writer.write(
+            b"HTTP/1.1 200 OK\r\n"
+            b"Content-Type: text/event-stream\r\n"
+            b"Cache-Control: no-store\r\n"
+            b"Connection: close\r\n\r\n"
+            b"retry: 3000\n\n"
+        )
+        await writer.drain()
+        self.streams += 1
+        try:
+            while True:
+                updated = self._updated
+                try:
+                    await asyncio.wait_for(updated.wait(), self.keepalive_interval)
+                except asyncio.TimeoutError:
+                    writer.write(b": keepalive\n\n")
+                else:
+                    data = json.dumps({"version": self.version, "changed": self.changed})
+                    writer.write(f"id: {self.version}\nevent: data-updated\ndata: {data}\n\n".encode())
+                await writer.drain()
+        finally:
+            self.streams -= 1
+
+    def log(self, method: str, target: str, status: int) -> None:
+        sys.stderr.write(f'"{method} {target}" {status}\n')
+
+
+async def serve_async(port: int) -> None:
+    server = AsyncDashboardServer()
+    await server.start(port=port)
+    print(f"🔌 Async server running at http://localhost:{port}/frontend/")
+    print("Press Ctrl+C to stop.")
+    try:
+        await server.serve_forever()
+    finally:
+        await server.close()
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Serve the dashboard and its JSON API.")
+    parser.add_argument("--port", type=int, default=PORT, help="Port to listen on.")
+    parser.add_argument(
+        "--async",
+        dest="use_async",
+        action="store_true",
+        help="Serve from one asyncio event loop and push data-updated events on /api/events.",
+    )
+    return parser.parse_args()
+
+
 def main() -> None:
+    args = parse_args()
+    if args.use_async:
+        try:
+            asyncio.run(serve_async(args.port))
+        except KeyboardInterrupt:
+            pass
+        return
     handler = handler_factory()
-    with socketserver.ThreadingTCPServer(("", PORT), handler) as httpd:
-        print(f"🔌 Server running at http://localhost:{PORT}/frontend/")
+    with socketserver.ThreadingTCPServer(("", args.port), handler) as httpd:
+        print(f"🔌 Server running at http://localhost:{args.port}/frontend/")
         print("Press Ctrl+C to stop.")
         httpd.serve_forever()
 
 
 if __name__ == "__main__":
     main()
-
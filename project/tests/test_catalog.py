@@ -0,0 +1,75 @@
+import logging
+import random
+import sqlite3
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from data_generation import generate_data
+from db import ingest, storage
+from queries import catalog
+from queries.run_query import QUERY_PATH
+
+
+class CatalogTests(unittest.TestCase):
+    def test_bind_params_fills_defaults_and_rejects_unknown_names(self) -> None:
+        query = catalog.load_catalog()["top_products"]
+        params = catalog.bind_params(query, {"segment": "vip"})
+        self.assertEqual(set(params), set(query["params"]))
+        self.assertEqual(
+            (params["segment"], params["limit"], params["start_date"]), ("vip", "10", None)
+        )
+        with self.assertRaisesRegex(ValueError, "region"):
+            catalog.bind_params(query, {"region": "EU"})
+
+    def test_parameter_errors(self) -> None:
+        self.assertEqual(
+            catalog.parse_param_args(["limit=5", "country="]), {"limit": "5", "country": ""}
+        )
+        for pair in ("limit", "=5"):
+            with self.assertRaises(ValueError):
+                catalog.parse_param_args([pair])
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "broken.sql"
+            path.write_text("-- param: limit=10\nSELECT :limit, :offset\n", encoding="utf-8")
+            with self.assertRaisesRegex(ValueError, "undeclared parameters: offset"):
+                catalog.parse_query_file(path)
+
+
+class QueryRunnerTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self._tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self._tmp.cleanup)
+        data_dir = Path(self._tmp.name)
+        generate_data.write_datasets(random.Random(5), data_dir, 30, 12)
+        self.db_path = data_dir / "test.db"
+        logger = logging.getLogger("catalog-test")
+        logger.addHandler(logging.NullHandler())
+        logger.propagate = False
+        with mock.patch.multiple(ingest, DATA_DIR=data_dir, DB_PATH=self.db_path):
+            ingest.run_ingestion(logger, money_storage="cents")
+
+    def test_catalog_queries_bind_parameters_on_one_connection(self) -> None:
+        with sqlite3.connect(self.db_path) as conn:
+            storage.install_dollar_views(conn)
+            full_history = conn.execute(QUERY_PATH.read_text(encoding="utf-8")).fetchall()
+            vip_users = conn.execute(
+                "SELECT COUNT(*) FROM users WHERE segment = 'vip'"
+            ).fetchone()[0]
+        with catalog.QueryRunner(self.db_path) as runner:
+            unfiltered = [tuple(row.values()) for row in runner.rows("cohort_clv")]
+            vip = runner.rows("cohort_clv", {"segment": "vip"})
+            top = runner.rows("top_products", {"limit": "2", "start_date": "2024-01-01"})
+            with self.assertRaises(ValueError):
+                runner.execute("top_products", {"region": "EU"})
+            with self.assertRaisesRegex(ValueError, "Unknown query"):
+                runner.execute("bogus")
+        self.assertEqual(unfiltered, full_history)
+        self.assertEqual(sum(row["customers"] for row in vip), vip_users)
+        self.assertEqual(len(top), 2)
+        self.assertGreaterEqual(top[0]["revenue"], top[1]["revenue"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,121 @@
+import json
+import logging
+import random
+import sqlite3
+import tempfile
+import threading
+import unittest
+import urllib.error
+import urllib.request
+from http.server import ThreadingHTTPServer
+from pathlib import Path
+from unittest import mock
+
+from data_generation import generate_data
+from db import ingest, storage
+from queries import dashboard_api
+from queries.run_query import QUERY_PATH
+from serve_frontend import handler_factory
+
+
+class DashboardApiTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self._tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self._tmp.cleanup)
+        self.data_dir = Path(self._tmp.name)
+        generate_data.write_datasets(random.Random(5), self.data_dir, 30, 12)
+        self.db_path = self.data_dir / "test.db"
+        patcher = mock.patch.multiple(ingest, DATA_DIR=self.data_dir, DB_PATH=self.db_path)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.logger = logging.getLogger("dashboard-api-test")
+        self.logger.addHandler(logging.NullHandler())
+        self.logger.propagate = False
+        ingest.run_ingestion(self.logger, money_storage="cents")
+
+    def test_report_pages_and_filters_sections(self) -> None:
+        with sqlite3.connect(self.db_path) as conn:
+            expected = ingest.fetch_report_data(conn)
+        pool = dashboard_api.ReadPool(self.db_path)
+        self.addCleanup(pool.close)
+        with pool.connection() as conn:
+            report = dashboard_api.fetch_report(conn, {})
+            page = dashboard_api.fetch_report(
+                conn, {"sections": "top_products", "limit": "2", "offset": "1"}
+            )
+            vip = dashboard_api.fetch_report(
+                conn, {"sections": "high_value_customers", "segment": "vip", "limit": "50"}
+            )
+            with self.assertRaises(ValueError):
+                dashboard_api.fetch_report(conn, {"sections": "bogus"})
+        self.assertEqual(report.pop("page"), {"limit": 5, "offset": 0})
+        self.assertEqual(report, expected)
+        self.assertEqual(list(page), ["top_products", "page"])
+        self.assertEqual(page["top_products"], expected["top_products"][1:3])
+        self.assertTrue(vip["high_value_customers"])
+        self.assertEqual({row["segment"] for row in vip["high_value_customers"]}, {"vip"})
+
+    def test_cohort_windows_and_pages_match_the_full_history_query(self) -> None:
+        with sqlite3.connect(self.db_path) as conn:
+            storage.install_dollar_views(conn)
+            cursor = conn.execute(QUERY_PATH.read_text(encoding="utf-8"))
+            columns = [column[0] for column in cursor.description]
+            cohorts = [dict(zip(columns, row)) for row in cursor]
+        months = [row["cohort_month"] for row in cohorts]
+        self.assertGreater(len(months), 4)
+
+        pool = dashboard_api.ReadPool(self.db_path, dollar_views=True)
+        self.addCleanup(pool.close)
+        with pool.connection() as conn:
+            self.assertEqual(dashboard_api.fetch_cohorts(conn, {})["cohorts"], cohorts)
+            window = dashboard_api.fetch_cohorts(
+                conn, {"from": months[1], "limit": "2", "offset": "1"}
+            )
+            self.assertEqual(window["cohorts"], cohorts[2:4])
+            self.assertEqual(
+                window["page"], {"limit": 2, "offset": 1, "total": len(cohorts) - 1}
+            )
+            bounded = dashboard_api.fetch_cohorts(conn, {"from": months[1], "to": months[3]})
+            self.assertEqual(bounded["cohorts"], cohorts[1:4])
+            tail = dashboard_api.fetch_cohorts(conn, {"to": months[-2], "offset": "2"})
+            self.assertEqual(tail["cohorts"], cohorts[2:-1])
+            past_end = dashboard_api.fetch_cohorts(conn, {"offset": str(len(months))})
+            self.assertEqual(past_end["cohorts"], [])
+            self.assertEqual(past_end["page"]["total"], len(months))
+            with self.assertRaises(ValueError):
+                dashboard_api.fetch_cohorts(conn, {"from": "2024"})
+
+    def test_pool_and_server_follow_a_rebuilt_database(self) -> None:
+        pool = dashboard_api.ReadPool(self.db_path)
+        self.addCleanup(pool.close)
+        with pool.connection() as conn:
+            before = dashboard_api.fetch_report(conn, {"sections": "top_products"})
+
+        # A full load replaces the database file; pooled connections must not keep the old one.
+        generate_data.write_datasets(random.Random(6), self.data_dir, 30, 12)
+        ingest.run_ingestion(self.logger)
+        with sqlite3.connect(self.db_path) as conn:
+            rebuilt = ingest.fetch_report_data(conn)
+        self.assertNotEqual(rebuilt["top_products"], before["top_products"])
+        with pool.connection() as conn:
+            self.assertEqual(
+                dashboard_api.fetch_report(conn, {"sections": "top_products"})["top_products"],
+                rebuilt["top_products"],
+            )
+
+        server = ThreadingHTTPServer(("127.0.0.1", 0), handler_factory(self.db_path))
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        base = f"http://127.0.0.1:{server.server_address[1]}"
+        with urllib.request.urlopen(f"{base}/api/report?sections=top_products") as response:
+            body = json.loads(response.read())
+        self.assertEqual(body["top_products"], rebuilt["top_products"])
+        with self.assertRaises(urllib.error.HTTPError) as raised:
+            urllib.request.urlopen(f"{base}/api/report?limit=0")
+        self.assertEqual(raised.exception.code, 400)
+        raised.exception.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
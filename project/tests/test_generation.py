@@ -0,0 +1,135 @@
+import csv
+import random
+import tempfile
+import unittest
+from pathlib import Path
+
+from data_generation import generate_data
+from data_generation.vectorized import numpy_available
+from utils import columnar
+
+
+class GenerationTests(unittest.TestCase):
+    def test_generate_users_is_lazy(self) -> None:
+        users = generate_data.generate_users(random.Random(1), count=10**9)
+        first = next(users)
+        self.assertEqual(first["user_id"], "USR-00001")
+
+    def test_write_datasets_deterministic_for_seed(self) -> None:
+        with tempfile.TemporaryDirectory() as first_dir, tempfile.TemporaryDirectory() as second_dir:
+            for directory in (first_dir, second_dir):
+                generate_data.write_datasets(random.Random(7), Path(directory), 40, 20)
+            for filename in ("users.csv", "products.csv", "orders.csv", "order_items.csv", "payments.csv"):
+                first = (Path(first_dir) / filename).read_bytes()
+                second = (Path(second_dir) / filename).read_bytes()
+                self.assertEqual(first, second, filename)
+            users = (Path(first_dir) / "users.csv").read_text(encoding="utf-8").splitlines()
+            self.assertEqual(len(users), 41)
+
+    def test_sharded_generation_is_reproducible_with_unique_ids(self) -> None:
+        with tempfile.TemporaryDirectory() as first_dir, tempfile.TemporaryDirectory() as second_dir:
+            for directory in (first_dir, second_dir):
+                generate_data.write_sharded_datasets(11, Path(directory), 30, 10, workers=3)
+            for filename in generate_data.SHARDED_FILES:
+                first = (Path(first_dir) / filename).read_bytes()
+                second = (Path(second_dir) / filename).read_bytes()
+                self.assertEqual(first, second, filename)
+            order_ids = [
+                line.split(",", 1)[0]
+                for line in (Path(first_dir) / "orders.csv").read_text(encoding="utf-8").splitlines()[1:]
+            ]
+            self.assertEqual(len(order_ids), len(set(order_ids)))
+            self.assertFalse((Path(first_dir) / generate_data.SHARD_DIR_NAME).exists())
+
+    @unittest.skipUnless(numpy_available(), "NumPy not installed")
+    def test_numpy_backend_rows_are_consistent(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            output_dir = Path(tmp)
+            generate_data.write_datasets(random.Random(3), output_dir, 50, 12, backend="numpy")
+            orders = (output_dir / "orders.csv").read_text(encoding="utf-8").splitlines()[1:]
+            payments = (output_dir / "payments.csv").read_text(encoding="utf-8").splitlines()[1:]
+            items = (output_dir / "order_items.csv").read_text(encoding="utf-8").splitlines()[1:]
+            self.assertEqual(len(orders), len(payments))
+            order_ids = {line.split(",", 1)[0] for line in orders}
+            self.assertTrue(all(line.split(",")[1] in order_ids for line in items))
+            line_totals = {}
+            for line in items:
+                fields = line.split(",")
+                self.assertAlmostEqual(float(fields[5]), float(fields[4]) * int(fields[3]), places=2)
+                line_totals[fields[1]] = line_totals.get(fields[1], 0.0) + float(fields[5])
+            for line in orders:
+                fields = line.split(",")
+                expected = max(0.0, line_totals[fields[0]] - float(fields[5]))
+                self.assertAlmostEqual(float(fields[6]), expected, places=1)
+
+    @unittest.skipUnless(numpy_available(), "NumPy not installed")
+    def test_numpy_backend_shards_keep_distribution_rules(self) -> None:
+        with tempfile.TemporaryDirectory() as first_dir, tempfile.TemporaryDirectory() as second_dir:
+            for directory in (first_dir, second_dir):
+                generate_data.write_sharded_datasets(
+                    13, Path(directory), 60, 10, workers=3, backend="numpy"
+                )
+            for filename in generate_data.SHARDED_FILES:
+                first = (Path(first_dir) / filename).read_bytes()
+                self.assertEqual(first, (Path(second_dir) / filename).read_bytes(), filename)
+
+            def rows(filename: str) -> list:
+                with (Path(first_dir) / filename).open(newline="", encoding="utf-8") as fh:
+                    return list(csv.DictReader(fh))
+
+            segments = {user["user_id"]: user["segment"] for user in rows("users.csv")}
+            orders = rows("orders.csv")
+            self.assertEqual(len({order["order_id"] for order in orders}), len(orders))
+            self.assertTrue(all(order["order_id"].startswith("ORD-S00") for order in orders))
+            per_user: dict = {}
+            for order in orders:
+                per_user[order["user_id"]] = per_user.get(order["user_id"], 0) + 1
+            for user_id, count in per_user.items():
+                self.assertLessEqual(count, 7 if segments[user_id] == "vip" else 5)
+            totals = {order["order_id"]: order["total_amount"] for order in orders}
+            for payment in rows("payments.csv"):
+                self.assertIn(payment["payment_method"], ["card", "ach", "paypal", "wallet"])
+                if payment["status"] == "succeeded":
+                    self.assertEqual(payment["amount"], totals[payment["order_id"]])
+                else:
+                    self.assertLessEqual(
+                        float(payment["amount"]), float(totals[payment["order_id"]])
+                    )
+
+    def test_columnar_copies_match_the_csvs_written_beside_them(self) -> None:
+        backends = ["python", "numpy"] if numpy_available() else ["python"]
+        for backend in backends:
+            for sharded in (False, True):
+                with self.subTest(backend=backend, sharded=sharded), \
+                        tempfile.TemporaryDirectory() as plain_dir, \
+                        tempfile.TemporaryDirectory() as col_dir:
+                    stats = {}
+                    for directory, with_copies in ((plain_dir, False), (col_dir, True)):
+                        if sharded:
+                            stats[with_copies] = generate_data.write_sharded_datasets(
+                                9, Path(directory), 40, 10, 2, backend, with_copies
+                            )
+                        else:
+                            stats[with_copies] = generate_data.write_datasets(
+                                random.Random(9), Path(directory), 40, 10, backend, with_copies
+                            )
+                    names = []
+                    for filename, fields in generate_data.DATASET_FIELDS.items():
+                        names += [filename, columnar.columnar_name(filename)]
+                        csv_bytes = (Path(col_dir) / filename).read_bytes()
+                        self.assertEqual(csv_bytes, (Path(plain_dir) / filename).read_bytes())
+                        with (Path(col_dir) / filename).open(newline="", encoding="utf-8") as fh:
+                            convert = generate_data.columnar_row(fields)
+                            expected = [tuple(convert(row)) for row in csv.DictReader(fh)]
+                        path = Path(col_dir) / columnar.columnar_name(filename)
+                        chunks = columnar.iter_columnar_chunks(path)
+                        rows = [row for chunk in chunks for row in chunk]
+                        self.assertEqual(rows, expected, filename)
+                        self.assertEqual(stats[True][path.name]["rows"], len(expected))
+                        self.assertEqual(stats[True][path.name]["bytes"], path.stat().st_size)
+                    self.assertCountEqual(stats[True], names)
+                    self.assertEqual(list(stats[False]), list(generate_data.DATASET_FIELDS))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,302 @@
+import json
+import logging
+import random
+import sqlite3
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from data_generation import generate_data
+from db import ingest, parallel_ingest, report_engine, rollups, storage
+from queries.run_query import OPTIMIZED_QUERY_PATH, QUERY_PATH, ROLLUP_QUERY_PATH
+from utils import columnar, helpers
+
+
+class IngestTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self._tmp = tempfile.TemporaryDirectory()
+        self.data_dir = Path(self._tmp.name)
+        generate_data.write_datasets(random.Random(5), self.data_dir, 30, 12)
+        self.db_path = self.data_dir / "test.db"
+        patcher = mock.patch.multiple(ingest, DATA_DIR=self.data_dir, DB_PATH=self.db_path)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(self._tmp.cleanup)
+        self.logger = logging.getLogger("ingest-test")
+        self.logger.addHandler(logging.NullHandler())
+        self.logger.propagate = False
+
+    def table_counts(self) -> dict:
+        with sqlite3.connect(self.db_path) as conn:
+            return {
+                table: conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+                for table, _ in ingest.TABLE_COLUMNS.values()
+            }
+
+    def test_streaming_matches_in_memory_load(self) -> None:
+        ingest.run_ingestion(self.logger)
+        expected = self.table_counts()
+        ingest.run_ingestion(self.logger, stream=True, batch_size=7)
+        self.assertEqual(self.table_counts(), expected)
+        with sqlite3.connect(self.db_path) as conn:
+            meta = conn.execute("SELECT total_rows_json FROM submission_meta").fetchone()[0]
+        self.assertIn(f'"orders.csv": {expected["orders"]}', meta)
+
+    def test_fast_load_matches_default_load(self) -> None:
+        ingest.run_ingestion(self.logger)
+        expected = self.table_counts()
+        ingest.run_ingestion(self.logger, fast_load=True)
+        self.assertEqual(self.table_counts(), expected)
+
+    def test_fast_load_rolls_back_on_foreign_key_violation(self) -> None:
+        items = self.data_dir / "order_items.csv"
+        lines = items.read_text(encoding="utf-8").splitlines()
+        fields = lines[1].split(",")
+        fields[1] = "ORD-99999"
+        lines[1] = ",".join(fields)
+        items.write_text("\n".join(lines) + "\n", encoding="utf-8")
+        with self.assertRaises(sqlite3.IntegrityError):
+            ingest.run_ingestion(self.logger, fast_load=True)
+        self.assertEqual(set(self.table_counts().values()), {0})
+
+    def test_incremental_applies_only_new_and_changed_rows(self) -> None:
+        ingest.run_ingestion(self.logger)
+        payments = self.data_dir / "payments.csv"
+        with payments.open("a", newline="", encoding="utf-8") as fh:
+            fh.write("PAY-99999,ORD-00001,2024-01-01,1.00,failed,card,TXN100000\r\n")
+        users = self.data_dir / "users.csv"
+        users.write_text(
+            users.read_text(encoding="utf-8").replace(",consumer,", ",business,", 1),
+            encoding="utf-8",
+        )
+
+        ingest.run_incremental_ingestion(self.logger, batch_size=3)
+        with sqlite3.connect(self.db_path) as conn:
+            batches = conn.execute(
+                "SELECT total_rows_json, load_mode FROM submission_meta ORDER BY rowid"
+            ).fetchall()
+            payment_rows = conn.execute(
+                "SELECT row_count FROM load_state WHERE filename = 'payments.csv'"
+            ).fetchone()[0]
+        self.assertEqual(batches[-1], ('{"payments.csv": 1, "users.csv": 1}', "incremental"))
+        self.assertEqual(payment_rows, self.table_counts()["payments"])
+
+        ingest.run_incremental_ingestion(self.logger)
+        with sqlite3.connect(self.db_path) as conn:
+            self.assertEqual(conn.execute("SELECT COUNT(*) FROM submission_meta").fetchone()[0], 2)
+
+    def test_parallel_parse_chunks_cover_every_row_with_types(self) -> None:
+        ingest.run_ingestion(self.logger)
+        expected = self.table_counts()
+        paths = ingest.resolve_csv_paths()
+        with sqlite3.connect(self.db_path) as conn:
+            tasks = parallel_ingest.plan_tasks(conn, paths, ingest.TABLE_COLUMNS, chunk_bytes=256)
+        counts = {}
+        for filename, rows in parallel_ingest.iter_parsed_chunks(tasks, workers=2):
+            counts[filename] = counts.get(filename, 0) + len(rows)
+            if filename == "order_items.csv":
+                self.assertIsInstance(rows[0][3], int)
+                self.assertIsInstance(rows[0][5], float)
+        self.assertGreater(len(tasks), len(paths))
+        self.assertEqual(
+            {ingest.TABLE_COLUMNS[name][0]: count for name, count in counts.items()}, expected
+        )
+
+        ingest.run_ingestion(self.logger, parse_workers=2)
+        self.assertEqual(self.table_counts(), expected)
+
+    def test_columnar_load_matches_csv_load_with_typed_dictionary_columns(self) -> None:
+        # Same seed as setUp(), so the CSVs are rewritten unchanged beside their .col copies.
+        stats = generate_data.write_datasets(random.Random(5), self.data_dir, 30, 12, columnar=True)
+        helpers.write_manifest(self.data_dir, stats)
+        payments = columnar.read_columnar_footer(self.data_dir / "payments.col")
+        encodings = dict(zip(payments["columns"], payments["chunks"][0]["encodings"]))
+        self.assertEqual(encodings["status"], "dict8")
+        self.assertEqual(encodings["payment_method"], "dict8")
+        self.assertEqual(encodings["transaction_reference"], "str")
+        self.assertEqual(encodings["amount"], "float64")
+        with sqlite3.connect(":memory:") as conn:
+            conn.executescript(ingest.SCHEMA_PATH.read_text(encoding="utf-8"))
+            for filename, (table, columns) in ingest.TABLE_COLUMNS.items():
+                name = columnar.columnar_name(filename)
+                footer = columnar.read_columnar_footer(self.data_dir / name)
+                self.assertEqual(footer["columns"], columns)
+                self.assertEqual(
+                    footer["types"], parallel_ingest.column_converters(conn, table, columns)
+                )
+                self.assertEqual(footer["rows"], stats[name]["rows"])
+
+        def dump() -> dict:
+            with sqlite3.connect(self.db_path) as conn:
+                return {
+                    table: conn.execute(f"SELECT * FROM {table} ORDER BY 1").fetchall()
+                    for table, _ in ingest.TABLE_COLUMNS.values()
+                }
+
+        for money_storage in storage.MONEY_STORAGES:
+            ingest.run_ingestion(self.logger, money_storage=money_storage)
+            expected = dump()
+            ingest.run_ingestion(
+                self.logger, fast_load=True, money_storage=money_storage, input_format="columnar"
+            )
+            self.assertEqual(dump(), expected)
+        with sqlite3.connect(self.db_path) as conn:
+            state = dict(conn.execute("SELECT filename, row_count FROM load_state"))
+        self.assertEqual(state["users.col"], 30)
+
+        # The manifest lists the .col copies too; the in-memory load counts only the CSVs.
+        self.assertEqual(set(helpers.read_manifest_entries(self.data_dir)), set(stats))
+        ingest.run_ingestion(self.logger)
+        with sqlite3.connect(self.db_path) as conn:
+            meta = conn.execute("SELECT total_rows_json FROM submission_meta").fetchone()[0]
+        self.assertEqual(
+            json.loads(meta), {name: stats[name]["rows"] for name in generate_data.DATASET_FIELDS}
+        )
+
+    def test_failed_columnar_write_leaves_a_file_readers_reject(self) -> None:
+        path = self.data_dir / "partial.col"
+        # Bad values fail after a chunk was written, in the final flush, or before any chunk.
+        for rows, chunk_rows in (([(1,), ("a",)], 1), ([(1,), ("a",)], 10), ([(object(),)], 1)):
+            with self.assertRaises(TypeError):
+                columnar.write_columnar(path, ["x"], rows, chunk_rows)
+            with self.assertRaisesRegex(ValueError, "truncated"):
+                columnar.read_columnar_footer(path)
+
+        generate_data.write_datasets(random.Random(5), self.data_dir, 30, 12, columnar=True)
+        users = self.data_dir / "users.col"
+        rows = next(columnar.iter_columnar_chunks(users))
+        with self.assertRaises(RuntimeError):
+            with columnar.ColumnarWriter(users, generate_data.USER_FIELDS, chunk_rows=4) as writer:
+                writer.write_rows(rows)
+                raise RuntimeError("generator failed")
+        with self.assertRaisesRegex(ValueError, "users.col is truncated"):
+            ingest.run_ingestion(self.logger, input_format="columnar")
+
+    def test_analytics_schema_uses_join_indexes(self) -> None:
+        ingest.run_ingestion(self.logger, fast_load=True, schema="analytics")
+        with sqlite3.connect(self.db_path) as conn:
+            indexes = {
+                row[0]
+                for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")
+            }
+            plan = " ".join(
+                row[3]
+                for row in conn.execute(
+                    "EXPLAIN QUERY PLAN SELECT SUM(oi.line_total) FROM orders o "
+                    "JOIN order_items oi ON oi.order_id = o.order_id WHERE o.user_id = 'USR-00001'"
+                )
+            )
+            report = ingest.fetch_report_data(conn)
+        self.assertIn("idx_order_items_order_id", indexes)
+        self.assertIn("idx_users_signup_date", indexes)
+        self.assertIn("idx_orders_user_id", plan)
+        self.assertEqual(report["validations"][0]["status"], "pass")
+
+    def report_and_query(self) -> tuple:
+        with sqlite3.connect(self.db_path) as conn:
+            report = ingest.fetch_report_data(conn)
+            storage.install_dollar_views(conn)
+            rows = conn.execute(QUERY_PATH.read_text(encoding="utf-8")).fetchall()
+        del report["table_row_counts"]["submission_meta"]
+        return report, rows
+
+    def test_cents_storage_matches_real_output(self) -> None:
+        ingest.run_ingestion(self.logger)
+        expected = self.report_and_query()
+        for kwargs in ({}, {"fast_load": True}, {"parse_workers": 2}):
+            ingest.run_ingestion(self.logger, money_storage="cents", **kwargs)
+            with sqlite3.connect(self.db_path) as conn:
+                self.assertEqual(storage.read_money_storage(conn), "cents")
+                kinds = {row[0] for row in conn.execute("SELECT typeof(amount) FROM payments")}
+            self.assertEqual(kinds, {"integer"})
+            self.assertEqual(self.report_and_query(), expected)
+
+    def test_single_pass_report_matches_classic(self) -> None:
+        for money_storage in storage.MONEY_STORAGES:
+            ingest.run_ingestion(self.logger, money_storage=money_storage)
+            with sqlite3.connect(self.db_path) as conn:
+                expected = ingest.fetch_report_data(conn)
+                report = report_engine.fetch_report_data_single_pass(conn)
+                leftover = conn.execute("SELECT COUNT(*) FROM temp.sqlite_master").fetchone()[0]
+            self.assertEqual(report, expected)
+            self.assertEqual(leftover, 0)
+
+    def test_optimized_cohort_query_matches_original(self) -> None:
+        for money_storage in storage.MONEY_STORAGES:
+            ingest.run_ingestion(self.logger, money_storage=money_storage)
+            with sqlite3.connect(self.db_path) as conn:
+                storage.install_dollar_views(conn)
+                expected = conn.execute(QUERY_PATH.read_text(encoding="utf-8")).fetchall()
+                rows = conn.execute(OPTIMIZED_QUERY_PATH.read_text(encoding="utf-8")).fetchall()
+            self.assertTrue(expected)
+            self.assertEqual(rows, expected)
+
+    def test_concurrent_report_matches_classic_with_timings(self) -> None:
+        ingest.run_ingestion(self.logger)
+        with sqlite3.connect(self.db_path) as conn:
+            self.assertEqual(conn.execute("PRAGMA journal_mode").fetchone()[0], "wal")
+            expected = ingest.fetch_report_data(conn)
+            # The report reads whatever journal mode it finds and leaves it alone.
+            conn.execute("PRAGMA journal_mode = DELETE")
+        report = report_engine.fetch_report_data_concurrent(self.db_path, workers=3)
+        timings = report.pop("section_timings_ms")
+        self.assertEqual(report, expected)
+        self.assertEqual(list(timings), list(report_engine.CLASSIC_SECTIONS))
+        with sqlite3.connect(self.db_path) as conn:
+            self.assertEqual(conn.execute("PRAGMA journal_mode").fetchone()[0], "delete")
+
+    def rollup_matches_classic(self) -> None:
+        with sqlite3.connect(self.db_path) as conn:
+            expected = ingest.fetch_report_data(conn)
+            report = rollups.fetch_report_data_rollups(conn)
+            storage.install_dollar_views(conn)
+            query_rows = conn.execute(QUERY_PATH.read_text(encoding="utf-8")).fetchall()
+            rollup_rows = conn.execute(ROLLUP_QUERY_PATH.read_text(encoding="utf-8")).fetchall()
+        self.assertEqual(report, expected)
+        self.assertEqual(rollup_rows, query_rows)
+
+    def test_rollups_match_base_tables_after_full_and_incremental_loads(self) -> None:
+        ingest.run_ingestion(self.logger, fast_load=True)
+        with sqlite3.connect(self.db_path) as conn:
+            with self.assertRaisesRegex(rollups.RollupsUnavailable, "--rollups"):
+                rollups.fetch_report_data_rollups(conn)
+        for money_storage in storage.MONEY_STORAGES:
+            ingest.run_ingestion(
+                self.logger, fast_load=True, money_storage=money_storage, rollups=True
+            )
+            self.rollup_matches_classic()
+
+        # Readers refuse stale rollups instead of refreshing them.
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute("UPDATE products SET price = price + 1 WHERE product_id = 'PRD-00001'")
+        with sqlite3.connect(self.db_path) as conn:
+            with self.assertRaisesRegex(rollups.RollupsUnavailable, "stale"):
+                rollups.fetch_report_data_rollups(conn)
+            self.assertEqual(
+                conn.execute("SELECT COUNT(*) FROM rollup_dirty_products").fetchone()[0], 1
+            )
+
+        payments = self.data_dir / "payments.csv"
+        with payments.open("a", newline="", encoding="utf-8") as fh:
+            fh.write("PAY-99999,ORD-00001,2024-01-01,1.00,failed,card,TXN100000\r\n")
+        users = self.data_dir / "users.csv"
+        text = users.read_text(encoding="utf-8")
+        first_user = text.splitlines()[1]
+        signup_date = first_user.split(",")[5]
+        users.write_text(
+            text.replace(first_user, first_user.replace(signup_date, "2021-06-15")),
+            encoding="utf-8",
+        )
+        ingest.run_incremental_ingestion(self.logger)
+        with sqlite3.connect(self.db_path) as conn:
+            dirty = [
+                conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+                for table in rollups.DIRTY_TABLES
+            ]
+        self.assertEqual(dirty, [0, 0])
+        self.rollup_matches_classic()
+
+
+if __name__ == "__main__":
+    unittest.main()
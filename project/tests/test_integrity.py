@@ -19,6 +19,21 @@ class HelperTests(unittest.TestCase):
         finally:
             tmp_path.unlink(missing_ok=True)
 
+    def test_write_csv_stats_feed_manifest(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            directory = Path(tmp)
+            csv_path = directory / "users.csv"
+            stats = helpers.write_csv(csv_path, ["a", "b"], [{"a": 1, "b": 2}, {"a": 3, "b": 4}])
+            self.assertEqual(stats["rows"], 2)
+            self.assertEqual(stats["bytes"], csv_path.stat().st_size)
+            self.assertEqual(stats["sha1"], helpers.hash_file_sha1(csv_path))
+
+            helpers.write_manifest(directory, {"users.csv": stats})
+            self.assertEqual(helpers.read_manifest_row_counts(directory), {"users.csv": 2})
+
+            csv_path.write_text("a,b\n1,2\n", encoding="utf-8")
+            self.assertIsNone(helpers.read_manifest_row_counts(directory))
+
 
 class SchemaTests(unittest.TestCase):
     def test_schema_has_submission_meta_table(self) -> None:
@@ -0,0 +1,90 @@
+import logging
+import random
+import sqlite3
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from data_generation import generate_data
+from db import ingest, report_engine
+from utils import metrics
+
+
+class StageMetricsTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self._tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self._tmp.cleanup)
+        self.data_dir = Path(self._tmp.name)
+        metrics.METRICS.reset()
+        self.addCleanup(metrics.METRICS.reset)
+
+    def test_ingest_and_report_count_rows_and_bytes_per_table_and_section(self) -> None:
+        generate_data.write_datasets(random.Random(5), self.data_dir, 12, 6)
+        db_path = self.data_dir / "test.db"
+        logger = logging.getLogger("metrics-test")
+        logger.addHandler(logging.NullHandler())
+        logger.propagate = False
+        with mock.patch.multiple(ingest, DATA_DIR=self.data_dir, DB_PATH=db_path):
+            ingest.run_ingestion(logger)
+        with sqlite3.connect(db_path) as conn:
+            ingest.fetch_report_data(conn)
+            users = conn.execute("SELECT COUNT(*) FROM users").fetchone()[0]
+        records = {(r["stage"], r["target"]): r for r in metrics.METRICS.records()}
+        self.assertEqual(records[("insert_data", "users")]["rows"], users)
+        self.assertEqual(
+            records[("load_csv_data", "orders.csv")]["bytes"],
+            (self.data_dir / "orders.csv").stat().st_size,
+        )
+        for name in report_engine.CLASSIC_SECTIONS:
+            self.assertEqual(records[("report_section", name)]["calls"], 1)
+        self.assertEqual(records[("run_ingestion", "")]["calls"], 1)
+
+    def test_a_jobs_next_run_replaces_its_own_lines_only(self) -> None:
+        path = self.data_dir / "metrics.jsonl"
+        with metrics.stage_timer("run_ingestion"):
+            pass
+        metrics.METRICS.count("insert_data", "users", rows=12, nbytes=1024)
+        metrics.write_metrics("ingest", path)
+        other = metrics.StageMetrics()
+        other.count("write_datasets", "users.csv", rows=30, nbytes=2048)
+        metrics.write_metrics("generate_data", path, other)
+        metrics.METRICS.reset()
+        with metrics.stage_timer("run_ingestion"):
+            pass
+        metrics.write_metrics("ingest", path)
+        lines = metrics.read_metrics(path)
+        self.assertEqual(
+            sorted((line["job"], line["stage"]) for line in lines),
+            [("generate_data", "write_datasets"), ("ingest", "run_ingestion")],
+        )
+
+    def test_prometheus_text_has_stage_gauges_last_runs_and_extras(self) -> None:
+        other = metrics.StageMetrics()
+        other.count("write_datasets", "users.csv", rows=30, nbytes=2048)
+        path = self.data_dir / "metrics.jsonl"
+        metrics.write_metrics("generate_data", path, other)
+        with metrics.stage_timer("run_ingestion"):
+            pass
+        metrics.write_metrics("ingest", path)
+        lines = metrics.read_metrics(path)
+        text = metrics.render_prometheus(lines)
+        self.assertIn(
+            'pipeline_stage_rows{job="generate_data",stage="write_datasets",target="users.csv"}'
+            " 30\n",
+            text,
+        )
+        self.assertIn('pipeline_stage_calls{job="ingest",stage="run_ingestion"} 1\n', text)
+        self.assertIn("# TYPE pipeline_last_run_timestamp_seconds gauge", text)
+
+        extra = {"http_requests_total": ("counter", "Requests served.", 7)}
+        with_extra = metrics.render_prometheus(lines, extra)
+        self.assertTrue(with_extra.startswith(text))
+        self.assertTrue(
+            with_extra.endswith("# TYPE http_requests_total counter\nhttp_requests_total 7\n")
+        )
+        self.assertEqual(metrics.render_prometheus([]), "")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,56 @@
+import unittest
+
+from benchmarks import pipeline
+
+
+def stage(scale: float, name: str, seconds: float, rss_mib: float) -> dict:
+    return {"scale": scale, "stage": name, "seconds": seconds, "peak_rss_bytes": rss_mib * 2**20}
+
+
+class FindRegressionsTests(unittest.TestCase):
+    baseline = [stage(1, "ingest", 1.0, 100), stage(1, "query", 0.01, 50)]
+
+    def test_time_over_threshold_is_reported(self) -> None:
+        within = pipeline.find_regressions([stage(1, "ingest", 1.2, 100)], self.baseline, 0.25)
+        self.assertEqual(within, [])
+        regressions = pipeline.find_regressions(
+            [stage(1, "ingest", 1.3, 100)], self.baseline, 0.25
+        )
+        self.assertEqual(regressions, ["scale=1 ingest: 1.30s vs baseline 1.00s"])
+
+    def test_peak_rss_over_threshold_is_reported(self) -> None:
+        regressions = pipeline.find_regressions(
+            [stage(1, "ingest", 1.0, 130)], self.baseline, 0.25
+        )
+        self.assertEqual(
+            regressions, ["scale=1 ingest: peak RSS 130.0 MiB vs baseline 100.0 MiB"]
+        )
+        no_rss = dict(stage(1, "ingest", 1.0, 0), peak_rss_bytes=None)
+        self.assertEqual(pipeline.find_regressions([no_rss], self.baseline, 0.25), [])
+
+    def test_baseline_stage_under_min_seconds_is_not_timed(self) -> None:
+        self.assertLess(self.baseline[1]["seconds"], pipeline.MIN_COMPARED_SECONDS)
+        regressions = pipeline.find_regressions([stage(1, "query", 0.04, 50)], self.baseline, 0.25)
+        self.assertEqual(regressions, [])
+        # Memory is still compared for stages too quick to time.
+        regressions = pipeline.find_regressions([stage(1, "query", 0.04, 70)], self.baseline, 0.25)
+        self.assertEqual(len(regressions), 1)
+
+    def test_scale_or_stage_missing_from_the_baseline_is_skipped(self) -> None:
+        results = [stage(100, "ingest", 9.0, 900), stage(1, "report", 9.0, 900)]
+        self.assertEqual(pipeline.find_regressions(results, self.baseline, 0.25), [])
+
+
+class SettingsMismatchTests(unittest.TestCase):
+    def test_differing_or_missing_settings_are_listed(self) -> None:
+        settings = {"seed": 42, "repeat": 1, "fast_load": True, "report_engine": "classic"}
+        self.assertEqual(pipeline.settings_mismatches(settings, dict(settings)), [])
+        baseline = {"seed": 42, "repeat": 3, "fast_load": True}
+        self.assertEqual(
+            pipeline.settings_mismatches(settings, baseline),
+            ["repeat=1 (baseline 3)", "report_engine='classic' (baseline None)"],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,79 @@
+import argparse
+import json
+import logging
+import pstats
+import random
+import tempfile
+import tracemalloc
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from data_generation import generate_data
+from db import ingest
+from utils import metrics, profilers
+
+
+class ProfiledTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self._tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self._tmp.cleanup)
+        self.data_dir = Path(self._tmp.name)
+        self.profile_dir = self.data_dir / "profiles"
+        self.logger = logging.getLogger("profilers-test")
+        self.logger.addHandler(logging.NullHandler())
+        self.logger.propagate = False
+
+    def args(self, cpu: bool, mem: bool) -> argparse.Namespace:
+        return argparse.Namespace(profile_cpu=cpu, profile_mem=mem, profile_dir=self.profile_dir)
+
+    def test_cpu_and_memory_profiles_cover_each_stage(self) -> None:
+        generate_data.write_datasets(random.Random(5), self.data_dir, 12, 6)
+        with mock.patch.multiple(
+            ingest, DATA_DIR=self.data_dir, DB_PATH=self.data_dir / "test.db"
+        ):
+            with profilers.profiled("ingest", self.args(True, True), self.logger):
+                ingest.run_ingestion(self.logger)
+        self.assertEqual(metrics.METRICS.observers, [])
+
+        stats = pstats.Stats(str(self.profile_dir / "ingest.pstats"))
+        self.assertTrue(any(name == "load_csv_data" for _, _, name in stats.stats))
+        collapsed = self.profile_dir / "ingest.collapsed"
+        for line in collapsed.read_text(encoding="utf-8").splitlines():
+            stack, samples = line.rsplit(" ", 1)
+            self.assertGreater(int(samples), 0)
+
+        memory = json.loads((self.profile_dir / "ingest_memory.json").read_text(encoding="utf-8"))
+        stages = {(entry["stage"], entry["target"]): entry for entry in memory["stages"]}
+        self.assertEqual(list(stages)[-1], ("ingest", ""))
+        load_users = stages[("load_csv_data", "users.csv")]
+        self.assertGreater(load_users["net_bytes"], 0)
+        self.assertGreaterEqual(
+            stages[("run_ingestion", "")]["peak_bytes"], load_users["peak_bytes"]
+        )
+        locations = [entry["location"] for entry in load_users["top_allocations"]]
+        self.assertTrue(any(location.split(":")[0].endswith("csv.py") for location in locations))
+
+    def test_without_flags_nothing_is_profiled(self) -> None:
+        with profilers.profiled("ingest", self.args(False, False), self.logger):
+            self.assertFalse(tracemalloc.is_tracing())
+            self.assertEqual(metrics.METRICS.observers, [])
+        self.assertFalse(self.profile_dir.exists())
+
+    def test_a_failed_block_still_writes_its_profiles_and_stops_tracing(self) -> None:
+        with self.assertRaises(RuntimeError):
+            with profilers.profiled("ingest", self.args(True, True), self.logger):
+                with metrics.stage_timer("load_csv_data", "users.csv"):
+                    raise RuntimeError("boom")
+        self.assertFalse(tracemalloc.is_tracing())
+        self.assertEqual(metrics.METRICS.observers, [])
+        self.assertTrue((self.profile_dir / "ingest.pstats").exists())
+        memory = json.loads((self.profile_dir / "ingest_memory.json").read_text(encoding="utf-8"))
+        self.assertEqual(
+            [(entry["stage"], entry["target"]) for entry in memory["stages"]],
+            [("load_csv_data", "users.csv"), ("ingest", "")],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
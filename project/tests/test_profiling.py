@@ -0,0 +1,75 @@
+import json
+import logging
+import random
+import sqlite3
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from data_generation import generate_data
+from db import ingest, profiling
+from queries import run_query
+from queries.run_query import QUERY_PATH
+
+
+class ProfileFlagTests(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls._tmp = tempfile.TemporaryDirectory()
+        cls.data_dir = Path(cls._tmp.name)
+        generate_data.write_datasets(random.Random(5), cls.data_dir, 12, 6)
+        cls.db_path = cls.data_dir / "test.db"
+        cls.logger = logging.getLogger("profiling-test")
+        cls.logger.addHandler(logging.NullHandler())
+        cls.logger.propagate = False
+        with mock.patch.multiple(ingest, DATA_DIR=cls.data_dir, DB_PATH=cls.db_path):
+            ingest.run_ingestion(cls.logger)
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        cls._tmp.cleanup()
+
+    def test_query_profile_records_plans_ctes_and_scans(self) -> None:
+        profile_path = self.data_dir / "query_profile.json"
+        with mock.patch.multiple(
+            run_query,
+            DB_PATH=self.db_path,
+            CSV_OUTPUT=self.data_dir / "result.csv",
+            PROFILE_OUTPUT=profile_path,
+        ):
+            run_query.run_query(QUERY_PATH, formats=["csv"], profile=True)
+        profile = json.loads(profile_path.read_text(encoding="utf-8"))
+        self.assertEqual(
+            [cte["name"] for cte in profile["ctes"]],
+            ["customer_activity", "payment_health", "order_frequency"],
+        )
+        csv_lines = (self.data_dir / "result.csv").read_text(encoding="utf-8").splitlines()
+        self.assertEqual(profile["statements"][-1]["rows"], len(csv_lines) - 1)
+        self.assertTrue(any("TEMP B-TREE" in step for step in profile["statements"][-1]["plan"]))
+
+    def test_report_profile_records_every_statement_for_each_engine(self) -> None:
+        with sqlite3.connect(self.db_path, factory=profiling.ProfilingConnection) as conn:
+            report = ingest.fetch_report_data(conn)
+            statements = conn.statements
+        self.assertEqual(report["table_row_counts"]["users"], 12)
+        counts = [s for s in statements if s["sql"] == "SELECT COUNT(*) FROM orders"]
+        self.assertEqual(counts[0]["rows"], 1)
+        self.assertTrue(counts[0]["full_scans"][0].startswith("orders: SCAN"))
+
+        profile_path = self.data_dir / "report_profile.json"
+        with mock.patch.multiple(ingest, DB_PATH=self.db_path, REPORT_PROFILE=profile_path):
+            for engine in ("classic", "concurrent"):
+                with self.subTest(engine=engine):
+                    ingest.fetch_report(engine, 2, True, self.logger)
+                    profile = json.loads(profile_path.read_text(encoding="utf-8"))
+                    self.assertEqual(profile["engine"], engine)
+                    self.assertEqual(
+                        sorted(s["sql"] for s in profile["statements"]),
+                        sorted(s["sql"] for s in statements),
+                    )
+                    self.assertEqual(profile["summary"]["statements"], len(statements))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,79 @@
+import logging
+import random
+import sqlite3
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from data_generation import generate_data
+from db import ingest
+from queries import result_cache, run_query
+from queries.run_query import QUERY_PATH
+
+
+class ResultCacheTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self._tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self._tmp.cleanup)
+        self.data_dir = Path(self._tmp.name)
+        generate_data.write_datasets(random.Random(5), self.data_dir, 12, 6)
+        self.db_path = self.data_dir / "test.db"
+        self.output = self.data_dir / "result.csv"
+        for module, paths in (
+            (ingest, {"DATA_DIR": self.data_dir, "DB_PATH": self.db_path}),
+            (run_query, {"DB_PATH": self.db_path, "CSV_OUTPUT": self.output}),
+        ):
+            patcher = mock.patch.multiple(module, **paths)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.logger = logging.getLogger("result-cache-test")
+        self.logger.addHandler(logging.NullHandler())
+        self.logger.propagate = False
+        ingest.run_ingestion(self.logger)
+        self.cache = result_cache.ResultCache(self.data_dir / "cache", logger=self.logger)
+
+    def run_cached(self) -> bytes:
+        self.output.unlink(missing_ok=True)
+        run_query.run_query(QUERY_PATH, formats=["csv"], cache=self.cache)
+        return self.output.read_bytes()
+
+    def test_result_cache_hits_until_data_changes_and_evicts_by_size(self) -> None:
+        first = self.run_cached()
+        self.assertEqual(self.run_cached(), first)
+        self.assertEqual((self.cache.stats()["hits"], self.cache.stats()["misses"]), (1, 1))
+
+        payments = self.data_dir / "payments.csv"
+        with payments.open("a", newline="", encoding="utf-8") as fh:
+            fh.write("PAY-99999,ORD-00001,2024-01-01,1.00,failed,card,TXN100000\r\n")
+        ingest.run_incremental_ingestion(self.logger)
+        self.run_cached()
+        self.assertEqual(self.cache.stats()["invalidated"], 1)
+        self.assertEqual(self.cache.stats()["misses"], 2)
+
+        self.cache.max_bytes = 1
+        run_query.run_catalog_query("top_products", {}, ["csv"], cache=self.cache)
+        self.assertEqual(self.cache.stats()["evicted"], 1)
+        entries = [path for path in self.cache.directory.iterdir() if path.is_dir()]
+        self.assertEqual(len(entries), 1)
+
+    def test_ingest_or_direct_write_after_a_cached_run_invalidates_the_entry(self) -> None:
+        self.run_cached()
+        generate_data.write_datasets(random.Random(6), self.data_dir, 12, 6)
+        ingest.run_ingestion(self.logger)
+        reloaded = self.run_cached()
+        self.assertEqual(self.cache.stats()["invalidated"], 1)
+        self.assertEqual(self.cache.stats()["hits"], 0)
+
+        # A write made outside ingest leaves submission_meta and load_state alone.
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute("UPDATE users SET signup_date = '2019-01-15' WHERE rowid = 1")
+        updated = self.run_cached()
+        self.assertEqual(self.cache.stats()["invalidated"], 2)
+        self.assertEqual(self.cache.stats()["hits"], 0)
+        self.assertIn(b"2019-01", updated)
+        self.assertNotIn(b"2019-01", reloaded)
+
+
+if __name__ == "__main__":
+    unittest.main()
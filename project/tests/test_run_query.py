@@ -0,0 +1,76 @@
+import csv
+import json
+import logging
+import random
+import sqlite3
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from data_generation import generate_data
+from db import ingest
+from queries import run_query
+from queries.run_query import QUERY_PATH
+from utils import columnar
+
+
+class RunQueryOutputTests(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        # Eight users give one cohort row each: several fetch batches and a partial last one.
+        cls._tmp = tempfile.TemporaryDirectory()
+        cls.data_dir = Path(cls._tmp.name)
+        generate_data.write_datasets(random.Random(5), cls.data_dir, 8, 4)
+        cls.db_path = cls.data_dir / "test.db"
+        logger = logging.getLogger("run-query-test")
+        logger.addHandler(logging.NullHandler())
+        logger.propagate = False
+        with mock.patch.multiple(ingest, DATA_DIR=cls.data_dir, DB_PATH=cls.db_path):
+            ingest.run_ingestion(logger)
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        cls._tmp.cleanup()
+
+    def test_streamed_query_outputs_match_fetchall(self) -> None:
+        outputs = {
+            name: self.data_dir / f"result.{name}" for name in run_query.OUTPUT_FORMATS
+        }
+        with mock.patch.multiple(
+            run_query,
+            DB_PATH=self.db_path,
+            CSV_OUTPUT=outputs["csv"],
+            JSON_OUTPUT=outputs["json"],
+            NDJSON_OUTPUT=outputs["ndjson"],
+            COLUMNAR_OUTPUT=outputs["columnar"],
+        ):
+            run_query.run_query(QUERY_PATH, formats=run_query.OUTPUT_FORMATS, fetch_size=3)
+        with sqlite3.connect(self.db_path) as conn:
+            conn.row_factory = sqlite3.Row
+            sql = QUERY_PATH.read_text(encoding="utf-8")
+            expected = [dict(row) for row in conn.execute(sql)]
+        self.assertGreater(len(expected), 3)
+        self.assertNotEqual(len(expected) % 3, 0)
+        self.assertEqual(
+            outputs["json"].read_text(encoding="utf-8"),
+            json.dumps(expected, indent=2, sort_keys=True),
+        )
+        ndjson_rows = outputs["ndjson"].read_text(encoding="utf-8").splitlines()
+        self.assertEqual([json.loads(line) for line in ndjson_rows], expected)
+        with outputs["csv"].open(newline="", encoding="utf-8") as fh:
+            csv_rows = list(csv.DictReader(fh))
+        self.assertEqual(
+            [row["cohort_month"] for row in csv_rows], [row["cohort_month"] for row in expected]
+        )
+        footer = columnar.read_columnar_footer(outputs["columnar"])
+        columnar_rows = [
+            dict(zip(footer["columns"], row))
+            for chunk in columnar.iter_columnar_chunks(outputs["columnar"])
+            for row in chunk
+        ]
+        self.assertEqual(columnar_rows, expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,260 @@
+import asyncio
+import gzip
+import http.client
+import json
+import os
+import socket
+import sqlite3
+import tempfile
+import threading
+import unittest
+import urllib.error
+import urllib.request
+from http.server import ThreadingHTTPServer
+from pathlib import Path
+
+import serve_frontend
+from utils import metrics
+
+
+class ServeFrontendTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self._tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self._tmp.cleanup)
+        self.root = Path(self._tmp.name)
+        (self.root / "frontend").mkdir()
+        (self.root / "frontend" / "index.html").write_text("<html>" + "x" * 1000 + "</html>")
+        self.report = self.root / "report.json"
+        self.report.write_text(json.dumps({"rows": list(range(500))}))
+        self.cache = serve_frontend.GzipCache()
+        self.metrics_path = self.root / "metrics.jsonl"
+        handler = serve_frontend.handler_factory(
+            self.root / "missing.db", self.root, self.cache, self.metrics_path
+        )
+        server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        self.base = f"http://127.0.0.1:{server.server_address[1]}"
+
+    def get(self, path: str, **headers: str):
+        request = urllib.request.Request(self.base + path, headers=headers)
+        try:
+            with urllib.request.urlopen(request) as response:
+                return response.status, response.headers, response.read()
+        except urllib.error.HTTPError as exc:
+            with exc:
+                return exc.code, exc.headers, exc.read()
+
+    def test_etag_revalidation_and_cached_gzip(self) -> None:
+        status, headers, body = self.get("/report.json", **{"Accept-Encoding": "gzip"})
+        self.assertEqual(status, 200)
+        self.assertEqual(headers["Content-Encoding"], "gzip")
+        self.assertEqual(headers["Cache-Control"], "no-cache")
+        self.assertEqual(gzip.decompress(body), self.report.read_bytes())
+        etag = headers["ETag"]
+
+        status, headers, body = self.get(
+            "/report.json", **{"Accept-Encoding": "gzip", "If-None-Match": etag}
+        )
+        self.assertEqual((status, body), (304, b""))
+        self.assertEqual(headers["ETag"], etag)
+
+        # The identity encoding is a different representation with its own ETag.
+        status, headers, body = self.get("/report.json", **{"If-None-Match": etag})
+        self.assertEqual(status, 200)
+        self.assertIsNone(headers["Content-Encoding"])
+        self.assertEqual(body, self.report.read_bytes())
+        self.assertNotEqual(headers["ETag"], etag)
+
+        self.get("/frontend/", **{"Accept-Encoding": "gzip"})
+        self.assertEqual((self.cache.hits, self.cache.misses), (0, 2))
+        self.get("/report.json", **{"Accept-Encoding": "gzip"})
+        self.assertEqual(self.cache.hits, 1)
+
+        # Rewriting the file changes its ETag and replaces the cached body.
+        self.report.write_text(json.dumps({"rows": list(range(600))}))
+        stat = self.report.stat()
+        os.utime(self.report, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+        status, headers, body = self.get(
+            "/report.json", **{"Accept-Encoding": "gzip", "If-None-Match": etag}
+        )
+        self.assertEqual(status, 200)
+        self.assertNotEqual(headers["ETag"], etag)
+        self.assertEqual(gzip.decompress(body), self.report.read_bytes())
+
+        status, headers, _ = self.get("/api/report", **{"Accept-Encoding": "gzip"})
+        self.assertEqual((status, headers["Cache-Control"]), (503, "no-store"))
+
+    def test_metrics_serves_recorded_stages_and_cache_counters(self) -> None:
+        status, headers, body = self.get("/metrics")
+        self.assertEqual(status, 200)
+        self.assertEqual(headers["Content-Type"], serve_frontend.PROMETHEUS_CONTENT_TYPE)
+        self.assertIn("dashboard_gzip_cache_misses_total 0\n", body.decode())
+        self.assertNotIn("pipeline_stage_seconds", body.decode())
+
+        recorded = metrics.StageMetrics()
+        recorded.observe("run_query", 0.25, "join_query.sql")
+        recorded.count("run_query", "join_query.sql", rows=12, nbytes=900)
+        metrics.write_metrics("run_query", self.metrics_path, recorded)
+        self.get("/report.json", **{"Accept-Encoding": "gzip"})
+        status, headers, body = self.get("/metrics", **{"Accept-Encoding": "gzip"})
+        text = gzip.decompress(body).decode()
+        self.assertEqual((status, headers["Cache-Control"]), (200, "no-store"))
+        self.assertIn(
+            'pipeline_stage_seconds{job="run_query",stage="run_query",target="join_query.sql"}'
+            " 0.25\n",
+            text,
+        )
+        self.assertIn('pipeline_stage_bytes{job="run_query"', text)
+        self.assertIn("dashboard_gzip_cache_misses_total 1\n", text)
+
+    def test_gzip_cache_evicts_least_recently_used(self) -> None:
+        data = {name: (name * 40).encode() for name in "abc"}
+        entry_size = len(gzip.compress(data["a"], mtime=0))
+        cache = serve_frontend.GzipCache(max_bytes=2 * entry_size)
+        for name in "aba":
+            cache.get(name, "v1", lambda: data[name])
+        cache.get("c", "v1", lambda: data["c"])
+        self.assertEqual(list(cache._entries), ["a", "c"])
+        self.assertEqual(cache.size, 2 * entry_size)
+        self.assertEqual(gzip.decompress(cache.get("a", "v1", bytes)), data["a"])
+        self.assertTrue(serve_frontend.accepts_gzip("br, gzip;q=0.5"))
+        self.assertFalse(serve_frontend.accepts_gzip("gzip;q=0, identity"))
+
+
+class AsyncServerTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self._tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self._tmp.cleanup)
+        self.root = Path(self._tmp.name)
+        (self.root / "frontend").mkdir()
+        (self.root / "frontend" / "index.html").write_text("<html>" + "x" * 1000 + "</html>")
+        self.report = self.root / "report.json"
+        self.report.write_text(json.dumps({"rows": list(range(500))}))
+        self.db_path = self.root / "ecommerce.db"
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute("CREATE TABLE t (x)")
+
+        self.loop = asyncio.new_event_loop()
+        loop_thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        loop_thread.start()
+        self.addCleanup(self.loop.close)
+        self.addCleanup(loop_thread.join, 5)
+        self.addCleanup(self.loop.call_soon_threadsafe, self.loop.stop)
+        self.server = serve_frontend.AsyncDashboardServer(
+            self.root,
+            self.db_path,
+            watch_interval=0.02,
+            keepalive_interval=0.2,
+            metrics_path=self.root / "metrics.jsonl",
+        )
+        self.port = self.run_async(self.server.start("127.0.0.1", 0))
+        self.addCleanup(lambda: self.run_async(self.server.close()))
+
+    def run_async(self, coroutine):
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop).result(5)
+
+    def open_stream(self) -> socket.socket:
+        sock = socket.create_connection(("127.0.0.1", self.port), timeout=5)
+        sock.sendall(b"GET /api/events HTTP/1.1\r\nHost: localhost\r\n\r\n")
+        return sock
+
+    def next_event(self, reader) -> dict:
+        fields = {}
+        for line in iter(reader.readline, b""):
+            line = line.decode().rstrip("\n")
+            if not line and "event" in fields:
+                return fields
+            name, sep, value = line.partition(": ")
+            if sep and name:
+                fields[name] = value
+        raise AssertionError("event stream closed")
+
+    def test_serves_files_with_keep_alive_redirects_and_revalidation(self) -> None:
+        conn = http.client.HTTPConnection("127.0.0.1", self.port, timeout=5)
+        self.addCleanup(conn.close)
+        conn.request("GET", "/")
+        response = conn.getresponse()
+        response.read()
+        self.assertEqual((response.status, response.getheader("Location")), (302, "/frontend/"))
+
+        conn.request("GET", "/frontend/", headers={"Accept-Encoding": "gzip"})
+        response = conn.getresponse()
+        body = gzip.decompress(response.read())
+        self.assertEqual(body, (self.root / "frontend" / "index.html").read_bytes())
+        etag = response.getheader("ETag")
+
+        # Same connection: keep-alive works and the ETag revalidates to an empty 304.
+        conn.request("GET", "/frontend/", headers={"Accept-Encoding": "gzip", "If-None-Match": etag})
+        response = conn.getresponse()
+        self.assertEqual((response.status, response.read()), (304, b""))
+
+        conn.request("GET", "/report.json")
+        response = conn.getresponse()
+        self.assertEqual(response.read(), self.report.read_bytes())
+        conn.request("GET", "/frontend")
+        response = conn.getresponse()
+        response.read()
+        self.assertEqual((response.status, response.getheader("Location")), (301, "/frontend/"))
+        conn.request("GET", "/../missing.txt")
+        response = conn.getresponse()
+        response.read()
+        self.assertEqual(response.status, 404)
+        conn.request("GET", "/api/report?sections=top_products")
+        response = conn.getresponse()
+        self.assertEqual(response.status, 503)
+        self.assertIn("error", json.loads(response.read()))
+        conn.request("GET", "/metrics")
+        response = conn.getresponse()
+        text = response.read().decode()
+        self.assertEqual(response.status, 200)
+        self.assertIn("dashboard_event_streams 0\n", text)
+        self.assertIn("dashboard_gzip_cache_misses_total 1\n", text)
+
+    def test_unsupported_method_closes_connection_instead_of_reading_body_as_request(self) -> None:
+        with socket.create_connection(("127.0.0.1", self.port), timeout=5) as sock:
+            sock.sendall(
+                b"POST /report.json HTTP/1.1\r\nHost: localhost\r\nContent-Length: 11\r\n\r\n"
+                b"hello world"
+                b"GET /report.json HTTP/1.1\r\nHost: localhost\r\n\r\n"
+            )
+            received = b""
+            while chunk := sock.recv(65536):
+                received += chunk
+        head = received.split(b"\r\n\r\n", 1)[0]
+        self.assertTrue(head.startswith(b"HTTP/1.1 405 "))
+        self.assertIn(b"Connection: close", head)
+        self.assertNotIn(b"400", received)
+
+    def test_event_streams_announce_file_and_database_changes(self) -> None:
+        threads_before = threading.active_count()
+        streams = [self.open_stream() for _ in range(50)]
+        readers = [sock.makefile("rb") for sock in streams]
+        for sock, reader in zip(streams, readers):
+            self.addCleanup(sock.close)
+            self.addCleanup(reader.close)
+            self.assertEqual(reader.readline(), b"HTTP/1.1 200 OK\r\n")
+        deadline = 50
+        while self.server.streams < len(streams) and deadline:
+            threading.Event().wait(0.02)
+            deadline -= 1
+        self.assertEqual(self.server.streams, len(streams))
+        # Open streams are coroutines, not threads.
+        self.assertLessEqual(threading.active_count(), threads_before + 4)
+
+        self.report.write_text(json.dumps({"rows": []}))
+        for reader in readers:
+            event = self.next_event(reader)
+            self.assertEqual(event["event"], "data-updated")
+            self.assertEqual(json.loads(event["data"])["changed"], ["report.json"])
+
+        # A commit from another connection moves PRAGMA data_version.
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute("INSERT INTO t VALUES (1)")
+        event = self.next_event(readers[0])
+        self.assertEqual(json.loads(event["data"]), {"version": 2, "changed": ["ecommerce.db"]})
+
+
+if __name__ == "__main__":
+    unittest.main()
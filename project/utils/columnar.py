@@ -0,0 +1,337 @@
+"""
+Compact binary columnar files (``.col``) for generated datasets and query results.
+
+A file is the magic bytes, a sequence of chunks, a JSON footer, the footer's
+length as uint32 and the magic again. Each chunk holds up to ``chunk_rows``
+rows and starts with its row count (uint32). Every column in the chunk then has
+an encoding byte, a flags byte and a uint32 payload length, followed by the payload:
+
+- ``int64`` and ``float64``: little-endian arrays.
+- ``str``: a uint32 array of end offsets, in characters, followed by the
+  concatenated UTF-8 text.
+- ``dict8`` and ``dict16``: the chunk's distinct strings in ``str`` layout, then
+  one uint8 or uint16 code per row. Text columns whose distinct values are at
+  most ``DICTIONARY_RATIO`` of the chunk's rows (``status``, ``country``,
+  ``segment``, ``payment_method``, ...) use them.
+- ``null``: no payload; every value in the chunk is NULL.
+
+When the NULLS flag is set, the payload starts with a bitmap marking the NULL rows.
+
+Encodings are chosen per chunk from the Python types of the values. A column
+never mixes text and numbers within a file. The footer lists the column names,
+each column's widest type, the total row count, and every chunk's offset, row
+count and column encodings. Readers decode only the columns they ask for and get
+ints, floats and strings back, with nothing parsed from text. The footer is only
+written once every row is in, so a write that fails leaves a file that readers
+reject as truncated.
+"""
+
+import hashlib
+import json
+import struct
+import sys
+from array import array
+from pathlib import Path
+from typing import Any, BinaryIO, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from utils.helpers import ensure_parent_dir
+
+
+COLUMNAR_SUFFIX = ".col"
+MAGIC = b"COLB\x00\x01\r\n"
+DEFAULT_CHUNK_ROWS = 65536
+DICTIONARY_RATIO = 0.5
+
+INT64, FLOAT64, STR, DICT8, DICT16, NULL = range(6)
+ENCODING_NAMES = ["int64", "float64", "str", "dict8", "dict16", "null"]
+ENCODING_TYPES = {
+    INT64: "int",
+    FLOAT64: "float",
+    STR: "str",
+    DICT8: "str",
+    DICT16: "str",
+    NULL: "null",
+}
+HAS_NULLS = 1
+
+_CHUNK_HEADER = struct.Struct("<I")
+_COLUMN_HEADER = struct.Struct("<BBI")
+_DICT_HEADER = struct.Struct("<II")
+_TRAILER = struct.Struct("<I")
+_BIG_ENDIAN = sys.byteorder == "big"
+
+
+def columnar_name(filename: str) -> str:
+    """``users.csv`` -> ``users.col``."""
+    return Path(filename).with_suffix(COLUMNAR_SUFFIX).name
+
+
+def _to_bytes(values: array) -> bytes:
+    if _BIG_ENDIAN:
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+def _from_bytes(typecode: str, data: bytes) -> array:
+    values = array(typecode)
+    values.frombytes(data)
+    if _BIG_ENDIAN:
+        values.byteswap()
+    return values
+
+
+def _encode_strings(values: Sequence[str]) -> bytes:
+    ends = array("I")
+    end = 0
+    for value in values:
+        end += len(value)
+        ends.append(end)
+    return _to_bytes(ends) + "".join(values).encode("utf-8")
+
+
+def _decode_strings(payload: bytes, count: int) -> List[str]:
+    split = count * 4
+    ends = _from_bytes("I", payload[:split])
+    text = payload[split:].decode("utf-8")
+    starts = [0, *ends[:-1]]
+    return [text[start:end] for start, end in zip(starts, ends)]
+
+
+def _null_bitmap(values: Sequence[Any]) -> bytes:
+    bitmap = bytearray((len(values) + 7) // 8)
+    for index, value in enumerate(values):
+        if value is None:
+            bitmap[index >> 3] |= 1 << (index & 7)
+    return bytes(bitmap)
+
+
+def encode_column(name: str, values: Sequence[Any]) -> Tuple[int, int, bytes]:
+    """Pick an encoding for one chunk of a column; returns (encoding, flags, payload)."""
+    kinds = {type(value) for value in values if value is not None}
+    if not kinds:
+        return NULL, 0, b""
+    flags = 0
+    prefix = b""
+    if any(value is None for value in values):
+        flags = HAS_NULLS
+        prefix = _null_bitmap(values)
+    if kinds <= {int, bool}:
+        filler: Any = 0
+    elif kinds <= {int, bool, float}:
+        filler = 0.0
+    elif kinds == {str}:
+        filler = ""
+    else:
+        names = ", ".join(sorted(kind.__name__ for kind in kinds))
+        raise TypeError(f"Column {name!r} mixes value types ({names})")
+    if flags:
+        values = [filler if value is None else value for value in values]
+    if isinstance(filler, int):
+        return INT64, flags, prefix + _to_bytes(array("q", values))
+    if isinstance(filler, float):
+        return FLOAT64, flags, prefix + _to_bytes(array("d", values))
+    distinct = dict.fromkeys(values)
+    if len(distinct) > 65536 or len(distinct) > len(values) * DICTIONARY_RATIO:
+        return STR, flags, prefix + _encode_strings(values)
+    codes = {value: code for code, value in enumerate(distinct)}
+    encoding, typecode = (DICT8, "B") if len(codes) <= 256 else (DICT16, "H")
+    block = _encode_strings(list(distinct))
+    return (
+        encoding,
+        flags,
+        prefix
+        + _DICT_HEADER.pack(len(codes), len(block))
+        + block
+        + _to_bytes(array(typecode, map(codes.__getitem__, values))),
+    )
+
+
+def decode_column(encoding: int, flags: int, payload: bytes, count: int) -> List[Any]:
+    if encoding == NULL:
+        return [None] * count
+    bitmap = b""
+    if flags & HAS_NULLS:
+        split = (count + 7) // 8
+        bitmap, payload = payload[:split], payload[split:]
+    if encoding == INT64:
+        values: List[Any] = _from_bytes("q", payload).tolist()
+    elif encoding == FLOAT64:
+        values = _from_bytes("d", payload).tolist()
+    elif encoding == STR:
+        values = _decode_strings(payload, count)
+    elif encoding in (DICT8, DICT16):
+        size, block_bytes = _DICT_HEADER.unpack_from(payload)
+        start = _DICT_HEADER.size
+        dictionary = _decode_strings(payload[start : start + block_bytes], size)
+        typecode = "B" if encoding == DICT8 else "H"
+        codes = _from_bytes(typecode, payload[start + block_bytes :])
+        values = list(map(dictionary.__getitem__, codes))
+    else:
+        raise ValueError(f"Unknown column encoding {encoding}")
+    for index, byte in enumerate(bitmap):
+        while byte:
+            bit = byte & -byte
+            values[index * 8 + bit.bit_length() - 1] = None
+            byte ^= bit
+    return values
+
+
+def _widest(name: str, current: str, new: str) -> str:
+    if current == "null" or current == new:
+        return new
+    if new == "null":
+        return current
+    if "str" in (current, new):
+        raise TypeError(f"Column {name!r} mixes value types ({current}, {new})")
+    return "float"
+
+
+class ColumnarWriter:
+    """Buffers rows (sequences ordered like ``columns``) and writes them a chunk at a time.
+
+    ``rows``, ``bytes_written`` and ``stats()`` mirror ``TrackedFile``.
+    """
+
+    def __init__(
+        self, path: Path, columns: Sequence[str], chunk_rows: int = DEFAULT_CHUNK_ROWS
+    ) -> None:
+        if chunk_rows < 1:
+            raise ValueError("chunk_rows must be at least 1")
+        ensure_parent_dir(path)
+        self.path = path
+        self.columns = list(columns)
+        self.chunk_rows = chunk_rows
+        self.types = ["null"] * len(self.columns)
+        self.rows = 0
+        self.bytes_written = 0
+        self._chunks: List[Dict[str, Any]] = []
+        self._pending: List[Sequence[Any]] = []
+        self._digest = hashlib.sha1()
+        self._fh: BinaryIO = path.open("wb")
+        self._write(MAGIC)
+
+    def _write(self, data: bytes) -> None:
+        self._digest.update(data)
+        self._fh.write(data)
+        self.bytes_written += len(data)
+
+    def _flush(self) -> None:
+        if not self._pending:
+            return
+        count = len(self._pending)
+        columns = list(zip(*self._pending)) if self.columns else []
+        self._pending = []
+        parts = [_CHUNK_HEADER.pack(count)]
+        encodings = []
+        for index, (name, values) in enumerate(zip(self.columns, columns)):
+            encoding, flags, payload = encode_column(name, values)
+            self.types[index] = _widest(name, self.types[index], ENCODING_TYPES[encoding])
+            parts += [_COLUMN_HEADER.pack(encoding, flags, len(payload)), payload]
+            encodings.append(ENCODING_NAMES[encoding])
+        self._chunks.append({"offset": self.bytes_written, "rows": count, "encodings": encodings})
+        self._write(b"".join(parts))
+        self.rows += count
+
+    def write_rows(self, rows: Iterable[Sequence[Any]]) -> None:
+        for row in rows:
+            self._pending.append(row)
+            if len(self._pending) >= self.chunk_rows:
+                self._flush()
+
+    def close(self) -> None:
+        if self._fh.closed:
+            return
+        try:
+            self._flush()
+        except BaseException:
+            self.abort()
+            raise
+        footer = json.dumps(
+            {
+                "columns": self.columns,
+                "types": self.types,
+                "rows": self.rows,
+                "chunks": self._chunks,
+            },
+            separators=(",", ":"),
+        ).encode("utf-8")
+        self._write(footer + _TRAILER.pack(len(footer)) + MAGIC)
+        self._fh.close()
+
+    def abort(self) -> None:
+        """Close without the footer, leaving a file that readers reject as truncated."""
+        self._pending = []
+        self._fh.close()
+
+    def __enter__(self) -> "ColumnarWriter":
+        return self
+
+    def __exit__(self, exc_type: Any, *exc_info: Any) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    def stats(self) -> Dict[str, Any]:
+        return {"rows": self.rows, "bytes": self.bytes_written, "sha1": self._digest.hexdigest()}
+
+
+def write_columnar(
+    path: Path,
+    columns: Sequence[str],
+    rows: Iterable[Sequence[Any]],
+    chunk_rows: int = DEFAULT_CHUNK_ROWS,
+) -> Dict[str, Any]:
+    with ColumnarWriter(path, columns, chunk_rows) as writer:
+        writer.write_rows(rows)
+    return writer.stats()
+
+
+def read_columnar_footer(path: Path) -> Dict[str, Any]:
+    """Column names and types, total rows and chunk offsets of a ``.col`` file."""
+    with path.open("rb") as fh:
+        return _read_footer(fh, path)
+
+
+def _read_footer(fh: BinaryIO, path: Path) -> Dict[str, Any]:
+    if fh.read(len(MAGIC)) != MAGIC:
+        raise ValueError(f"{path.name} is not a columnar file")
+    tail = _TRAILER.size + len(MAGIC)
+    if fh.seek(0, 2) < len(MAGIC) + tail:
+        raise ValueError(f"{path.name} is truncated")
+    fh.seek(-tail, 2)
+    (length,) = _TRAILER.unpack(fh.read(_TRAILER.size))
+    if fh.read(len(MAGIC)) != MAGIC:
+        raise ValueError(f"{path.name} is truncated")
+    fh.seek(-(tail + length), 2)
+    return json.loads(fh.read(length).decode("utf-8"))
+
+
+def iter_columnar_chunks(
+    path: Path, columns: Optional[List[str]] = None
+) -> Iterator[List[Tuple[Any, ...]]]:
+    """Yield each chunk as a list of row tuples ordered like ``columns`` (default: all).
+
+    Columns that were not asked for are skipped without being decoded.
+    """
+    with path.open("rb") as fh:
+        footer = _read_footer(fh, path)
+        stored = footer["columns"]
+        wanted = stored if columns is None else columns
+        missing = [column for column in wanted if column not in stored]
+        if missing:
+            raise ValueError(f"{path.name} is missing columns: {', '.join(missing)}")
+        positions = [stored.index(column) for column in wanted]
+        needed = set(positions)
+        for chunk in footer["chunks"]:
+            fh.seek(chunk["offset"])
+            (count,) = _CHUNK_HEADER.unpack(fh.read(_CHUNK_HEADER.size))
+            decoded: Dict[int, List[Any]] = {}
+            for index in range(len(stored)):
+                encoding, flags, length = _COLUMN_HEADER.unpack(fh.read(_COLUMN_HEADER.size))
+                if index in needed:
+                    decoded[index] = decode_column(encoding, flags, fh.read(length), count)
+                else:
+                    fh.seek(length, 1)
+            yield list(zip(*(decoded[position] for position in positions)))
@@ -1,10 +1,19 @@
 import csv
 import hashlib
+import io
 import json
 import logging
+import sys
+from itertools import islice
+from operator import itemgetter
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import Any, Dict, Iterable, List
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+try:
+    import resource
+except ImportError:  # pragma: no cover - not available on Windows
+    resource = None
 
 
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -15,6 +24,7 @@ DATA_FILES = [
     "order_items.csv",
     "payments.csv",
 ]
+MANIFEST_NAME = "manifest.json"
 
 
 def configure_logger(name: str, log_file: str | None = None) -> logging.Logger:
@@ -40,13 +50,45 @@ def ensure_parent_dir(path: Path) -> None:
     path.parent.mkdir(parents=True, exist_ok=True)
 
 
-def write_csv(path: Path, header: List[str], rows: Iterable[Dict[str, Any]]) -> None:
-    ensure_parent_dir(path)
-    with path.open("w", newline="", encoding="utf-8") as csvfile:
-        writer = csv.DictWriter(csvfile, fieldnames=header)
+class TrackedFile:
+    """Text sink for csv writers that counts bytes and SHA-1 hashes content as it is written."""
+
+    def __init__(self, path: Path) -> None:
+        ensure_parent_dir(path)
+        self.path = path
+        self.rows = 0
+        self.bytes_written = 0
+        self._digest = hashlib.sha1()
+        self._fh = path.open("wb")
+
+    def write(self, text: str) -> int:
+        data = text.encode("utf-8")
+        self._digest.update(data)
+        self.bytes_written += len(data)
+        self._fh.write(data)
+        return len(text)
+
+    def close(self) -> None:
+        self._fh.close()
+
+    def __enter__(self) -> "TrackedFile":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+    def stats(self) -> Dict[str, Any]:
+        return {"rows": self.rows, "bytes": self.bytes_written, "sha1": self._digest.hexdigest()}
+
+
+def write_csv(path: Path, header: List[str], rows: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+    with TrackedFile(path) as sink:
+        writer = csv.DictWriter(sink, fieldnames=header)
         writer.writeheader()
         for row in rows:
             writer.writerow(row)
+            sink.rows += 1
+    return sink.stats()
 
 
 def read_csv(path: Path) -> List[Dict[str, str]]:
@@ -55,6 +97,52 @@ def read_csv(path: Path) -> List[Dict[str, str]]:
         return list(reader)
 
 
+def iter_csv(path: Path, offset: int = 0) -> Iterator[Dict[str, str]]:
+    """Stream rows as dicts; a non-zero ``offset`` resumes at that byte position after the header."""
+    if not offset:
+        with path.open("r", newline="", encoding="utf-8") as csvfile:
+            yield from csv.DictReader(csvfile)
+        return
+    with path.open("rb") as raw:
+        header = next(csv.reader([raw.readline().decode("utf-8")]))
+        raw.seek(offset)
+        with io.TextIOWrapper(raw, encoding="utf-8", newline="") as csvfile:
+            yield from csv.DictReader(csvfile, fieldnames=header)
+
+
+def iter_csv_tuples(path: Path, columns: List[str]) -> Iterator[Any]:
+    """Yield rows as sequences ordered like ``columns``, skipping per-row dict construction."""
+    with path.open("r", newline="", encoding="utf-8") as csvfile:
+        reader = csv.reader(csvfile)
+        header = next(reader, [])
+        missing = [column for column in columns if column not in header]
+        if missing:
+            raise ValueError(f"{path.name} is missing columns: {', '.join(missing)}")
+        if header == columns:
+            yield from reader
+            return
+        pick = itemgetter(*(header.index(column) for column in columns))
+        for row in reader:
+            yield pick(row)
+
+
+def iter_batches(rows: Iterable[Any], size: int) -> Iterator[List[Any]]:
+    iterator = iter(rows)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def peak_rss_bytes() -> Optional[int]:
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS reports bytes.
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
 def write_json(path: Path, data: Any) -> None:
     ensure_parent_dir(path)
     with path.open("w", encoding="utf-8") as fh:
@@ -65,19 +153,78 @@ def now_utc_iso() -> str:
     return datetime.now(timezone.utc).replace(microsecond=0).isoformat()
 
 
-def hash_file_sha1(path: Path) -> str:
+def hash_file_sha1(path: Path, limit: Optional[int] = None) -> str:
+    """SHA-1 of the file, or of only its first ``limit`` bytes when given."""
     digest = hashlib.sha1()
+    remaining = limit
     with path.open("rb") as fh:
-        for chunk in iter(lambda: fh.read(8192), b""):
+        while remaining is None or remaining > 0:
+            size = 8192 if remaining is None else min(8192, remaining)
+            chunk = fh.read(size)
+            if not chunk:
+                break
             digest.update(chunk)
+            if remaining is not None:
+                remaining -= len(chunk)
     return digest.hexdigest()
 
 
+def write_manifest(directory: Path, files: Dict[str, Dict[str, Any]], **details: Any) -> Path:
+    entries = {}
+    for filename, stats in files.items():
+        stat = (directory / filename).stat()
+        entries[filename] = {**stats, "mtime_ns": stat.st_mtime_ns}
+    manifest = {"generated_timestamp": now_utc_iso(), **details, "files": entries}
+    path = directory / MANIFEST_NAME
+    write_json(path, manifest)
+    return path
+
+
+def read_manifest_entries(directory: Path) -> Optional[Dict[str, Dict[str, Any]]]:
+    """Per-file manifest entries, or None if manifest.json is missing or any listed CSV changed since."""
+    path = directory / MANIFEST_NAME
+    if not path.exists():
+        return None
+    try:
+        entries = json.loads(path.read_text(encoding="utf-8"))["files"]
+    except (ValueError, KeyError):
+        return None
+    for filename, entry in entries.items():
+        csv_path = directory / filename
+        if not csv_path.exists():
+            return None
+        stat = csv_path.stat()
+        if stat.st_size != entry.get("bytes") or stat.st_mtime_ns != entry.get("mtime_ns"):
+            return None
+    return entries
+
+
+def read_manifest_row_counts(directory: Path) -> Optional[Dict[str, int]]:
+    """Rows per dataset CSV; ``.col`` copies listed in the manifest are left out."""
+    entries = read_manifest_entries(directory)
+    if entries is None:
+        return None
+    return {
+        filename: entry["rows"] for filename, entry in entries.items() if filename in DATA_FILES
+    }
+
+
+def file_fingerprint(path: Path, manifest: Optional[Dict[str, Dict[str, Any]]] = None) -> Dict[str, Any]:
+    """Size and SHA-1 of a data file, reusing a fresh manifest entry instead of rehashing."""
+    entry = (manifest or {}).get(path.name)
+    if entry is not None:
+        return {"sha1": entry["sha1"], "bytes": entry["bytes"]}
+    return {"sha1": hash_file_sha1(path), "bytes": path.stat().st_size}
+
+
 def summarize_row_counts() -> Dict[str, int]:
+    manifest_counts = read_manifest_row_counts(BASE_DIR) or {}
     counts: Dict[str, int] = {}
     for filename in DATA_FILES:
         csv_path = BASE_DIR / filename
-        if csv_path.exists():
+        if filename in manifest_counts:
+            counts[filename] = manifest_counts[filename]
+        elif csv_path.exists():
             counts[filename] = len(read_csv(csv_path))
     return counts
 
@@ -0,0 +1,172 @@
+"""
+Stage-level metrics for the pipeline entry points.
+
+Stages are timed with ``stage_timer()`` or ``@timed`` and given row and byte
+counts with ``METRICS.count()``. Everything accumulates in the process-wide
+``METRICS`` registry at the cost of a dict update per stage, never per row.
+``write_metrics()`` saves a job's stages to a JSON-lines file, one stage per
+line. It replaces that job's lines from its previous run and keeps the other
+jobs' lines, so generate_data.py, ingest.py and run_query.py share one file.
+``render_prometheus()`` turns those lines into the Prometheus text format that
+serve_frontend.py serves at ``/metrics``.
+"""
+
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Mapping, Optional, Tuple, TypeVar
+
+from utils.helpers import BASE_DIR, ensure_parent_dir
+
+
+METRICS_PATH = BASE_DIR / "metrics.jsonl"
+# Fields of a stage record and the Prometheus gauge each one becomes.
+STAGE_FIELDS = {
+    "seconds": ("pipeline_stage_seconds", "Wall time spent in the stage in the job's last run."),
+    "calls": ("pipeline_stage_calls", "Times the stage ran in the job's last run."),
+    "rows": ("pipeline_stage_rows", "Rows the stage read or wrote in the job's last run."),
+    "bytes": ("pipeline_stage_bytes", "Bytes the stage read or wrote in the job's last run."),
+}
+LAST_RUN_METRIC = "pipeline_last_run_timestamp_seconds"
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+
+class StageMetrics:
+    """Per-stage totals keyed by stage name and an optional target (table, section, file).
+
+    Objects in ``observers`` have ``stage_started(stage, target)`` and
+    ``stage_finished(stage, target)`` called around every ``timer()`` block, outside
+    its timing; the memory profiler behind ``--profile-mem`` hooks in this way.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._stages: Dict[Tuple[str, str], Dict[str, float]] = {}
+        self.observers: List[Any] = []
+
+    def _add(self, stage: str, target: str, **values: float) -> None:
+        with self._lock:
+            record = self._stages.setdefault((stage, target), {})
+            for field, value in values.items():
+                record[field] = record.get(field, 0) + value
+
+    def observe(self, stage: str, seconds: float, target: str = "") -> None:
+        self._add(stage, target, seconds=seconds, calls=1)
+
+    def count(self, stage: str, target: str = "", rows: int = 0, nbytes: int = 0) -> None:
+        values = {field: value for field, value in (("rows", rows), ("bytes", nbytes)) if value}
+        self._add(stage, target, **values)
+
+    @contextmanager
+    def timer(self, stage: str, target: str = "") -> Iterator[None]:
+        for observer in self.observers:
+            observer.stage_started(stage, target)
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - started, target)
+            for observer in reversed(self.observers):
+                observer.stage_finished(stage, target)
+
+    def records(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [
+                {
+                    "stage": stage,
+                    "target": target,
+                    **{
+                        field: round(value, 6) if field == "seconds" else value
+                        for field, value in values.items()
+                    },
+                }
+                for (stage, target), values in self._stages.items()
+            ]
+
+    def reset(self) -> None:
+        with self._lock:
+            self._stages.clear()
+
+
+METRICS = StageMetrics()
+stage_timer = METRICS.timer
+
+
+def timed(stage: str) -> Callable[[F], F]:
+    """Decorator form of ``stage_timer(stage)``."""
+
+    def decorate(func: F) -> F:
+        @wraps(func)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            with METRICS.timer(stage):
+                return func(*args, **kwargs)
+
+        return wrapper  # type: ignore[return-value]
+
+    return decorate
+
+
+def read_metrics(path: Path = METRICS_PATH) -> List[Dict[str, Any]]:
+    if not path.exists():
+        return []
+    with path.open("r", encoding="utf-8") as fh:
+        return [json.loads(line) for line in fh if line.strip()]
+
+
+def write_metrics(job: str, path: Path = METRICS_PATH, metrics: StageMetrics = METRICS) -> None:
+    """Replace ``job``'s records in the metrics file with the stages recorded so far."""
+    timestamp = round(time.time(), 3)
+    kept = [record for record in read_metrics(path) if record.get("job") != job]
+    fresh = [{"job": job, "timestamp": timestamp, **record} for record in metrics.records()]
+    ensure_parent_dir(path)
+    # Written aside and renamed so /metrics never reads a half-written file.
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    with tmp_path.open("w", encoding="utf-8") as fh:
+        for record in kept + fresh:
+            fh.write(json.dumps(record, sort_keys=True) + "\n")
+    os.replace(tmp_path, path)
+
+
+def _labels(labels: Mapping[str, str]) -> str:
+    escaped = (
+        (name, str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for name, value in labels.items()
+        if value
+    )
+    return "{" + ",".join(f'{name}="{value}"' for name, value in escaped) + "}"
+
+
+def render_prometheus(
+    records: List[Dict[str, Any]], extra: Optional[Mapping[str, Tuple[str, str, float]]] = None
+) -> str:
+    """Prometheus text for metrics-file records, plus ``extra`` ``name: (type, help, value)``."""
+    extra = extra or {}
+    lines: List[str] = []
+    for field, (name, help_text) in STAGE_FIELDS.items():
+        samples = [record for record in records if field in record]
+        if not samples:
+            continue
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} gauge"]
+        for record in samples:
+            labels = {key: record.get(key, "") for key in ("job", "stage", "target")}
+            lines.append(f"{name}{_labels(labels)} {record[field]}")
+    last_runs: Dict[str, float] = {}
+    for record in records:
+        last_runs[record["job"]] = max(last_runs.get(record["job"], 0), record["timestamp"])
+    if last_runs:
+        lines += [
+            f"# HELP {LAST_RUN_METRIC} Unix time the job last wrote its metrics.",
+            f"# TYPE {LAST_RUN_METRIC} gauge",
+        ]
+        lines += [
+            f"{LAST_RUN_METRIC}{_labels({'job': job})} {timestamp}"
+            for job, timestamp in last_runs.items()
+        ]
+    for name, (kind, help_text, value) in extra.items():
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}", f"{name} {value}"]
+    return "\n".join(lines) + "\n" if lines else ""
@@ -0,0 +1,281 @@
+"""
+CPU and memory profiling for the CLI entry points (``--profile-cpu``, ``--profile-mem``).
+
+``--profile-cpu`` runs the command under cProfile and writes
+``<job>.pstats`` for ``python -m pstats`` or snakeviz. cProfile only keeps
+caller/callee pairs, so a sampling thread also records the main thread's full
+Python stack every few milliseconds. Those stacks go to ``<job>.collapsed`` as
+``frame;frame;... samples`` lines, the format flamegraph.pl and speedscope read.
+
+``--profile-mem`` traces allocations with tracemalloc. Each stage timed through
+utils.metrics gets its peak traced memory, its net growth, and the source lines
+that allocated the most during it. The results go to ``<job>_memory.json``.
+
+Work done in worker processes (``--workers``, ``--parse-workers``) is not profiled.
+"""
+
+import argparse
+import cProfile
+import io
+import logging
+import os
+import pstats
+import sys
+import tempfile
+import threading
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+from pathlib import Path
+from types import FrameType
+from typing import Any, Dict, Iterator, List, Tuple
+
+from utils.helpers import BASE_DIR, ensure_parent_dir, now_utc_iso, write_json
+from utils.metrics import METRICS
+
+
+PROFILE_DIR = BASE_DIR / "profiles"
+SAMPLE_INTERVAL = 0.005
+TOP_ALLOCATIONS = 10
+TOP_FUNCTIONS = 15
+# The profilers' own bookkeeping is left out of the allocation diffs.
+_PROFILER_FILES = {tracemalloc.__file__, __file__}
+
+
+def add_profile_args(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument(
+        "--profile-cpu",
+        action="store_true",
+        help="Profile with cProfile and stack sampling; writes <job>.pstats and <job>.collapsed.",
+    )
+    parser.add_argument(
+        "--profile-mem",
+        action="store_true",
+        help="Trace allocations per stage with tracemalloc; writes <job>_memory.json.",
+    )
+    parser.add_argument(
+        "--profile-dir",
+        type=Path,
+        default=PROFILE_DIR,
+        help="Directory for --profile-cpu and --profile-mem output.",
+    )
+
+
+def _frame_label(frame: FrameType) -> str:
+    code = frame.f_code
+    name = getattr(code, "co_qualname", code.co_name)
+    return f"{os.path.basename(code.co_filename)}:{name}"
+
+
+def _location(frame: tracemalloc.Frame) -> str:
+    path = Path(frame.filename)
+    if path.is_relative_to(BASE_DIR):
+        path = path.relative_to(BASE_DIR)
+    return f"{path}:{frame.lineno}"
+
+
+class StackSampler:
+    """Counts one thread's collapsed Python stacks, sampled from a daemon thread."""
+
+    def __init__(self, thread_id: int, interval: float = SAMPLE_INTERVAL) -> None:
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            labels = []
+            while frame is not None:
+                labels.append(_frame_label(frame))
+                frame = frame.f_back
+            if labels:
+                self.stacks[";".join(reversed(labels))] += 1
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def write(self, path: Path) -> None:
+        ensure_parent_dir(path)
+        with path.open("w", encoding="utf-8") as fh:
+            for stack, samples in self.stacks.most_common():
+                fh.write(f"{stack} {samples}\n")
+
+
+class StageMemoryProfiler:
+    """A ``METRICS`` observer recording tracemalloc usage for each stage.
+
+    Stages nest, for example insert_data inside run_ingestion. tracemalloc has
+    a single peak counter, so each stage resets it on entry and hands its own
+    peak to the enclosing stage on exit. Stages timed on other threads are
+    ignored.
+
+    Grouping a snapshot by line while tracing is on is an order of magnitude
+    slower, because every object built for the grouping is traced too. So
+    snapshots are only taken, at the baseline and whenever a stage finishes,
+    and dumped to ``snapshot_dir``. ``report()`` groups them once tracing has
+    stopped. A stage's allocations are its finishing snapshot compared with the
+    latest snapshot taken before it started.
+    """
+
+    def __init__(self, snapshot_dir: Path, top: int = TOP_ALLOCATIONS) -> None:
+        self.snapshot_dir = snapshot_dir
+        self.top = top
+        self.stages: List[Dict[str, Any]] = []
+        self._open: List[Dict[str, Any]] = []
+        self._snapshots = 0
+        self._thread_id = threading.get_ident()
+        self._take_snapshot()
+
+    def _take_snapshot(self) -> int:
+        tracemalloc.take_snapshot().dump(str(self.snapshot_dir / f"{self._snapshots}.snapshot"))
+        self._snapshots += 1
+        return self._snapshots - 1
+
+    def stage_started(self, stage: str, target: str) -> None:
+        if threading.get_ident() != self._thread_id:
+            return
+        current, peak = tracemalloc.get_traced_memory()
+        if self._open:
+            self._open[-1]["peak"] = max(self._open[-1]["peak"], peak)
+        tracemalloc.reset_peak()
+        self._open.append(
+            {
+                "stage": stage,
+                "target": target,
+                "start": current,
+                "peak": 0,
+                "before": self._snapshots - 1,
+            }
+        )
+
+    def stage_finished(self, stage: str, target: str) -> None:
+        if threading.get_ident() != self._thread_id or not self._open:
+            return
+        entry = self._open.pop()
+        current, peak = tracemalloc.get_traced_memory()
+        peak = max(peak, entry["peak"])
+        if self._open:
+            self._open[-1]["peak"] = max(self._open[-1]["peak"], peak)
+        entry.update(peak=peak, current=current, after=self._take_snapshot())
+        # The snapshot's own bookkeeping is not part of the next stage's peak.
+        tracemalloc.reset_peak()
+        self.stages.append(entry)
+
+    def _line_totals(self, index: int) -> Dict[tracemalloc.Traceback, Tuple[int, int]]:
+        snapshot = tracemalloc.Snapshot.load(str(self.snapshot_dir / f"{index}.snapshot"))
+        return {
+            stat.traceback: (stat.size, stat.count)
+            for stat in snapshot.statistics("lineno")
+            if stat.traceback[0].filename not in _PROFILER_FILES
+        }
+
+    def report(self) -> List[Dict[str, Any]]:
+        """Per-stage results; call after tracemalloc.stop()."""
+        totals: Dict[int, Dict[tracemalloc.Traceback, Tuple[int, int]]] = {}
+        results = []
+        for entry in self.stages:
+            for index in (entry["before"], entry["after"]):
+                if index not in totals:
+                    totals[index] = self._line_totals(index)
+            before, after = totals[entry["before"]], totals[entry["after"]]
+            diffs = []
+            for traceback, (size, count) in after.items():
+                old_size, old_count = before.get(traceback, (0, 0))
+                if size > old_size:
+                    diffs.append((size - old_size, count - old_count, size, traceback))
+            diffs.sort(key=lambda diff: diff[0], reverse=True)
+            results.append(
+                {
+                    "stage": entry["stage"],
+                    "target": entry["target"],
+                    "peak_bytes": entry["peak"],
+                    "peak_above_start_bytes": entry["peak"] - entry["start"],
+                    "net_bytes": entry["current"] - entry["start"],
+                    "top_allocations": [
+                        {
+                            "location": _location(traceback[0]),
+                            "size_diff_bytes": size_diff,
+                            "count_diff": count_diff,
+                            "size_bytes": size,
+                        }
+                        for size_diff, count_diff, size, traceback in diffs[: self.top]
+                    ],
+                }
+            )
+        return results
+
+
+def _log_cpu_profile(profiler: cProfile.Profile, logger: logging.Logger) -> None:
+    out = io.StringIO()
+    pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(TOP_FUNCTIONS)
+    logger.info("Top functions by cumulative time:\n%s", out.getvalue().rstrip())
+
+
+def _log_memory_profile(stages: List[Dict[str, Any]], logger: logging.Logger) -> None:
+    for entry in stages:
+        label = f"{entry['stage']}[{entry['target']}]" if entry["target"] else entry["stage"]
+        top = entry["top_allocations"][0]["location"] if entry["top_allocations"] else "-"
+        logger.info(
+            "%s: peak +%.1f MiB, net %+.1f MiB, top allocator %s",
+            label,
+            entry["peak_above_start_bytes"] / 2**20,
+            entry["net_bytes"] / 2**20,
+            top,
+        )
+
+
+@contextmanager
+def profiled(job: str, args: argparse.Namespace, logger: logging.Logger) -> Iterator[None]:
+    """Apply ``args.profile_cpu``/``args.profile_mem`` to the block; a no-op without them."""
+    if not args.profile_cpu and not args.profile_mem:
+        yield
+        return
+    profile_dir: Path = args.profile_dir
+    memory = None
+    if args.profile_mem:
+        snapshot_dir = tempfile.TemporaryDirectory(prefix=f"{job}-snapshots-")
+        tracemalloc.start()
+        memory = StageMemoryProfiler(Path(snapshot_dir.name))
+        METRICS.observers.append(memory)
+        memory.stage_started(job, "")
+    if args.profile_cpu:
+        profiler = cProfile.Profile()
+        sampler = StackSampler(threading.get_ident())
+        sampler.start()
+        profiler.enable()
+    try:
+        yield
+    finally:
+        # Stop both before writing anything, so neither measures the other's output.
+        if args.profile_cpu:
+            profiler.disable()
+            sampler.stop()
+        if memory is not None:
+            memory.stage_finished(job, "")
+            METRICS.observers.remove(memory)
+            tracemalloc.stop()
+        if args.profile_cpu:
+            ensure_parent_dir(profile_dir / f"{job}.pstats")
+            profiler.dump_stats(profile_dir / f"{job}.pstats")
+            sampler.write(profile_dir / f"{job}.collapsed")
+            _log_cpu_profile(profiler, logger)
+            logger.info(
+                "CPU profile saved to %s and %s (%s stack samples)",
+                profile_dir / f"{job}.pstats",
+                profile_dir / f"{job}.collapsed",
+                sum(sampler.stacks.values()),
+            )
+        if memory is not None:
+            with snapshot_dir:
+                stages = memory.report()
+            path = profile_dir / f"{job}_memory.json"
+            write_json(path, {"job": job, "generated_timestamp": now_utc_iso(), "stages": stages})
+            _log_memory_profile(stages, logger)
+            logger.info("Memory profile saved to %s", path)